@@ -0,0 +1,1046 @@
+"""
+Shannon Knowledge Graph — Micro-benchmarks
+
+Run:
+  python -m graph.bench adjacency [--fixtures 5000]
+  python -m graph.bench similarity [--matches 50000] [--queries 50]
+  python -m graph.bench memory [--matches 1000000]
+  python -m graph.bench snapshot [--matches 1000000] [--compact]
+  python -m graph.bench wal [--matches 50000]
+  python -m graph.bench enrich [--latency-ms 80] [--matches 20]
+  python -m graph.bench sitestream [--payloads 500]
+  python -m graph.bench ratelimit [--requests 200] [--server-rate 50]
+  python -m graph.bench scoring [--matches 100000]
+  python -m graph.bench backtest [--leagues 20] [--seasons 3] [--workers 4]
+  python -m graph.bench concurrency [--readers 4] [--writers 2] [--seconds 5]
+  python -m graph.bench memo [--leagues 4] [--seasons 6] [--repeat 500]
+  python -m graph.bench workers [--fixtures 400] [--batches 4] [--processes 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Any, Callable
+from unittest import mock
+
+import httpx
+
+from graph.engine import analyzer as analyzer_module
+from graph.engine.analyzer import MatchAnalyzer
+from graph.engine.backtest import CHUNK_SIZE as BACKTEST_CHUNK, backtest, settle_tips
+from graph.engine.executor import AnalysisExecutor
+from graph.engine.knowledge_graph import KnowledgeGraph, EdgeType
+from graph.engine.persistence import previous_snapshot
+from graph.engine.reasoning import DIRECTIONS, ReasoningContext, ReasoningEngine, SignalBatch
+from graph.models import MatchNode, MatchOdds, MatchVenue, Player, Team, Tip
+from graph.services.ingestion import DataIngestionService
+
+
+def _timeit(fn: Callable[[], Any], repeat: int) -> float:
+    """Mean wall time of fn() in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _report(title: str, rows: list[tuple[str, float]]) -> None:
+    print(title)
+    for label, value in rows:
+        print(f"  {label:<32} {value:>12.1f}")
+
+
+# ─── Fixtures ────────────────────────────────────────────
+
+def build_team_history(fixtures: int, squad: int = 30) -> KnowledgeGraph:
+    """One team with `fixtures` matches against 20 rotating opponents plus a full squad."""
+    kg = KnowledgeGraph()
+    kg.add_team(Team(id="1", name="Home FC", league="Ligue 1", country="France"))
+    for opp in range(2, 22):
+        kg.add_team(Team(id=str(opp), name=f"Opponent {opp}", league="Ligue 1", country="France"))
+    for i in range(squad):
+        kg.add_player(Player(id=str(i), name=f"Player {i}", team_id="1", position="MID"))
+
+    start = date(2000, 1, 1)
+    for i in range(fixtures):
+        opp = str(2 + i % 20)
+        home, away = ("1", opp) if i % 2 == 0 else (opp, "1")
+        kg.add_match(MatchNode(
+            id=str(i),
+            home_team_id=home,
+            away_team_id=away,
+            league="Ligue 1",
+            match_date=start + timedelta(days=i),
+            home_score=i % 3,
+            away_score=i % 2,
+            is_historical=True,
+        ))
+    return kg
+
+
+def build_seasons(leagues: int, seasons: int, teams: int = 20) -> KnowledgeGraph:
+    """`leagues` leagues of `teams` teams, each playing a double round robin per season, with odds."""
+    rnd = random.Random(42)
+    kg = KnowledgeGraph()
+    for lg in range(leagues):
+        league = f"League {lg}"
+        ids = [f"{lg}-{t}" for t in range(teams)]
+        strength = {team_id: rnd.gauss(0, 0.4) for team_id in ids}
+        for team_id in ids:
+            kg.add_team(Team(id=team_id, name=f"Team {team_id}", league=league, country="France"))
+        for season in range(seasons):
+            # Circle method: teams - 1 rounds, then the return legs
+            order = ids[:]
+            rounds = []
+            for _ in range(teams - 1):
+                rounds.append([(order[i], order[-1 - i]) for i in range(teams // 2)])
+                order.insert(1, order.pop())
+            rounds += [[(away, home) for home, away in pairs] for pairs in rounds]
+            start = date(2000 + season, 8, 1)
+            for rnd_no, pairs in enumerate(rounds):
+                for home, away in pairs:
+                    edge = strength[home] - strength[away] + 0.25
+                    kg.add_match(MatchNode(
+                        id=f"{home}_{away}_{season}",
+                        home_team_id=home,
+                        away_team_id=away,
+                        league=league,
+                        match_date=start + timedelta(days=7 * rnd_no),
+                        odds=MatchOdds(
+                            home_win=round(max(1.05, 2.5 - 1.5 * edge), 2),
+                            draw=3.3,
+                            away_win=round(max(1.05, 2.9 + 1.5 * edge), 2),
+                        ),
+                        home_score=max(0, round(rnd.gauss(1.4 + edge, 1.1))),
+                        away_score=max(0, round(rnd.gauss(1.1 - edge, 1.0))),
+                        is_historical=True,
+                    ))
+    return kg
+
+
+# ─── Benchmarks ──────────────────────────────────────────
+
+def bench_adjacency(fixtures: int, repeat: int = 200) -> None:
+    """Edge-type filtered lookups: typed adjacency index vs. scanning every edge."""
+    kg = build_team_history(fixtures)
+    g = kg.graph
+
+    def scan(node_id: str, edge_type: EdgeType) -> list[str]:
+        return [t for _, t, d in g.edges(node_id, data=True) if d.get("edge_type") == edge_type.value]
+
+    def scan_in(node_id: str, edge_type: EdgeType) -> list[str]:
+        return [s for s, _, d in g.in_edges(node_id, data=True) if d.get("edge_type") == edge_type.value]
+
+    team = "team:1"
+    _report(f"adjacency — team with {fixtures} fixtures (µs/call)", [
+        ("HAS_PLAYER scan", _timeit(lambda: scan(team, EdgeType.HAS_PLAYER), repeat)),
+        ("HAS_PLAYER indexed", _timeit(lambda: kg.get_neighbors(team, EdgeType.HAS_PLAYER), repeat)),
+        ("get_team_matches scan", _timeit(
+            lambda: scan(team, EdgeType.PLAYS_HOME) + scan(team, EdgeType.PLAYS_AWAY), repeat)),
+        ("get_team_matches indexed", _timeit(lambda: kg.get_team_matches(team), repeat)),
+        ("get_incoming PLAYS_HOME scan", _timeit(lambda: scan_in("match:0", EdgeType.PLAYS_HOME), repeat)),
+        ("get_incoming PLAYS_HOME indexed", _timeit(
+            lambda: kg.get_incoming("match:0", EdgeType.PLAYS_HOME), repeat)),
+    ])
+
+
+def bench_similarity(matches: int, queries: int) -> None:
+    """
+    find_similar_matches vs. the full scan it replaced, in both storage
+    modes: identical results for several top_k, also with match updates
+    (league moves, results dropped, historical flag flipped, new matches)
+    between queries.
+    """
+    def full_scan(kg: KnowledgeGraph, match_node_id: str, top_k: int) -> list[tuple[str, float]]:
+        target = kg.get_node_data(match_node_id)
+        if not target:
+            return []
+        scores = []
+        for mid in kg.get_nodes_by_type("match"):
+            if mid == match_node_id:
+                continue
+            other = kg.get_node_data(mid)
+            if not other or not other.get("is_historical"):
+                continue
+            score = kg._compute_similarity(target, other)
+            if score > 0:
+                scores.append((mid, score))
+        scores.sort(key=lambda x: x[1], reverse=True)
+        return scores[:top_k]
+
+    def payload(rnd: random.Random, match_id: str) -> dict[str, Any]:
+        league = rnd.randrange(25)
+        # Mostly league fixtures, some cross-league ones, a few without a result or upcoming
+        away_league = league if rnd.random() < 0.9 else rnd.randrange(25)
+        played = rnd.random() < 0.95
+        return {
+            "id": match_id,
+            "home_team_id": f"{league}-{rnd.randrange(20)}",
+            "away_team_id": f"{away_league}-{rnd.randrange(20)}",
+            "league": f"League {league}",
+            "match_date": str(date(2000, 1, 1) + timedelta(days=rnd.randrange(9000))),
+            "home_score": rnd.randrange(4) if played else None,
+            "away_score": rnd.randrange(3) if played else None,
+            "is_historical": rnd.random() < 0.97,
+        }
+
+    top_ks = (0, 1, 5, 20, 500)
+    rows: list[tuple[str, float]] = []
+    for compact in (False, True):
+        rnd = random.Random(7)
+        kg = KnowledgeGraph(compact=compact)
+        for i in range(matches):
+            kg.upsert_match(payload(rnd, str(i)))
+        probes = [f"match:{rnd.randrange(matches)}" for _ in range(queries)]
+        def check(probe: str) -> None:
+            ranking = full_scan(kg, probe, matches)  # every top_k is a prefix of the full ranking
+            for top_k in top_ks:
+                assert kg.find_similar_matches(probe, top_k) == ranking[:top_k], (probe, top_k)
+
+        for probe in probes:
+            check(probe)
+
+        for k, probe in enumerate(probes):
+            target = str(rnd.randrange(matches)) if k % 4 else f"new-{k}"
+            updated = payload(rnd, target)
+            if k % 3 == 0 and kg.get_node_data(f"match:{target}"):
+                # Same teams, new league / result only
+                updated = {**updated, **{key: kg.get_node_data(f"match:{target}")[key] for key in ("home_team_id", "away_team_id")}}
+            kg.upsert_match(updated)
+            check(probe)
+
+        mode = "compact" if compact else "dicts"
+        sample = probes[:5]
+        rows += [
+            (f"{mode}: full scan (µs/query)", _timeit(lambda: [full_scan(kg, p, 5) for p in sample], 1) / len(sample)),
+            (f"{mode}: indexed (µs/query)", _timeit(lambda: [kg.find_similar_matches(p, 5) for p in probes], 20) / len(probes)),
+        ]
+    _report(f"similarity — {matches:,} matches, {queries} queries × top_k {top_ks}, identical", rows)
+
+
+def bench_memory(matches: int) -> None:
+    """Traced memory of `matches` historical match nodes: model_dump dicts vs. compact records."""
+    leagues = [f"League {i}" for i in range(20)]
+    cities = [f"City {i}" for i in range(200)]
+    start = date(2000, 1, 1)
+
+    def build(compact: bool) -> tuple[float, float]:
+        gc.collect()
+        tracemalloc.start()
+        began = time.perf_counter()
+        kg = KnowledgeGraph(compact=compact)
+        for i in range(matches):
+            kg.add_match(MatchNode(
+                id=str(i),
+                home_team_id=str(i % 400),
+                away_team_id=str((i * 7 + 1) % 400),
+                league=leagues[i % 20],
+                match_date=start + timedelta(days=i % 9000),
+                kick_off="21:00",
+                status="FT",
+                venue=MatchVenue(stadium=f"Stadium {i % 400}", city=cities[i % 200], temperature_c=12.5),
+                odds=MatchOdds(home_win=1.8, draw=3.4, away_win=4.2),
+                home_score=i % 4,
+                away_score=i % 3,
+                is_historical=True,
+            ))
+        elapsed = time.perf_counter() - began
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kg
+        return size / matches, elapsed
+
+    dict_bytes, dict_s = build(compact=False)
+    compact_bytes, compact_s = build(compact=True)
+    _report(f"memory — {matches:,} match nodes (bytes/node, build s)", [
+        ("model_dump dicts", dict_bytes),
+        ("compact records", compact_bytes),
+        ("saving %", (1 - compact_bytes / dict_bytes) * 100),
+        ("build dicts (s)", dict_s),
+        ("build compact (s)", compact_s),
+    ])
+
+
+def bench_snapshot(matches: int, compact: bool) -> None:
+    """Save / load a graph of `matches` fixtures between 400 teams (2 edges per fixture)."""
+    kg = KnowledgeGraph(compact=compact)
+    for t in range(400):
+        kg.add_team(Team(id=str(t), name=f"Team {t}", league=f"League {t % 20}", country="France"))
+    start = date(2000, 1, 1)
+    for i in range(matches):
+        league = i % 20
+        kg.add_match(MatchNode(
+            id=str(i),
+            home_team_id=str(league + 20 * (i % 20)),
+            away_team_id=str(league + 20 * ((i * 7 + 1) % 20)),
+            league=f"League {league}",
+            match_date=start + timedelta(days=i % 9000),
+            home_score=i % 4,
+            away_score=i % 3,
+            is_historical=True,
+        ))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "graph.skg")
+        began = time.perf_counter()
+        job = kg.begin_snapshot(path)
+        pause_s = time.perf_counter() - began
+        size = job.wait()
+        kg.truncate_log(job)
+        save_s = time.perf_counter() - began
+
+        restored = KnowledgeGraph(compact=compact)
+        began = time.perf_counter()
+        restored.load_snapshot(path)
+        load_s = time.perf_counter() - began
+
+        # A torn newest file must fail to load, leaving the previous generation
+        kg.save_snapshot(path)
+        with open(path, "r+b") as fh:
+            fh.truncate(size // 2)
+        try:
+            KnowledgeGraph().load_snapshot(path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("truncated snapshot loaded")
+        assert KnowledgeGraph(compact=compact).load_snapshot(previous_snapshot(path))["nodes"] == kg.node_count
+
+    assert restored.stats() == kg.stats()
+    probe = f"match:{matches - 1}"
+    with restored.read():
+        assert restored.find_similar_matches(probe) == kg.find_similar_matches(probe)
+    _report(f"snapshot — {kg.node_count:,} nodes, {kg.edge_count:,} edges ({'compact' if compact else 'dicts'})", [
+        ("file size (MB)", size / 1e6),
+        ("writes paused (ms)", pause_s * 1000),
+        ("save (s)", save_s),
+        ("load (s)", load_s),
+    ])
+
+
+def bench_wal(matches: int) -> None:
+    """Upsert throughput with and without the mutation log (batched fsync)."""
+    start = date(2000, 1, 1)
+    payloads = [{
+        "id": str(i),
+        "home_team_id": str(i % 400),
+        "away_team_id": str((i * 7 + 1) % 400),
+        "league": f"League {i % 20}",
+        "match_date": str(start + timedelta(days=i % 9000)),
+        "home_score": i % 4,
+        "away_score": i % 3,
+        "is_historical": True,
+    } for i in range(matches)]
+
+    def run(kg: KnowledgeGraph) -> float:
+        began = time.perf_counter()
+        for payload in payloads:
+            kg.upsert_match(payload)
+        return (time.perf_counter() - began) / matches * 1e6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Best of 3 alternating runs: allocator warm-up otherwise favours the second
+        plain_us = logged_us = float("inf")
+        for attempt in range(3):
+            plain_us = min(plain_us, run(KnowledgeGraph()))
+            logged = KnowledgeGraph()
+            logged.open_log(os.path.join(tmp, f"run{attempt}", "graph.wal"))
+            logged_us = min(logged_us, run(logged))
+            logged.close_log()
+
+        began = time.perf_counter()
+        replayed = KnowledgeGraph()
+        replayed.open_log(os.path.join(tmp, "run2", "graph.wal"))
+        replay_s = time.perf_counter() - began
+        replayed.close_log()
+
+    assert replayed.stats() == logged.stats()
+    _report(f"wal — {matches:,} match upserts", [
+        ("upsert, no log (µs)", plain_us),
+        ("upsert, logged (µs)", logged_us),
+        ("overhead %", (logged_us / plain_us - 1) * 100),
+        ("replay (s)", replay_s),
+    ])
+
+
+def mock_upstreams(latency_s: float) -> httpx.MockTransport:
+    """Local stand-in for TheSportsDB / WeatherAPI / Nominatim, `latency_s` per call."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency_s)
+        path = request.url.path
+        if path.endswith("/searchteams.php"):
+            name = request.url.params["t"]
+            return httpx.Response(200, json={"teams": [{
+                "idTeam": name, "strTeam": name, "strLeague": "Ligue 1", "idLeague": "4334",
+                "strCountry": "France", "strStadium": f"{name} Stadium",
+            }]})
+        if path.endswith("/lookuptable.php"):
+            return httpx.Response(200, json={"table": [
+                {"strTeam": name, "intRank": str(rank), "intPoints": str(60 - 3 * rank)}
+                for rank, name in enumerate(["PSG", "OM", "Home 0", "Away 0"], start=1)
+            ]})
+        if path.endswith("/eventslast.php"):
+            team_id = request.url.params["id"]
+            return httpx.Response(200, json={"results": [{
+                "idEvent": f"{team_id}-{k}", "idHomeTeam": team_id, "idAwayTeam": f"Opponent {k}",
+                "strLeague": "Ligue 1", "dateEvent": f"2026-01-{10 + k}", "intHomeScore": str(k % 3), "intAwayScore": "1",
+            } for k in range(5)]})
+        if path.endswith("/current.json"):
+            return httpx.Response(200, json={"current": {
+                "temp_c": 12.0, "condition": {"text": "Light rain"}, "wind_kph": 10.0, "humidity": 80,
+            }})
+        if path.endswith("/search"):
+            return httpx.Response(200, json=[{"lat": "48.84", "lon": "2.25"}])
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler)
+
+
+def bench_enrich(latency_ms: float, matches: int) -> None:
+    """enrich_match wall time: concurrent fan-out vs. the previous sequential awaits."""
+    async def sequential(svc: DataIngestionService, raw: dict[str, Any]) -> None:
+        home = await svc.search_team(raw["_home_team_name"])
+        await svc.search_team(raw["_away_team_name"])
+        await svc.geocode(f"{home['stadium']}, {home['country']}")
+        await svc.get_weather(home["stadium"])
+
+    async def run() -> list[tuple[str, float]]:
+        transport = mock_upstreams(latency_ms / 1000)
+        raws = [{"id": str(i), "_home_team_name": f"Home {i}", "_away_team_name": f"Away {i}"} for i in range(matches)]
+
+        async def timed(enrich: Callable[[DataIngestionService, dict[str, Any]], Any], svc: DataIngestionService) -> float:
+            began = time.perf_counter()
+            for raw in raws:
+                await enrich(svc, dict(raw))
+            return (time.perf_counter() - began) / matches * 1000
+
+        # Fresh service (empty response cache) per cold run
+        def service() -> DataIngestionService:
+            return DataIngestionService(httpx.AsyncClient(transport=transport), pacing=False)
+
+        cached = service()
+        rows = [
+            ("sequential (ms/match)", await timed(sequential, service())),
+            ("concurrent (ms/match)", await timed(DataIngestionService.enrich_match, cached)),
+            ("concurrent, warm cache (ms/match)", await timed(DataIngestionService.enrich_match, cached)),
+        ]
+        svc = service()
+        began = time.perf_counter()
+        await asyncio.gather(*(svc.enrich_match(dict(raw)) for raw in raws))
+        rows.append((f"{matches} matches gathered (ms)", (time.perf_counter() - began) * 1000))
+        return rows
+
+    _report(f"enrich — mock upstreams at {latency_ms:.0f} ms per call", asyncio.run(run()))
+
+
+def _site_payload(rnd: random.Random, groups: int, matches: int) -> dict[str, Any]:
+    """A PronoScope /matches body: `groups` leagues of up to `matches` matches, keys in random order."""
+    def shuffled(obj: dict[str, Any]) -> dict[str, Any]:
+        items = list(obj.items())
+        rnd.shuffle(items)
+        return dict(items)
+
+    leagues = []
+    for g in range(groups):
+        group_matches = []
+        for k in range(rnd.randint(0, matches)):
+            m = {"id": rnd.randrange(10**6), "homeTeam": f"Home {g}-{k}", "awayTeam": f"Away {g}-{k}",
+                 "date": "2026-02-15", "time": "20:45", "status": "NS", "homeTeamLogo": None}
+            if rnd.random() < 0.3:
+                m["league"] = f"Cup {g}-{k}"
+            group_matches.append(shuffled(m))
+        group = {"league": f"League {g}", "country": "France", "matches": group_matches}
+        if rnd.random() < 0.1:
+            del group["league"]
+        leagues.append(shuffled(group))
+    return shuffled({"success": rnd.random() < 0.9, "date": "2026-02-15", "leagues": leagues})
+
+
+def _parse_site_body(data: dict[str, Any]) -> list[dict[str, Any]]:
+    """Reference: iter_site_matches' output from the fully parsed body."""
+    if not data.get("success"):
+        return []
+    return [{
+        "id": str(m.get("id", "")),
+        "home_team_id": "",
+        "away_team_id": "",
+        "league": m.get("league", group.get("league", "")),
+        "match_date": m.get("date", str(date.today())),
+        "kick_off": m.get("time"),
+        "status": m.get("status", "NS"),
+        "_home_team_name": m.get("homeTeam", ""),
+        "_away_team_name": m.get("awayTeam", ""),
+        "_home_team_logo": m.get("homeTeamLogo"),
+        "_away_team_logo": m.get("awayTeamLogo"),
+    } for group in data.get("leagues", []) for m in group.get("matches", [])]
+
+
+def bench_sitestream(payloads: int) -> None:
+    """
+    iter_site_matches against json.loads: identical output, in order, for
+    bodies with keys in random order split into random chunks; then time to
+    first match vs. full parse on one large body.
+    """
+    rnd = random.Random(7)
+
+    class Chunked(httpx.AsyncByteStream):
+        def __init__(self, body: bytes, max_chunk: int) -> None:
+            self.body = body
+            self.max_chunk = max_chunk
+
+        async def __aiter__(self) -> Any:
+            i = 0
+            while i < len(self.body):
+                n = rnd.randint(1, self.max_chunk)
+                yield self.body[i:i + n]
+                i += n
+
+    async def streamed(body: bytes, max_chunk: int) -> tuple[list[dict[str, Any]], float, float]:
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=Chunked(body, max_chunk)))
+        svc = DataIngestionService(httpx.AsyncClient(transport=transport), pacing=False)
+        began = time.perf_counter()
+        first = None
+        out = []
+        async for m in svc.iter_site_matches():
+            first = first or time.perf_counter() - began
+            out.append(m)
+        await svc.close()
+        return out, first or 0.0, time.perf_counter() - began
+
+    async def run() -> list[tuple[str, float]]:
+        compared = 0
+        for _ in range(payloads):
+            data = _site_payload(rnd, groups=rnd.randint(0, 4), matches=6)
+            body = json.dumps(data, indent=rnd.choice([None, 2])).encode()
+            out, _, _ = await streamed(body, max_chunk=rnd.choice([1, 7, 64, 4096]))
+            expected = _parse_site_body(json.loads(body))
+            assert out == expected, f"streamed site matches differ from json.loads for {body[:200]!r}"
+            compared += len(expected)
+
+        # "success" first: matches can stream out as soon as they arrive
+        data = _site_payload(rnd, groups=40, matches=100)
+        del data["success"]
+        data = {"success": True, **data}
+        body = json.dumps(data).encode()
+        out, first_s, full_s = await streamed(body, max_chunk=16_384)
+        began = time.perf_counter()
+        expected = _parse_site_body(json.loads(body))
+        loads_s = time.perf_counter() - began
+        assert out == expected
+        return [
+            ("payloads checked", payloads),
+            ("matches compared", compared),
+            ("matches in large body", len(out)),
+            ("first match, streamed (ms)", first_s * 1000),
+            ("full list, streamed (ms)", full_s * 1000),
+            ("full list, json.loads (ms)", loads_s * 1000),
+        ]
+
+    _report("sitestream — streamed match list vs. json.loads (keys in random order)", asyncio.run(run()))
+
+
+def bench_ratelimit(requests: int, server_rate: float) -> None:
+    """
+    A fake upstream allowing `server_rate` req/s (429 + Retry-After: 1 beyond
+    it): paced client vs. unpaced client relying on retries alone.
+    """
+    host = "api.fake.test"
+
+    def fake_server() -> tuple[httpx.MockTransport, dict[str, int]]:
+        counts = {"ok": 0, "429": 0}
+        state = {"tokens": server_rate, "updated": time.monotonic()}
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.005)
+            now = time.monotonic()
+            state["tokens"] = min(server_rate, state["tokens"] + (now - state["updated"]) * server_rate)
+            state["updated"] = now
+            if state["tokens"] < 1:
+                counts["429"] += 1
+                return httpx.Response(429, headers={"Retry-After": "1"})
+            state["tokens"] -= 1
+            counts["ok"] += 1
+            return httpx.Response(200, json={})
+
+        return httpx.MockTransport(handler), counts
+
+    async def run(pacing: bool) -> list[tuple[str, float]]:
+        transport, counts = fake_server()
+        svc = DataIngestionService(
+            httpx.AsyncClient(transport=transport),
+            pacing=pacing,
+            host_rates={host: (server_rate * 0.95, 1)},
+        )
+        began = time.perf_counter()
+        responses = await asyncio.gather(*(svc._get(f"https://{host}/item/{i}") for i in range(requests)))
+        elapsed = time.perf_counter() - began
+        ok = sum(r.status_code == 200 for r in responses)
+        label = "paced" if pacing else "unpaced"
+        return [
+            (f"{label}: succeeded", ok),
+            (f"{label}: 429s received", counts["429"]),
+            (f"{label}: wall time (s)", elapsed),
+            (f"{label}: throughput (req/s)", ok / elapsed),
+        ]
+
+    async def both() -> list[tuple[str, float]]:
+        return await run(pacing=True) + await run(pacing=False)
+
+    _report(f"ratelimit — {requests} requests, server allows {server_rate:g} req/s", asyncio.run(both()))
+
+
+def bench_scoring(matches: int) -> None:
+    """synthesize per match vs. score_batch (the backtest's path) over the same contexts, and their parity."""
+    rnd = random.Random(42)
+    contexts = [ReasoningContext()]  # no factors: confidence 50
+    for _ in range(matches - 1):
+        ctx = ReasoningContext()
+        for role in ("home", "away"):
+            ctx.add_step(f"team:{role}", "form", rnd.choice([0.85, 0.7, 0.8, 0.4]))
+            ctx.signals[f"{role}_form"] = rnd.choice(["excellent", "good", "terrible", "mixed", "unknown"])
+            if rnd.random() < 0.7:
+                ctx.add_step(f"team:{role}", "ranking", 0.3)
+                ctx.signals[f"{role}_ranking"] = rnd.randrange(1, 21)
+            if rnd.random() < 0.2:
+                ctx.add_step(f"team:{role}", "absences", 0.75)
+                ctx.signals[f"{role}_key_absences"] = rnd.randrange(1, 3)
+        ctx.add_step("graph:h2h", "h2h", 0.7)
+        ctx.signals["h2h_home_wins"] = rnd.randrange(4)
+        ctx.signals["h2h_away_wins"] = rnd.randrange(4)
+        contexts.append(ctx)
+
+    engine = ReasoningEngine()
+    scalar = [engine.synthesize(ctx) for ctx in contexts]
+    scores = engine.score_batch(SignalBatch.from_contexts(contexts))
+    batched = zip(*(scores[k].tolist() for k in ("direction", "confidence", "home_score", "away_score")))
+    for synthesis, (direction, confidence, home_score, away_score) in zip(scalar, batched):
+        assert (DIRECTIONS[direction], round(confidence, 1), round(home_score, 2), round(away_score, 2)) == (
+            synthesis["direction"], synthesis["confidence"], synthesis["home_score"], synthesis["away_score"]
+        ), synthesis
+
+    rows = []
+    for size in sorted({min(n, matches) for n in (256, BACKTEST_CHUNK, matches)}):
+        sample = contexts[:size]
+        rows += [
+            (f"{size:,} synthesize, per match (ms)", _timeit(lambda: [engine.synthesize(ctx) for ctx in sample], 5) / 1000),
+            (f"{size:,} score_batch (ms)", _timeit(lambda: engine.score_batch(SignalBatch.from_contexts(sample)), 5) / 1000),
+        ]
+    _report(f"scoring — {matches:,} contexts, identical", rows)
+
+
+def bench_backtest(leagues: int, seasons: int, workers: int) -> None:
+    """Season replay, in-process vs. across `workers` processes."""
+    kg = build_seasons(leagues, seasons)
+    rows: list[tuple[str, float]] = []
+    results = []
+    for n in sorted({1, workers}):
+        report = backtest(kg, workers=n)
+        results.append({k: v for k, v in report.items() if k not in ("timings_s", "fixtures_per_min", "workers")})
+        timings = report["timings_s"]
+        rows += [
+            (f"workers={n}: prepare (s)", timings["prepare"]),
+            (f"workers={n}: reason+score wall (s)", timings["pool"]),
+            (f"workers={n}: settle (s)", timings["settle"]),
+            (f"workers={n}: fixtures / min", report["fixtures_per_min"]),
+        ]
+
+    assert all(r == results[0] for r in results)
+    summary = results[0]
+    rows += [("hit rate (%)", summary["hit_rate"] * 100), ("ROI (%)", summary["roi"] * 100)]
+
+    # Stored tips: a home-win tip on every match, plus one on a fixture not played yet
+    matches = [kg.get_node_data(nid) for nid in kg.get_nodes_by_type("match")]
+    for m in matches:
+        kg.add_tip(Tip(match_id=m["id"], market="1X2", selection="1", confidence=60))
+    first = matches[0]
+    kg.add_match(MatchNode(**{**first, "id": "upcoming", "home_score": None, "away_score": None, "is_historical": False}))
+    kg.add_tip(Tip(match_id="upcoming", market="1X2", selection="1", confidence=60))
+    began = time.perf_counter()
+    settled = settle_tips(kg)
+    rows.append(("settle_tips (s)", time.perf_counter() - began))
+    home_wins = sum(m["home_score"] > m["away_score"] for m in matches)
+    assert settled == {"won": home_wins, "lost": len(matches) - home_wins, "pending": 1}, settled
+    assert settle_tips(kg) == {"won": 0, "lost": 0, "pending": 1}
+    _report(f"backtest — {summary['fixtures']:,} fixtures ({leagues} leagues × {seasons} seasons)", rows)
+
+
+def bench_concurrency(readers: int, writers: int, seconds: float) -> None:
+    """
+    Stress test of the graph's reader/writer lock. Writers add a match and
+    its tip in one write batch; a reloader captures, saves and reloads
+    snapshots. Readers check, under kg.read(), that the graph is never seen
+    mid-batch: one tip per added match, every tip linked from its match, the
+    edge counter matching the edges, similarity search completing. The same
+    readers without kg.read() show what the lock prevents.
+    """
+    def run(locked: bool) -> dict[str, Any]:
+        kg = build_seasons(2, 1)
+        base = kg.count_nodes_by_type("match")
+        teams = [nid.split(":", 1)[1] for nid in kg.get_nodes_by_type("team")]
+        stop = threading.Event()
+        counts = {"reads": 0, "batches": 0, "reloads": 0, "violations": 0, "errors": 0}
+        read_ms: list[float] = []
+        mutex = threading.Lock()
+
+        def writer(w: int) -> None:
+            rnd = random.Random(w)
+            i = 0
+            while not stop.is_set():
+                home, away = rnd.sample(teams, 2)
+                match = MatchNode(
+                    id=f"w{w}_{i}", home_team_id=home, away_team_id=away, league="League 0",
+                    match_date=date(2001, 1, 1) + timedelta(days=i % 300),
+                    home_score=rnd.randrange(4), away_score=rnd.randrange(4), is_historical=True,
+                )
+                with kg.write_batch():
+                    kg.add_match(match)
+                    kg.add_tip(Tip(match_id=match.id, market="1X2", selection="1", confidence=50))
+                i += 1
+                with mutex:
+                    counts["batches"] += 1
+
+        def reloader() -> None:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "graph.skg")
+                while not stop.is_set():
+                    kg.save_snapshot(path)
+                    kg.load_snapshot(path)
+                    with mutex:
+                        counts["reloads"] += 1
+                    time.sleep(0.05)
+
+        def check() -> bool:
+            tips = kg.get_nodes_by_type("tip")
+            if len(tips) != kg.count_nodes_by_type("match") - base:
+                return False
+            if kg.stats()["total_edges"] != sum(1 for _ in kg.graph.edges()):
+                return False
+            for tip_nid in tips[-50:]:
+                if not kg.get_incoming(tip_nid, EdgeType.GENERATES_TIP):
+                    return False
+            if tips:
+                kg.find_similar_matches(f"match:{kg.get_node_data(tips[-1])['match_id']}")
+            return True
+
+        def reader(r: int) -> None:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    if locked:
+                        with kg.read():
+                            ok = check()
+                    else:
+                        ok = check()
+                except Exception:
+                    ok = None
+                elapsed = (time.perf_counter() - started) * 1000
+                with mutex:
+                    counts["reads"] += 1
+                    read_ms.append(elapsed)
+                    if ok is None:
+                        counts["errors"] += 1
+                    elif not ok:
+                        counts["violations"] += 1
+
+        threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+        threads += [threading.Thread(target=reader, args=(r,)) for r in range(readers)]
+        threads.append(threading.Thread(target=reloader))
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        read_ms.sort()
+        return {**counts, "p99_ms": read_ms[int(len(read_ms) * 0.99)] if read_ms else 0.0}
+
+    locked, unlocked = run(locked=True), run(locked=False)
+    rows = []
+    for label, r in (("kg.read()", locked), ("no lock", unlocked)):
+        rows += [
+            (f"{label}: reads", r["reads"]),
+            (f"{label}: inconsistent reads", r["violations"]),
+            (f"{label}: reads that raised", r["errors"]),
+            (f"{label}: read p99 (ms)", r["p99_ms"]),
+        ]
+    _report(
+        f"concurrency — {readers} readers, {writers} writers, 1 reloader, {seconds:g}s "
+        f"({locked['batches']:,} write batches, {locked['reloads']} reloads)",
+        rows,
+    )
+    assert locked["violations"] == 0 and locked["errors"] == 0, locked
+
+
+def bench_memo(leagues: int, seasons: int, repeat: int) -> None:
+    """Repeated analyze() of one fixture: remembered result vs. full analysis, and invalidation."""
+    kg = build_seasons(leagues, seasons)
+    analyzer = MatchAnalyzer(kg)
+    match = kg.get_node_data(kg.get_nodes_by_type("match")[-1])
+    teams = []
+    for key in ("home_team_id", "away_team_id"):
+        data = kg.get_node_data(f"team:{match[key]}")
+        teams.append({k: v for k, v in data.items() if k not in ("node_id", "form_score")})
+    players = [
+        {"id": f"bench-{k}", "name": f"Player {k}", "team_id": teams[0]["id"], "position": "FWD", "importance": "High"}
+        for k in range(11)
+    ]
+    fixture = {"match_id": f"match:{match['id']}", "home_team": teams[0], "away_team": teams[1], "home_players": players}
+
+    def full() -> dict[str, Any]:
+        analyzer._results.clear()
+        return analyzer.analyze(**fixture)
+
+    def strip(result: dict[str, Any]) -> dict[str, Any]:
+        return {**result, "graph_stats": None, "tip": {**result["tip"], "created_at": None}}
+
+    analyzer.analyze(**fixture)
+    remembered_us = _timeit(lambda: analyzer.analyze(**fixture), repeat)
+    home, away = analyzer.prepare(fixture["match_id"], teams[0], teams[1], None, players)
+    lookup_us = _timeit(lambda: analyzer.cached(fixture["match_id"], home, away), repeat)
+    full_us = _timeit(full, max(repeat // 10, 1))
+
+    # Each mutation either keeps the remembered result or invalidates it; both must equal a full analysis
+    other = next(t for t in kg.get_nodes_by_type("team") if t not in (f"team:{home['id']}", f"team:{away['id']}"))
+    mutations = [
+        ("key player injured", lambda: analyzer.ingest_player({**players[0], "injury_status": "out"})),
+        ("form of another team", lambda: kg.upsert_team({**kg.get_node_data(other), "form": ["L"] * 5})),
+        ("home team form", lambda: analyzer.ingest_team({**teams[0], "form": ["W"] * 5})),
+    ]
+    for label, mutate in mutations:
+        mutate()
+        hits = analyzer.result_stats()["hits"]
+        remembered = analyzer.analyze(**fixture)
+        kept = analyzer.result_stats()["hits"] > hits
+        assert strip(remembered) == strip(full())
+        analyzer.analyze(**fixture)
+        print(f"  after {label}: {'kept' if kept else 'recomputed'}")
+
+    # Two requests interleaved as AnalysisExecutor runs them (prepare both, evaluate
+    # both, conclude the second first): neither result may be kept for the other's payload
+    def prepare(form: list[str]) -> tuple[Any, ...]:
+        home, away = analyzer.prepare(fixture["match_id"], {**teams[0], "form": form}, teams[1])
+        return home, away, analyzer.prepared_version(fixture["match_id"], home, away)
+
+    def evaluate(home: dict[str, Any], away: dict[str, Any]) -> tuple[Any, ...]:
+        [evaluation] = analyzer.evaluate([(fixture["match_id"], {"home_team": home, "away_team": away})])
+        return evaluation, analyzer.version(fixture["match_id"], home, away, evaluation[2])
+
+    def conclude(home: dict[str, Any], away: dict[str, Any], prepared: Any, evaluation: Any, version: Any) -> None:
+        result = analyzer.conclude(fixture["match_id"], *evaluation)
+        analyzer.remember(fixture["match_id"], home, away, None, version, result, prepared)
+
+    first, second = prepare(["W"] * 5), prepare(["L"] * 5)
+    evaluations = [evaluate(*first[:2]), evaluate(*second[:2])]
+    conclude(*second, *evaluations[1])
+    conclude(*first, *evaluations[0])
+    third = {**fixture, "home_team": {**teams[0], "form": ["L"] * 5}}
+    remembered = analyzer.analyze(**third)
+    analyzer._results.clear()
+    assert strip(remembered) == strip(analyzer.analyze(**third))
+    print("  interleaved requests: consistent")
+
+    # More teams than the feature cache holds: it stays bounded, evicted teams are recomputed alike
+    bound = 16
+    all_teams = [kg.get_node_data(nid) for nid in kg.get_nodes_by_type("team")]
+    with mock.patch.object(analyzer_module, "FEATURE_CACHE_SIZE", bound):
+        for _ in range(2):
+            for team in all_teams:
+                for role in ("home", "away"):
+                    cached_ctx, fresh_ctx = ReasoningContext(), ReasoningContext()
+                    analyzer._team_form(cached_ctx, team, role)
+                    analyzer.reasoning.analyze_team_form(fresh_ctx, team, role)
+                    assert (cached_ctx.steps, cached_ctx.signals) == (fresh_ctx.steps, fresh_ctx.signals)
+                    assert analyzer.feature_stats()["teams"] <= bound
+    print(f"  feature cache: bounded at {bound} entries over {len(all_teams)} teams")
+
+    _report(f"memo — {kg.node_count:,} nodes", [
+        ("analyze, remembered (us)", remembered_us),
+        ("  cached() lookup (us)", lookup_us),
+        ("analyze, full (us)", full_us),
+    ])
+    bench_quick_memo()
+
+
+def bench_quick_memo() -> None:
+    """Identical /analyze/quick requests (mock upstreams): every one after the first is a memo hit."""
+    import graph.main as app  # module-level graph / executor of the API
+
+    app.ingestion = DataIngestionService(httpx.AsyncClient(transport=mock_upstreams(0)), pacing=False)
+    request = app.QuickAnalyzeRequest(home_team_name="PSG", away_team_name="OM")
+
+    async def run() -> list[bool]:
+        hits = []
+        for _ in range(3):
+            before = app.executor.stats()["results"]["hits"]
+            await app.quick_analyze(request)
+            hits.append(app.executor.stats()["results"]["hits"] > before)
+        return hits
+
+    hits = asyncio.run(run())
+    assert hits == [False, True, True], hits
+    print("  quick request repeated: remembered")
+
+
+def bench_workers(fixtures: int, batches: int, processes: int) -> None:
+    """
+    analyze_batch on workers forked once at startup vs. reader threads: the
+    workers replay every batch's mutations, results must be identical.
+    """
+    threads = AnalysisExecutor(MatchAnalyzer(build_seasons(2, 2)), processes=0)
+    forked = AnalysisExecutor(MatchAnalyzer(build_seasons(2, 2)), processes=processes, process_min_fixtures=1)
+    # Before either executor has started a thread
+    assert forked.start_workers() == processes, "fork start method unavailable"
+    teams = [forked.analyzer.kg.get_node_data(t) for t in forked.analyzer.kg.get_nodes_by_type("team")]
+    rnd = random.Random(7)
+
+    def batch(number: int) -> list[dict[str, Any]]:
+        # Each batch changes the teams' form and standings: stale workers would reason on the old ones
+        payloads = []
+        for i in range(fixtures):
+            home, away = rnd.sample(teams, 2)
+            payloads.append({
+                "match": {
+                    "id": f"w{number}-{i}", "home_team_id": home["id"], "away_team_id": away["id"],
+                    "league": home["league"], "match_date": "2030-01-05",
+                },
+                **{
+                    side: {
+                        "id": team["id"], "name": team["name"], "league": team["league"], "country": team["country"],
+                        "form": rnd.choices("WDL", k=5), "ranking": rnd.randint(1, 20),
+                    }
+                    for side, team in (("home_team", home), ("away_team", away))
+                },
+            })
+        return payloads
+
+    def strip(result: dict[str, Any]) -> dict[str, Any]:
+        return {**result, "graph_stats": None, "tip": {**result["tip"], "created_at": None}}
+
+    async def run(executor: AnalysisExecutor, payloads: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], float]:
+        start = time.perf_counter()
+        results = [strip(r) async for r in executor.analyze_batch(payloads)]
+        return results, (time.perf_counter() - start) * 1000
+
+    async def compare() -> tuple[float, float]:
+        threads_ms = forked_ms = 0.0
+        for number in range(batches):
+            payloads = batch(number)
+            expected, elapsed = await run(threads, payloads)
+            threads_ms += elapsed
+            results, elapsed = await run(forked, payloads)
+            forked_ms += elapsed
+            assert results == expected, f"batch {number}: workers diverged from the graph"
+        return threads_ms / batches, forked_ms / batches
+
+    try:
+        threads_ms, forked_ms = asyncio.run(compare())
+        stats = forked.stats()
+    finally:
+        threads.close()
+        forked.close()
+    assert stats["process_batches"] == batches
+    print(f"  {batches} batches: workers identical to reader threads")
+    _report(f"workers — {fixtures} fixtures per batch, {processes} processes", [
+        ("fork at startup (ms)", stats["fork_ms"]),
+        ("batch, reader threads (ms)", threads_ms),
+        ("batch, forked workers (ms)", forked_ms),
+        ("feed records pending", stats["feed"]),
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shannon Knowledge Graph benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    adjacency = sub.add_parser("adjacency", help="Typed adjacency index vs. edge scan")
+    adjacency.add_argument("--fixtures", type=int, default=5000)
+
+    similarity = sub.add_parser("similarity", help="Indexed find_similar_matches vs. the full scan, parity under updates")
+    similarity.add_argument("--matches", type=int, default=50_000)
+    similarity.add_argument("--queries", type=int, default=50)
+
+    memory = sub.add_parser("memory", help="Node storage footprint: dicts vs. compact records")
+    memory.add_argument("--matches", type=int, default=1_000_000)
+
+    snapshot = sub.add_parser("snapshot", help="Snapshot save / warm-start load time")
+    snapshot.add_argument("--matches", type=int, default=1_000_000)
+    snapshot.add_argument("--compact", action="store_true")
+
+    wal = sub.add_parser("wal", help="Mutation log overhead and replay time")
+    wal.add_argument("--matches", type=int, default=50_000)
+
+    enrich = sub.add_parser("enrich", help="enrich_match fan-out against a mock transport")
+    enrich.add_argument("--latency-ms", type=float, default=80.0)
+    enrich.add_argument("--matches", type=int, default=20)
+
+    sitestream = sub.add_parser("sitestream", help="Streamed PronoScope match list: parity with json.loads, time to first match")
+    sitestream.add_argument("--payloads", type=int, default=500)
+
+    ratelimit = sub.add_parser("ratelimit", help="Token-bucket pacing vs. retries alone against a 429-ing fake server")
+    ratelimit.add_argument("--requests", type=int, default=200)
+    ratelimit.add_argument("--server-rate", type=float, default=50.0)
+
+    scoring = sub.add_parser("scoring", help="Scalar synthesize vs. vectorized score_batch, parity")
+    scoring.add_argument("--matches", type=int, default=100_000)
+
+    backtest_ = sub.add_parser("backtest", help="Season replay of historical matches, single vs. multi-process")
+    backtest_.add_argument("--leagues", type=int, default=20)
+    backtest_.add_argument("--seasons", type=int, default=3)
+    backtest_.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    concurrency = sub.add_parser("concurrency", help="Reader/writer lock stress test (consistent reads under writes and reloads)")
+    concurrency.add_argument("--readers", type=int, default=4)
+    concurrency.add_argument("--writers", type=int, default=2)
+    concurrency.add_argument("--seconds", type=float, default=5.0)
+
+    memo = sub.add_parser("memo", help="analyze() result memo: remembered vs. full analysis, invalidation, repeated quick requests")
+    memo.add_argument("--leagues", type=int, default=4)
+    memo.add_argument("--seasons", type=int, default=6)
+    memo.add_argument("--repeat", type=int, default=500)
+
+    workers = sub.add_parser("workers", help="analyze_batch on workers forked at startup vs. reader threads, parity")
+    workers.add_argument("--fixtures", type=int, default=400)
+    workers.add_argument("--batches", type=int, default=4)
+    workers.add_argument("--processes", type=int, default=2)
+
+    args = parser.parse_args()
+    if args.bench == "adjacency":
+        bench_adjacency(args.fixtures)
+    elif args.bench == "similarity":
+        bench_similarity(args.matches, args.queries)
+    elif args.bench == "memory":
+        bench_memory(args.matches)
+    elif args.bench == "snapshot":
+        bench_snapshot(args.matches, args.compact)
+    elif args.bench == "wal":
+        bench_wal(args.matches)
+    elif args.bench == "enrich":
+        bench_enrich(args.latency_ms, args.matches)
+    elif args.bench == "sitestream":
+        bench_sitestream(args.payloads)
+    elif args.bench == "ratelimit":
+        bench_ratelimit(args.requests, args.server_rate)
+    elif args.bench == "scoring":
+        bench_scoring(args.matches)
+    elif args.bench == "backtest":
+        bench_backtest(args.leagues, args.seasons, args.workers)
+    elif args.bench == "concurrency":
+        bench_concurrency(args.readers, args.writers, args.seconds)
+    elif args.bench == "memo":
+        bench_memo(args.leagues, args.seasons, args.repeat)
+    elif args.bench == "workers":
+        bench_workers(args.fixtures, args.batches, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,14 +9,29 @@ ReasoningPath explaining WHY the prediction was made.
 from __future__ import annotations
 
 import logging
-from typing import Any
+import threading
+from typing import Any, Iterable, Iterator, Optional
 
-from graph.models import MatchNode, Team, Tip
-from graph.engine.knowledge_graph import KnowledgeGraph, EdgeType
-from graph.engine.reasoning import ReasoningEngine, ReasoningContext
+from graph.models import Tip
+from graph.engine.knowledge_graph import EdgeType, KnowledgeGraph
+from graph.engine.names import name_key
+from graph.engine.reasoning import ReasoningEngine, ReasoningContext, TeamFeatures
 
 logger = logging.getLogger("shannon.analyzer")
 
+# Fixtures evaluated per step of analyze_batch
+# (bounds the delay before the first streamed result)
+BATCH_CHUNK = 256
+
+# Similar historical matches listed per analysis
+SIMILAR_MATCHES = 5
+
+# analyze() results remembered for unchanged fixtures (oldest dropped first)
+RESULT_CACHE_SIZE = 1024
+
+# (team, role) feature entries kept by _team_form (oldest dropped first)
+FEATURE_CACHE_SIZE = 4096
+
 
 class MatchAnalyzer:
     """
@@ -31,18 +46,30 @@ class MatchAnalyzer:
     def __init__(self, kg: KnowledgeGraph | None = None) -> None:
         self.kg = kg or KnowledgeGraph()
         self.reasoning = ReasoningEngine()
+        # (team ID, role) → (team node stamp, form inputs, features): see _team_form
+        self._features: dict[tuple[str, str], tuple[int, tuple[Any, ...], TeamFeatures]] = {}
+        self._features_lock = threading.Lock()
+        self._feature_counts = {"hits": 0, "misses": 0}
+        # (match node ID, home ID, away ID, h2h_limit) → (analysis stamps, with_results, tip node ID, tip stamp, result)
+        self._results: dict[tuple[Any, ...], tuple[Any, ...]] = {}
+        self._result_counts = {"hits": 0, "misses": 0}
 
     # ─── Graph Population ────────────────────────────
 
     def ingest_team(self, team_data: dict[str, Any]) -> str:
         """Ingest raw team data dict into the graph. Returns node_id."""
-        team = Team(**team_data)
-        return self.kg.add_team(team)
+        node_id, _ = self.kg.upsert_team(team_data)
+        return node_id
 
     def ingest_match(self, match_data: dict[str, Any]) -> str:
         """Ingest raw match data dict into the graph. Returns node_id."""
-        match = MatchNode(**match_data)
-        return self.kg.add_match(match)
+        node_id, _ = self.kg.upsert_match(match_data)
+        return node_id
+
+    def ingest_player(self, player_data: dict[str, Any]) -> str:
+        """Ingest raw player data dict into the graph. Returns node_id."""
+        node_id, _ = self.kg.upsert_player(player_data)
+        return node_id
 
     def ingest_historical_matches(
         self,
@@ -50,21 +77,59 @@ class MatchAnalyzer:
         home_team_id: str,
         away_team_id: str,
     ) -> list[str]:
-        """Ingest H2H historical matches and link them."""
-        node_ids = []
-        for m in matches:
-            m["is_historical"] = True
-            nid = self.ingest_match(m)
-            node_ids.append(nid)
-
-        # Link H2H matches to each other
-        for i, nid_a in enumerate(node_ids):
-            for nid_b in node_ids[i + 1:]:
-                self.kg.link(nid_a, nid_b, EdgeType.HISTORICAL_H2H, weight=0.8)
-                self.kg.link(nid_b, nid_a, EdgeType.HISTORICAL_H2H, weight=0.8)
+        """Ingest H2H historical matches and chain them by date."""
+        node_ids = [self.ingest_match({**m, "is_historical": True}) for m in matches]
+
+        # Date-ordered HISTORICAL_H2H chain: linear in edges, no-op when re-ingested
+        self.kg.chain_h2h(home_team_id, away_team_id, node_ids)
 
         return node_ids
 
+    def ingest_standings(self, rows: list[dict[str, Any]], league: Optional[str] = None) -> dict[str, int]:
+        """Apply a league table (get_league_table rows) to the teams already in the graph."""
+        counts = self.kg.apply_standings(rows, league)
+        if counts["updated"]:
+            logger.info(f"Standings{f' ({league})' if league else ''}: {counts}")
+        return counts
+
+    def ingest_teams(
+        self,
+        teams: list[dict[str, Any]],
+        tables: dict[str, list[dict[str, Any]]],
+    ) -> list[dict[str, Any]]:
+        """
+        Ingest teams with their leagues' standings (league → get_league_table rows).
+
+        Each team takes ranking / points from its own row (else from its node)
+        before the upsert, so re-ingesting unchanged teams and tables leaves
+        the graph untouched. Returns the filled team dicts.
+        """
+        filled = []
+        for team in teams:
+            row = _standings_row(team, tables.get(team.get("league", ""), ()))
+            if row is not None:
+                team = {**team, "ranking": row.get("ranking"), "points": row.get("points")}
+            else:
+                team = self._with_standings(team)
+            self.ingest_team(team)
+            filled.append(team)
+        for league, rows in tables.items():
+            self.ingest_standings(rows, league)
+        return filled
+
+    def _with_standings(self, team: dict[str, Any]) -> dict[str, Any]:
+        """Fill a team dict's missing ranking / points from its node (e.g. set by standings)."""
+        if team.get("ranking") is not None and team.get("points") is not None:
+            return team
+        data = self.kg.get_node_data(f"team:{team['id']}")
+        if data is None:
+            return team
+        filled = dict(team)
+        for field in ("ranking", "points"):
+            if filled.get(field) is None and data.get(field) is not None:
+                filled[field] = data[field]
+        return filled
+
     # ─── Analysis Pipeline ───────────────────────────
 
     def analyze(
@@ -75,6 +140,7 @@ class MatchAnalyzer:
         h2h_history: list[dict[str, Any]] | None = None,
         home_players: list[dict[str, Any]] | None = None,
         away_players: list[dict[str, Any]] | None = None,
+        h2h_limit: int | None = None,
     ) -> dict[str, Any]:
         """
         Full analysis pipeline for a single match.
@@ -86,6 +152,7 @@ class MatchAnalyzer:
             h2h_history: List of historical match dicts
             home_players: List of home team player dicts
             away_players: List of away team player dicts
+            h2h_limit: Only weigh the N most recent H2H matches (default: all)
 
         Returns:
             {
@@ -94,12 +161,37 @@ class MatchAnalyzer:
                 "graph_stats": graph statistics,
                 "similar_matches": top similar matches found,
             }
+
+        The payloads are ingested on every call. When nothing the analysis
+        reads has changed since the last one of the same fixture, its result
+        is returned again (see cached) and the tip is not rewritten.
         """
+        home_team, away_team = self.prepare(match_id, home_team, away_team, h2h_history, home_players, away_players)
+        cached = self.cached(match_id, home_team, away_team, h2h_limit)
+        if cached is not None:
+            return cached
+        result = self._evaluate(match_id, home_team, away_team, h2h_limit)
+        version = self.version(match_id, home_team, away_team, result["similar_matches"])
+        self.remember(match_id, home_team, away_team, h2h_limit, version, result)
+        return result
+
+    def prepare(
+        self,
+        match_id: str,
+        home_team: dict[str, Any],
+        away_team: dict[str, Any],
+        h2h_history: list[dict[str, Any]] | None = None,
+        home_players: list[dict[str, Any]] | None = None,
+        away_players: list[dict[str, Any]] | None = None,
+    ) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Steps 1-3 of analyze(): ingest what it reads. Returns both team dicts with standings filled."""
         logger.info(f"Analyzing match {match_id}")
 
-        # Step 1: Ensure teams are in the graph
-        home_nid = self.ingest_team(home_team)
-        away_nid = self.ingest_team(away_team)
+        # Step 1: Ensure teams are in the graph (standings fill gaps in the payloads)
+        home_team = self._with_standings(home_team)
+        away_team = self._with_standings(away_team)
+        self.ingest_team(home_team)
+        self.ingest_team(away_team)
 
         # Step 2: Ingest H2H if provided
         if h2h_history:
@@ -110,29 +202,55 @@ class MatchAnalyzer:
             )
 
         # Step 3: Ingest players
-        if home_players:
-            from graph.models import Player
-            for p in home_players:
-                player = Player(**p)
-                self.kg.add_player(player)
-        if away_players:
-            from graph.models import Player
-            for p in away_players:
-                player = Player(**p)
-                self.kg.add_player(player)
+        for p in (home_players or []) + (away_players or []):
+            self.ingest_player(p)
+
+        return home_team, away_team
+
+    def _evaluate(
+        self,
+        match_id: str,
+        home_team: dict[str, Any],
+        away_team: dict[str, Any],
+        h2h_limit: int | None = None,
+        squads: Optional[dict[str, list[dict[str, Any]]]] = None,
+    ) -> dict[str, Any]:
+        """Steps 4-9 of analyze(): traverse the graph, reason, emit the Tip."""
+        ctx = self._reason(match_id, home_team, away_team, h2h_limit, squads)
+        return self._conclude(match_id, ctx, self.reasoning.synthesize(ctx))
+
+    def _reason(
+        self,
+        match_id: str,
+        home_team: dict[str, Any],
+        away_team: dict[str, Any],
+        h2h_limit: int | None = None,
+        squads: Optional[dict[str, list[dict[str, Any]]]] = None,
+    ) -> ReasoningContext:
+        """Steps 4-5: collect the match's signals from the graph."""
+        home_nid = f"team:{home_team['id']}"
+        away_nid = f"team:{away_team['id']}"
 
         # Step 4: Get match context from graph
-        match_context = self.kg.get_match_context(match_id)
+        match_context = {
+            "home_players": self._squads(match_id, EdgeType.PLAYS_HOME, squads),
+            "away_players": self._squads(match_id, EdgeType.PLAYS_AWAY, squads),
+        }
         match_data = self.kg.get_node_data(match_id)
 
         # Step 5: Run reasoning engine
         ctx = ReasoningContext()
 
-        self.reasoning.analyze_team_form(ctx, home_team, "home")
-        self.reasoning.analyze_team_form(ctx, away_team, "away")
+        self._team_form(ctx, home_team, "home")
+        self._team_form(ctx, away_team, "away")
 
         # H2H analysis from graph
-        h2h_match_ids = self.kg.get_h2h_matches(home_nid, away_nid)
+        if h2h_limit is None:
+            h2h_match_ids = self.kg.get_h2h_matches(home_nid, away_nid)
+        else:
+            # Fetch one extra: the analyzed fixture itself may sit in the pair index
+            recent = self.kg.get_h2h_matches(home_nid, away_nid, last_n=h2h_limit + 1)
+            h2h_match_ids = [mid for mid in recent if mid != match_id][-h2h_limit:] if h2h_limit else []
         h2h_data = [self.kg.get_node_data(mid) for mid in h2h_match_ids if self.kg.get_node_data(mid)]
         self.reasoning.analyze_h2h(ctx, h2h_data, home_team["id"])
 
@@ -154,15 +272,50 @@ class MatchAnalyzer:
         if match_data:
             self.reasoning.analyze_venue_weather(ctx, match_data)
 
-        # Step 6: Synthesize prediction
-        synthesis = self.reasoning.synthesize(ctx)
+        return ctx
 
-        # Step 7: Map direction to 1X2 selection
-        selection_map = {"home": "1", "draw": "N", "away": "2"}
-        selection = selection_map[synthesis["direction"]]
-
-        # Step 8: Find similar historical matches
-        similar = self.kg.find_similar_matches(match_id, top_k=5)
+    def _team_form(self, ctx: ReasoningContext, team: dict[str, Any], role: str) -> None:
+        """
+        analyze_team_form through the per-team feature cache.
+
+        An entry is reused while the team node keeps its stamp (add_team and
+        standings change it) and the team dict carries the same form, ranking
+        and ratings. Reader threads share the cache: entries are replaced
+        whole, and two threads computing the same one store equal values.
+        Stores (and the eviction once FEATURE_CACHE_SIZE is reached) take a
+        lock; lookups don't.
+        """
+        stats = team.get("stats") or {}
+        inputs = (
+            team["name"], tuple(team.get("form") or ())[:5], team.get("ranking"),
+            stats.get("attack_rating", 50), stats.get("defense_rating", 50),
+        )
+        stamp = self.kg.stamp(f"team:{team['id']}")
+        entry = self._features.get((team["id"], role))
+        if entry is not None and entry[0] == stamp and entry[1] == inputs:
+            self._feature_counts["hits"] += 1
+            features = entry[2]
+        else:
+            self._feature_counts["misses"] += 1
+            features = self.reasoning.team_features(team, role)
+            key = (team["id"], role)
+            with self._features_lock:
+                self._features.pop(key, None)
+                if len(self._features) >= FEATURE_CACHE_SIZE:
+                    self._features.pop(next(iter(self._features)))
+                self._features[key] = (stamp, inputs, features)
+        features.apply(ctx)
+
+    def feature_stats(self) -> dict[str, int]:
+        return {"teams": len(self._features), **self._feature_counts}
+
+    def _conclude(self, match_id: str, ctx: ReasoningContext, synthesis: dict[str, Any]) -> dict[str, Any]:
+        """Steps 7-9: from the synthesized prediction (step 6) to the stored Tip."""
+        return self.conclude(match_id, ctx, synthesis, self._similar(match_id))
+
+    def _similar(self, match_id: str) -> list[dict[str, Any]]:
+        """Step 8: Find similar historical matches."""
+        similar = self.kg.find_similar_matches(match_id, top_k=SIMILAR_MATCHES)
         similar_details = []
         for sim_id, sim_score in similar:
             sim_data = self.kg.get_node_data(sim_id)
@@ -174,6 +327,19 @@ class MatchAnalyzer:
                     "home_score": sim_data.get("home_score"),
                     "away_score": sim_data.get("away_score"),
                 })
+        return similar_details
+
+    def conclude(
+        self,
+        match_id: str,
+        ctx: ReasoningContext,
+        synthesis: dict[str, Any],
+        similar_details: list[dict[str, Any]],
+    ) -> dict[str, Any]:
+        """Steps 7 and 9: store the Tip of an evaluated match and build its result."""
+        # Step 7: Map direction to 1X2 selection
+        selection_map = {"home": "1", "draw": "N", "away": "2"}
+        selection = selection_map[synthesis["direction"]]
 
         # Step 9: Build Tip
         raw_match_id = match_id.replace("match:", "")
@@ -199,6 +365,191 @@ class MatchAnalyzer:
             "graph_stats": self.kg.stats(),
         }
 
+    # ─── Result Memo ─────────────────────────────────
+
+    def cached(
+        self,
+        match_id: str,
+        home_team: dict[str, Any],
+        away_team: dict[str, Any],
+        h2h_limit: int | None = None,
+    ) -> Optional[dict[str, Any]]:
+        """
+        The remembered result of this fixture if neither its version (see
+        version) nor its tip has changed since, with fresh graph stats.
+        Call after prepare(): the team stamps stand for the payloads.
+        """
+        entry = self._results.get((match_id, home_team["id"], away_team["id"], h2h_limit))
+        if entry is not None:
+            stamps, with_results, tip_nid, tip_stamp, result = entry
+            if (
+                self.kg.stamp(tip_nid) == tip_stamp
+                and self.kg.analysis_stamps(match_id, home_team["id"], away_team["id"], with_results) == stamps
+            ):
+                self._result_counts["hits"] += 1
+                logger.debug(f"Analysis of {match_id} unchanged: remembered result")
+                return {**result, "graph_stats": self.kg.stats()}
+        self._result_counts["misses"] += 1
+        return None
+
+    def version(
+        self,
+        match_id: str,
+        home_team: dict[str, Any],
+        away_team: dict[str, Any],
+        similar_details: list[dict[str, Any]],
+    ) -> tuple[bool, Optional[tuple[Any, ...]]]:
+        """
+        What an evaluation read, taken alongside it (same read lock): the
+        graph's analysis_stamps, including the result-only bucket when the
+        similar matches reached it (short list, or scores below the 1.0 of
+        a shared team or league).
+        """
+        with_results = len(similar_details) < SIMILAR_MATCHES or any(s["score"] < 1.0 for s in similar_details)
+        return with_results, self.kg.analysis_stamps(match_id, home_team["id"], away_team["id"], with_results)
+
+    def prepared_version(
+        self,
+        match_id: str,
+        home_team: dict[str, Any],
+        away_team: dict[str, Any],
+    ) -> tuple[Optional[tuple[Any, ...]], Optional[tuple[Any, ...]]]:
+        """
+        The analysis_stamps left by prepare(), without and with the
+        result-only bucket. Take them under prepare()'s write lock when the
+        evaluation runs in a later job (see remember).
+        """
+        return (
+            self.kg.analysis_stamps(match_id, home_team["id"], away_team["id"], False),
+            self.kg.analysis_stamps(match_id, home_team["id"], away_team["id"], True),
+        )
+
+    def remember(
+        self,
+        match_id: str,
+        home_team: dict[str, Any],
+        away_team: dict[str, Any],
+        h2h_limit: int | None,
+        version: tuple[bool, Optional[tuple[Any, ...]]],
+        result: dict[str, Any],
+        prepared: Optional[tuple[Optional[tuple[Any, ...]], Optional[tuple[Any, ...]]]] = None,
+    ) -> None:
+        """
+        Keep a concluded result for cached(), right after conclude() stored its tip.
+
+        With `prepared` (prepared_version), the result is only kept when the
+        evaluation read the graph its own prepare() left: another request
+        may have re-ingested the same teams in between.
+        """
+        with_results, stamps = version
+        if stamps is None:
+            return
+        if prepared is not None and prepared[with_results] != stamps:
+            logger.debug(f"Analysis of {match_id} overlapped another ingest: not remembered")
+            return
+        tip_nid = f"tip:{result['tip']['match_id']}_{result['tip']['market']}"
+        key = (match_id, home_team["id"], away_team["id"], h2h_limit)
+        self._results.pop(key, None)
+        if len(self._results) >= RESULT_CACHE_SIZE:
+            self._results.pop(next(iter(self._results)))
+        self._results[key] = (stamps, with_results, tip_nid, self.kg.stamp(tip_nid), result)
+
+    def result_stats(self) -> dict[str, int]:
+        return {"results": len(self._results), **self._result_counts}
+
+    def _squads(
+        self,
+        match_id: str,
+        side: EdgeType,
+        squads: Optional[dict[str, list[dict[str, Any]]]],
+    ) -> list[dict[str, Any]]:
+        """Players of the team(s) linked to the match on one side (memoized per team in batches)."""
+        players: list[dict[str, Any]] = []
+        for team_nid in self.kg.get_incoming(match_id, side):
+            squad = squads.get(team_nid) if squads is not None else None
+            if squad is None:
+                squad = [self.kg.get_node_data(p) for p in self.kg.get_neighbors(team_nid, EdgeType.HAS_PLAYER)]
+                if squads is not None:
+                    squads[team_nid] = squad
+            players.extend(squad)
+        return players
+
+    # ─── Batch Analysis ──────────────────────────────
+
+    def analyze_batch(self, fixtures: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        """
+        Analyze a whole matchday.
+
+        Each fixture is a dict with a raw "match" dict plus the analyze()
+        keyword arguments (home_team, away_team, h2h_history, home_players,
+        away_players, h2h_limit). Everything is ingested first (ingest_batch),
+        then the fixtures are analyzed in order with one squad lookup per team
+        and evaluated BATCH_CHUNK at a time.
+        Results are yielded one by one so callers can stream them.
+        """
+        prepared = self.ingest_batch(fixtures)
+        squads: dict[str, list[dict[str, Any]]] = {}
+        for start in range(0, len(prepared), BATCH_CHUNK):
+            chunk = prepared[start:start + BATCH_CHUNK]
+            for (match_id, _), evaluation in zip(chunk, self.evaluate(chunk, squads)):
+                yield self.conclude(match_id, *evaluation)
+
+    def ingest_batch(self, fixtures: Iterable[dict[str, Any]]) -> list[tuple[str, dict[str, Any]]]:
+        """
+        Ingest every fixture of a batch: each team, player and historical
+        match once (last payload wins), teams before the fixtures so every
+        fixture links to its teams. Returns (match node ID, fixture) pairs in
+        order, with standings filled into the team dicts.
+        """
+        fixtures = [
+            {**f, "home_team": self._with_standings(f["home_team"]), "away_team": self._with_standings(f["away_team"])}
+            for f in fixtures
+        ]
+        teams: dict[str, dict[str, Any]] = {}
+        matches: dict[str, dict[str, Any]] = {}
+        players: dict[str, dict[str, Any]] = {}
+        histories: dict[frozenset[str], tuple[str, str, dict[str, dict[str, Any]]]] = {}
+        for f in fixtures:
+            home, away = f["home_team"], f["away_team"]
+            teams[home["id"]] = home
+            teams[away["id"]] = away
+            matches[f["match"]["id"]] = f["match"]
+            for p in (f.get("home_players") or []) + (f.get("away_players") or []):
+                players[p["id"]] = p
+            if f.get("h2h_history"):
+                pair = frozenset((home["id"], away["id"]))
+                _, _, history = histories.setdefault(pair, (home["id"], away["id"], {}))
+                for m in f["h2h_history"]:
+                    history[m["id"]] = m
+
+        for team in teams.values():
+            self.ingest_team(team)
+        match_nids = {mid: self.ingest_match(m) for mid, m in matches.items()}
+        for home_id, away_id, history in histories.values():
+            self.ingest_historical_matches(list(history.values()), home_id, away_id)
+        for player in players.values():
+            self.ingest_player(player)
+        logger.info(
+            f"Batch ingested: {len(fixtures)} fixtures, {len(teams)} teams, "
+            f"{len(players)} players, {sum(len(h) for _, _, h in histories.values())} H2H matches"
+        )
+        return [(match_nids[f["match"]["id"]], f) for f in fixtures]
+
+    def evaluate(
+        self,
+        prepared: list[tuple[str, dict[str, Any]]],
+        squads: Optional[dict[str, list[dict[str, Any]]]] = None,
+    ) -> list[tuple[ReasoningContext, dict[str, Any], list[dict[str, Any]]]]:
+        """
+        Steps 4-6 and 8 for ingested fixtures: (context, synthesis, similar
+        matches) per fixture, ready for conclude(). Only reads the graph.
+        """
+        evaluations = []
+        for match_id, f in prepared:
+            ctx = self._reason(match_id, f["home_team"], f["away_team"], f.get("h2h_limit"), squads)
+            evaluations.append((ctx, self.reasoning.synthesize(ctx), self._similar(match_id)))
+        return evaluations
+
     # ─── Quick Analysis (minimal data) ───────────────
 
     def quick_analyze(
@@ -217,3 +568,9 @@ class MatchAnalyzer:
             home_team=home_team,
             away_team=away_team,
         )
+
+
+def _standings_row(team: dict[str, Any], rows: Iterable[dict[str, Any]]) -> Optional[dict[str, Any]]:
+    """A team's row of a league table, matched like find_team (name or short name)."""
+    keys = {name_key(n) for n in (team.get("name"), team.get("short_name")) if n}
+    return next((row for row in rows if name_key(row["team_name"]) in keys), None)
@@ -0,0 +1,302 @@
+"""
+Backtest — Replays the graph's historical matches to measure tip quality.
+
+Every finished is_historical match is replayed in date order against only
+what was known before its kickoff:
+
+- each team's form: its last 5 results before that date
+- its ranking: the table of its league and season built from earlier results
+- the H2H record: earlier meetings of the two teams
+- the match's own venue / weather (forecast before kickoff)
+
+Matches played on the same day don't see each other's results. Player
+availability has no history in the graph, so it is left out.
+
+The pre-kickoff state is built in one sequential pass. The ReasoningEngine
+pipeline (form, H2H, venue, then score_batch) runs in chunks across a
+process pool. Tips are settled in the parent against the actual scores:
+hit rate over every tip, ROI over unit stakes where the match has odds for
+the selection.
+
+Run on a snapshot:
+  python -m graph.engine.backtest data/graph.skg [--workers 4] [--min-confidence 60]
+
+--settle also settles the snapshot's stored tips and saves it back (with
+--wal, the server's mutation log is replayed first and compacted by the
+save). It refuses to run while a server holds the snapshot or the log.
+  python -m graph.engine.backtest data/graph.skg --settle [--wal data/graph.wal]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+from graph.engine.knowledge_graph import KnowledgeGraph
+from graph.engine.persistence import lock_snapshot
+from graph.engine.reasoning import AWAY, DRAW, HOME, ReasoningContext, ReasoningEngine, SignalBatch
+from graph.models import Tip, TipOutcome
+
+# Fixtures per worker task
+CHUNK_SIZE = 2000
+
+# 1X2 selection of each direction code, and the odds field paying it
+SELECTIONS = {HOME: "1", DRAW: "N", AWAY: "2"}
+_ODDS_FIELDS = {HOME: "home_win", DRAW: "draw", AWAY: "away_win"}
+
+
+def backtest(
+    kg: KnowledgeGraph,
+    workers: Optional[int] = None,
+    min_confidence: float = 0.0,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict[str, Any]:
+    """
+    Replay and settle every historical match of the graph (read-only).
+
+    Tips below `min_confidence` are not counted. workers=None uses every
+    core; 1 runs in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    matches = _historical_matches(kg)
+    fixtures = list(_pre_kickoff(kg, matches))
+    prepared = time.perf_counter()
+
+    chunks = [fixtures[i:i + chunk_size] for i in range(0, len(fixtures), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        scored = [_score_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            scored = list(pool.map(_score_chunk, chunks))
+    pooled = time.perf_counter()
+
+    directions = np.array([d for chunk in scored for d in chunk[0]], dtype=np.int8)
+    confidence = np.array([c for chunk in scored for c in chunk[1]], dtype=np.float64)
+    report = _settle(matches, directions, confidence, min_confidence)
+    finished = time.perf_counter()
+
+    report["workers"] = workers
+    report["timings_s"] = {
+        "prepare": round(prepared - started, 3),
+        # CPU time summed over the workers; "pool" is the wall time of that stage
+        "reason": round(sum(chunk[2] for chunk in scored), 3),
+        "score": round(sum(chunk[3] for chunk in scored), 3),
+        "pool": round(pooled - prepared, 3),
+        "settle": round(finished - pooled, 3),
+        "total": round(finished - started, 3),
+    }
+    report["fixtures_per_min"] = round(len(matches) / (finished - started) * 60) if matches else 0
+    return report
+
+
+def settle_tips(kg: KnowledgeGraph) -> dict[str, int]:
+    """Settle the graph's pending 1X2 tips whose match has a final score."""
+    counts = {TipOutcome.WON.value: 0, TipOutcome.LOST.value: 0, "pending": 0}
+    for tip_nid in kg.get_nodes_by_type("tip"):
+        tip = kg.get_node_data(tip_nid)
+        if tip["market"] != "1X2" or tip["outcome"] != TipOutcome.PENDING:
+            continue
+        match = kg.get_node_data(f"match:{tip['match_id']}")
+        if not match or match.get("home_score") is None or match.get("away_score") is None:
+            counts["pending"] += 1
+            continue
+        actual = SELECTIONS[_direction(match["home_score"], match["away_score"])]
+        outcome = TipOutcome.WON if tip["selection"] == actual else TipOutcome.LOST
+        kg.add_tip(Tip(**{**tip, "outcome": outcome}))
+        counts[outcome.value] += 1
+    return counts
+
+
+# ─── Pre-kickoff State ───────────────────────────────────
+
+def _historical_matches(kg: KnowledgeGraph) -> list[dict[str, Any]]:
+    matches = []
+    for nid in kg.get_nodes_by_type("match"):
+        data = kg.get_node_data(nid)
+        if data.get("is_historical") and data.get("home_score") is not None and data.get("away_score") is not None:
+            matches.append(data)
+    matches.sort(key=lambda m: (m["match_date"], m.get("kick_off") or "", m["id"]))
+    return matches
+
+
+def _season(match: dict[str, Any]) -> tuple[str, int]:
+    """(league, season start year): seasons run July to June."""
+    day: date = match["match_date"]
+    return match.get("league", ""), day.year if day.month >= 7 else day.year - 1
+
+
+def _pre_kickoff(kg: KnowledgeGraph, matches: list[dict[str, Any]]) -> Iterator[tuple[Any, ...]]:
+    """
+    (match, home team, away team, H2H) per match, in order, each built from
+    the matches of earlier days only.
+    """
+    names: dict[str, str] = {}
+    forms: dict[str, deque[str]] = {}
+    # (league, season) → team_id → [points, goal difference, goals for]
+    tables: dict[tuple[str, int], dict[str, list[int]]] = {}
+    meetings: dict[frozenset[str], list[dict[str, Any]]] = {}
+
+    def team(team_id: str, table: dict[str, list[int]]) -> dict[str, Any]:
+        name = names.get(team_id)
+        if name is None:
+            data = kg.get_node_data(f"team:{team_id}")
+            name = names[team_id] = data["name"] if data else team_id
+        row = table.get(team_id)
+        ranking = 1 + sum(other > row for other in table.values()) if row else None
+        return {"id": team_id, "name": name, "form": list(forms.get(team_id, ())), "ranking": ranking}
+
+    day_start = 0
+    for i, m in enumerate(matches):
+        if m["match_date"] != matches[day_start]["match_date"]:
+            _record(matches[day_start:i], forms, tables, meetings)
+            day_start = i
+        home_id, away_id = m["home_team_id"], m["away_team_id"]
+        table = tables.get(_season(m), {})
+        yield (
+            {"id": m["id"], "venue": m.get("venue")},
+            team(home_id, table),
+            team(away_id, table),
+            list(meetings.get(frozenset((home_id, away_id)), ())),
+        )
+
+
+def _record(
+    day: list[dict[str, Any]],
+    forms: dict[str, deque[str]],
+    tables: dict[tuple[str, int], dict[str, list[int]]],
+    meetings: dict[frozenset[str], list[dict[str, Any]]],
+) -> None:
+    """Fold one day of results into the forms, league tables and H2H records."""
+    for m in day:
+        home_id, away_id = m["home_team_id"], m["away_team_id"]
+        hs, aws = m["home_score"], m["away_score"]
+        table = tables.setdefault(_season(m), {})
+        for team_id, scored, conceded in ((home_id, hs, aws), (away_id, aws, hs)):
+            result = "W" if scored > conceded else "L" if scored < conceded else "D"
+            forms.setdefault(team_id, deque(maxlen=5)).appendleft(result)
+            row = table.setdefault(team_id, [0, 0, 0])
+            row[0] += 3 if result == "W" else 1 if result == "D" else 0
+            row[1] += scored - conceded
+            row[2] += scored
+        meetings.setdefault(frozenset((home_id, away_id)), []).append(
+            {"home_team_id": home_id, "home_score": hs, "away_score": aws}
+        )
+
+
+# ─── Reasoning (worker side) ─────────────────────────────
+
+def _score_chunk(chunk: list[tuple[Any, ...]]) -> tuple[list[int], list[float], float, float]:
+    """Directions and confidences of a chunk, plus its reasoning / scoring CPU time."""
+    engine = ReasoningEngine()
+    started = time.perf_counter()
+    contexts = []
+    for match, home_team, away_team, h2h in chunk:
+        ctx = ReasoningContext()
+        engine.analyze_team_form(ctx, home_team, "home")
+        engine.analyze_team_form(ctx, away_team, "away")
+        engine.analyze_h2h(ctx, h2h, home_team["id"])
+        if match["venue"]:
+            engine.analyze_venue_weather(ctx, match)
+        contexts.append(ctx)
+    reasoned = time.perf_counter()
+    # One vectorized pass over the chunk: only directions and confidences are needed
+    scores = engine.score_batch(SignalBatch.from_contexts(contexts))
+    scored = time.perf_counter()
+    return (
+        scores["direction"].tolist(),
+        [round(c, 1) for c in scores["confidence"].tolist()],
+        reasoned - started,
+        scored - reasoned,
+    )
+
+
+# ─── Settlement ──────────────────────────────────────────
+
+def _direction(home_score: int, away_score: int) -> int:
+    return HOME if home_score > away_score else AWAY if home_score < away_score else DRAW
+
+
+def _settle(
+    matches: list[dict[str, Any]],
+    directions: np.ndarray,
+    confidence: np.ndarray,
+    min_confidence: float,
+) -> dict[str, Any]:
+    actual = np.array([_direction(m["home_score"], m["away_score"]) for m in matches], dtype=np.int8)
+    odds = np.full((len(matches), 3), np.nan)
+    for i, m in enumerate(matches):
+        for code, field in _ODDS_FIELDS.items():
+            price = (m.get("odds") or {}).get(field)
+            if price is not None:
+                odds[i, code] = price
+
+    tipped = confidence >= min_confidence
+    won = tipped & (directions == actual)
+    price = odds[np.arange(len(matches)), directions] if len(matches) else np.empty(0)
+    bet = tipped & ~np.isnan(price)
+    profit = float(np.where(won, price - 1.0, -1.0)[bet].sum())
+    tips, bets = int(tipped.sum()), int(bet.sum())
+
+    return {
+        "fixtures": len(matches),
+        "tips": tips,
+        "won": int(won.sum()),
+        "hit_rate": round(int(won.sum()) / tips, 4) if tips else None,
+        "bets": bets,
+        "profit": round(profit, 2),
+        "roi": round(profit / bets, 4) if bets else None,
+        "by_selection": {
+            SELECTIONS[code]: {"tips": int((tipped & (directions == code)).sum()), "won": int((won & (directions == code)).sum())}
+            for code in (HOME, DRAW, AWAY)
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest tips over a graph snapshot's historical matches")
+    parser.add_argument("snapshot", help="Graph snapshot (SHANNON_SNAPSHOT_PATH)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--min-confidence", type=float, default=0.0)
+    parser.add_argument("--settle", action="store_true", help="Settle the snapshot's pending tips and save it")
+    parser.add_argument("--wal", help="Mutation log of the snapshot (SHANNON_WAL_PATH), with --settle")
+    args = parser.parse_args()
+    if args.wal and not args.settle:
+        parser.error("--wal only applies with --settle")
+
+    kg = KnowledgeGraph()
+    if not args.settle:
+        kg.load_snapshot(args.snapshot)
+        print(json.dumps(backtest(kg, args.workers, args.min_confidence), indent=2))
+        return
+
+    try:
+        locks = [lock_snapshot(path) for path in (args.snapshot, args.wal) if path]
+    except RuntimeError as e:
+        parser.error(f"{e}: stop the server before --settle")
+    try:
+        kg.load_snapshot(args.snapshot)
+        if args.wal:
+            kg.open_log(args.wal)
+        report = backtest(kg, args.workers, args.min_confidence)
+        report["settled_tips"] = settle_tips(kg)
+        if report["settled_tips"][TipOutcome.WON.value] or report["settled_tips"][TipOutcome.LOST.value]:
+            kg.save_snapshot(args.snapshot)
+        kg.close_log()
+    finally:
+        for lock in locks:
+            lock.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Concurrency — Reader/writer lock guarding the shared KnowledgeGraph.
+
+Any number of threads may read the graph at once; a writer has it to
+itself. Turns alternate: a waiting writer holds back new readers, so a
+steady stream of reads can't starve ingestion, and the readers waiting
+when a write batch ends go in before the next writer, so back-to-back
+writes can't starve reads either. A reader waits for one write batch at
+most (plus any writer queued before it when a read phase was ending).
+
+Both sides are reentrant per thread: nested read() or write() blocks are
+free, and the writing thread may read (a mutation calling stats() or
+get_node_data). Taking the write lock while holding only a read lock is
+an error: two readers upgrading at once would deadlock.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class ReadWriteLock:
+    """Phase-fair, per-thread reentrant reader/writer lock."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+        self._readers_waiting = 0
+        # Readers still to admit before the next writer (set when a write ends)
+        self._read_turn = 0
+        self._local = threading.local()
+        self._stats = {"reads": 0, "writes": 0, "read_waits": 0, "write_waits": 0, "read_wait_s": 0.0, "write_wait_s": 0.0}
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self._stats,
+            "read_wait_s": round(self._stats["read_wait_s"], 3),
+            "write_wait_s": round(self._stats["write_wait_s"], 3),
+            "readers": self._readers,
+            "writer_waiting": self._writers_waiting,
+        }
+
+    def read(self) -> _Held:
+        """`with lock.read():` shared access."""
+        return _Held(self.acquire_read, self.release_read)
+
+    def write(self) -> _Held:
+        """`with lock.write():` exclusive access."""
+        return _Held(self.acquire_write, self.release_write)
+
+    def acquire_read(self) -> None:
+        depth = getattr(self._local, "reads", 0)
+        if depth or self._writer == threading.get_ident():
+            # Nested, or reading inside our own write: no shared slot to take
+            if not depth:
+                self._local.counted = False
+            self._local.reads = depth + 1
+            return
+        with self._cond:
+            if self._writer is not None or (self._writers_waiting and not self._read_turn):
+                started = time.perf_counter()
+                self._readers_waiting += 1
+                try:
+                    while self._writer is not None or (self._writers_waiting and not self._read_turn):
+                        self._cond.wait()
+                finally:
+                    self._readers_waiting -= 1
+                self._stats["read_waits"] += 1
+                self._stats["read_wait_s"] += time.perf_counter() - started
+            if self._read_turn:
+                self._read_turn -= 1
+            self._readers += 1
+            self._stats["reads"] += 1
+        self._local.reads = 1
+        self._local.counted = True
+
+    def release_read(self) -> None:
+        self._local.reads -= 1
+        if self._local.reads or not self._local.counted:
+            return
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        if self._writer == me:
+            self._write_depth += 1
+            return
+        if getattr(self._local, "reads", 0):
+            raise RuntimeError("Cannot take the graph write lock while holding a read lock")
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                if self._writer is not None or self._readers or self._read_turn:
+                    started = time.perf_counter()
+                    while self._writer is not None or self._readers or self._read_turn:
+                        self._cond.wait()
+                    self._stats["write_waits"] += 1
+                    self._stats["write_wait_s"] += time.perf_counter() - started
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+            self._stats["writes"] += 1
+
+    def release_write(self) -> None:
+        self._write_depth -= 1
+        if self._write_depth:
+            return
+        with self._cond:
+            self._writer = None
+            self._read_turn = self._readers_waiting
+            self._cond.notify_all()
+
+
+class _Held:
+    """Context manager for one side of the lock (lighter than @contextmanager)."""
+
+    __slots__ = ("_acquire", "_release")
+
+    def __init__(self, acquire: Callable[[], None], release: Callable[[], None]) -> None:
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self) -> None:
+        self._acquire()
+
+    def __exit__(self, *exc: Any) -> None:
+        self._release()
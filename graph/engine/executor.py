@@ -0,0 +1,350 @@
+"""
+AnalysisExecutor — Runs graph work off the event loop.
+
+Graph calls from async code go through two thread pools, following the
+graph's reader/writer lock (graph.engine.concurrency):
+
+- run(): mutations (ingestion, tips, snapshot fork) on a single writer
+  thread, in submission order, each call one write batch
+- read(): read-only work (reasoning, similar matches, stats) on a pool of
+  reader threads, each call inside kg.read()
+
+An analysis is split the same way: ingest (write), reason (read), store
+the tip (write). A fixture whose inputs haven't changed is answered from
+the analyzer's result memo in the ingest step. Readers see the graph as
+of a whole write batch, and the event loop keeps serving I/O while either
+pool works.
+
+Large batches are reasoned in worker processes instead. The workers are
+forked once, by start_workers() at startup: after the graph is loaded and
+before any thread exists, since a lock another thread holds at the fork
+stays locked in the child for good. Each worker reads its own
+copy-on-write view of the graph (nothing is pickled but the fixtures, the
+results and the mutations) and returns the reasoning context, synthesis
+and similar matches of its fixtures. Tips are written back on the writer
+thread, so the parent graph and its mutation log stay the single source
+of truth.
+
+The workers are kept current by replaying the graph's mutations, the
+records of its log, from an in-memory feed (KnowledgeGraph.start_feed).
+A batch takes the feed position under the read lock, after its fixtures
+are ingested, and each worker replays up to there before its chunk: it
+sees the graph as of a whole write batch, like a reader thread. Records
+every worker has replayed are dropped, and idle workers catch up once
+WORKER_SYNC_RECORDS have piled up.
+
+Without the fork start method (macOS / Windows spawn a fresh interpreter
+with no graph), or before start_workers(), batches run on the reader threads.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gc
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+from graph.engine.analyzer import BATCH_CHUNK, MatchAnalyzer
+from graph.engine.persistence import MutationFeed
+
+logger = logging.getLogger("shannon.executor")
+
+T = TypeVar("T")
+
+FORK_AVAILABLE = "fork" in multiprocessing.get_all_start_methods()
+
+# Feed records kept for the workers before the idle ones are brought up to date
+WORKER_SYNC_RECORDS = 10_000
+
+
+class AnalysisExecutor:
+    """Writer thread for mutations, reader threads for reads, forked processes for large batches."""
+
+    def __init__(
+        self,
+        analyzer: MatchAnalyzer,
+        processes: Optional[int] = None,
+        process_min_fixtures: int = 64,
+        readers: int = 4,
+    ) -> None:
+        self.analyzer = analyzer
+        # None: one per core; 0 or 1 disables the process pool
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        self.process_min_fixtures = process_min_fixtures
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shannon-graph-write")
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="shannon-graph-read")
+        # Forked by start_workers, with one thread each to talk to them
+        self._workers: list[_Worker] = []
+        self._worker_io: Optional[ThreadPoolExecutor] = None
+        self._feed: Optional[MutationFeed] = None
+        self._sync_task: Optional[asyncio.Task[None]] = None
+        self._stats = {
+            "writes": 0, "reads": 0,
+            "thread_batches": 0, "process_batches": 0, "process_fixtures": 0,
+            "worker_syncs": 0, "fork_ms": None,
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "processes": len(self._workers),
+            "feed": len(self._feed) if self._feed is not None else None,
+            **self._stats,
+            "lock": self.analyzer.kg.lock_stats(),
+            "features": self.analyzer.feature_stats(),
+            "results": self.analyzer.result_stats(),
+        }
+
+    def start_workers(self) -> int:
+        """
+        Fork the worker processes. Call once at startup, with the graph
+        loaded and before anything has started a thread (this executor's
+        pools start theirs on first use). Returns the number of workers.
+        """
+        if self._workers or not FORK_AVAILABLE or self.processes <= 1:
+            return len(self._workers)
+        if threading.active_count() > 1:
+            logger.warning(f"Forking analysis workers with {threading.active_count()} threads running")
+        started = time.perf_counter()
+        self._feed = self.analyzer.kg.start_feed()
+        context = multiprocessing.get_context("fork")
+        # Keep the collector off the inherited objects: scanning them would
+        # write their headers and unshare the pages in every worker
+        gc.freeze()
+        try:
+            for i in range(self.processes):
+                conn, child_conn = context.Pipe()
+                process = context.Process(
+                    target=_worker_main, args=(self.analyzer, child_conn, [w.conn for w in self._workers]),
+                    name=f"shannon-analysis-{i}", daemon=True,
+                )
+                process.start()
+                child_conn.close()
+                self._workers.append(_Worker(process, conn, self._feed.position))
+        finally:
+            gc.unfreeze()
+        self._worker_io = ThreadPoolExecutor(max_workers=len(self._workers), thread_name_prefix="shannon-worker-io")
+        self._stats["fork_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Forked {len(self._workers)} analysis workers in {self._stats['fork_ms']}ms")
+        return len(self._workers)
+
+    def close(self) -> None:
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        if self._worker_io is not None:
+            self._worker_io.shutdown(wait=True)
+        # Closing the pipes ends the workers' loops
+        for worker in self._workers:
+            worker.conn.close()
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._workers = []
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on the writer thread, as one write batch."""
+        self._stats["writes"] += 1
+        kg = self.analyzer.kg
+
+        def call() -> T:
+            with kg.write_batch():
+                return fn(*args, **kwargs)
+
+        result = await asyncio.get_running_loop().run_in_executor(self._writer, call)
+        if self._feed is not None and len(self._feed) >= WORKER_SYNC_RECORDS and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_workers())
+        return result
+
+    async def read(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on a reader thread; fn must not mutate the graph."""
+        self._stats["reads"] += 1
+        kg = self.analyzer.kg
+
+        def call() -> T:
+            with kg.read():
+                return fn(*args, **kwargs)
+
+        return await asyncio.get_running_loop().run_in_executor(self._readers, call)
+
+    async def analyze(
+        self,
+        match_id: str,
+        home_team: dict[str, Any],
+        away_team: dict[str, Any],
+        h2h_history: list[dict[str, Any]] | None = None,
+        home_players: list[dict[str, Any]] | None = None,
+        away_players: list[dict[str, Any]] | None = None,
+        h2h_limit: int | None = None,
+    ) -> dict[str, Any]:
+        """
+        MatchAnalyzer.analyze: ingest (returning the remembered result when
+        nothing changed), then reason on a reader thread, then store the tip.
+        """
+        analyzer = self.analyzer
+
+        def prepare() -> tuple[dict[str, Any], dict[str, Any], tuple[Any, ...], Optional[dict[str, Any]]]:
+            home, away = analyzer.prepare(match_id, home_team, away_team, h2h_history, home_players, away_players)
+            # Stamps of this request's payloads: the evaluation may see a later request's
+            prepared = analyzer.prepared_version(match_id, home, away)
+            return home, away, prepared, analyzer.cached(match_id, home, away, h2h_limit)
+
+        def evaluate() -> tuple[tuple[Any, ...], tuple[bool, Any]]:
+            prepared = [(match_id, {"home_team": home, "away_team": away, "h2h_limit": h2h_limit})]
+            [evaluation] = analyzer.evaluate(prepared)
+            return evaluation, analyzer.version(match_id, home, away, evaluation[2])
+
+        def conclude() -> dict[str, Any]:
+            result = analyzer.conclude(match_id, *evaluation)
+            analyzer.remember(match_id, home, away, h2h_limit, version, result, prepared)
+            return result
+
+        home, away, prepared, cached = await self.run(prepare)
+        if cached is not None:
+            return cached
+        evaluation, version = await self.read(evaluate)
+        return await self.run(conclude)
+
+    async def analyze_batch(self, fixtures: Iterable[dict[str, Any]]) -> AsyncIterator[dict[str, Any]]:
+        """
+        MatchAnalyzer.analyze_batch off the event loop: results in fixture
+        order, in the process pool when the batch is large enough.
+        """
+        prepared = await self.run(self.analyzer.ingest_batch, fixtures)
+        if not self._workers or len(prepared) < self.process_min_fixtures:
+            self._stats["thread_batches"] += 1
+            squads: dict[str, list[dict[str, Any]]] = {}
+            for start in range(0, len(prepared), BATCH_CHUNK):
+                chunk = prepared[start:start + BATCH_CHUNK]
+                evaluations = await self.read(self.analyzer.evaluate, chunk, squads)
+                for result in await self.run(self._conclude_chunk, chunk, evaluations):
+                    yield result
+            return
+
+        # Spread the batch over every worker, BATCH_CHUNK fixtures per task at most
+        workers = list(self._workers)
+        size = min(BATCH_CHUNK, math.ceil(len(prepared) / len(workers)))
+        chunks = [prepared[i:i + size] for i in range(0, len(prepared), size)]
+        # Under the read lock: the position falls between whole write batches
+        position = await self.read(lambda: self._feed.position)
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(self._worker_io, self._call_worker, workers[i % len(workers)], position, chunk)
+            for i, chunk in enumerate(chunks)
+        ]
+        logger.info(f"Batch of {len(prepared)} fixtures: {len(chunks)} chunks on {min(len(workers), len(chunks))} workers")
+        self._stats["process_batches"] += 1
+        self._stats["process_fixtures"] += len(prepared)
+        try:
+            for chunk, future in zip(chunks, futures):
+                evaluations = await future
+                for result in await self.run(self._conclude_chunk, chunk, evaluations):
+                    yield result
+        finally:
+            for future in futures:
+                future.cancel()
+
+    # ─── Graph Threads ───────────────────────────────
+
+    def _conclude_chunk(
+        self,
+        chunk: list[tuple[str, dict[str, Any]]],
+        evaluations: list[tuple[Any, ...]],
+    ) -> list[dict[str, Any]]:
+        return [self.analyzer.conclude(match_id, *evaluation) for (match_id, _), evaluation in zip(chunk, evaluations)]
+
+    # ─── Workers ─────────────────────────────────────
+
+    def _call_worker(self, worker: _Worker, position: int, chunk: Optional[list[tuple[str, dict[str, Any]]]]) -> Any:
+        """On a worker I/O thread. A worker whose replay fails is retired: its graph may be half-updated."""
+        try:
+            result = worker.call(self._feed, position, chunk)
+        except (_ReplayError, EOFError, OSError):
+            if worker in self._workers:
+                self._workers.remove(worker)
+                worker.process.terminate()
+                logger.error(f"Retired analysis worker {worker.process.name}, {len(self._workers)} left")
+            raise
+        if self._workers:
+            self._feed.trim(min(w.position for w in self._workers))
+        return result
+
+    async def _sync_workers(self) -> None:
+        """Bring every worker up to date, so the feed can drop what they have replayed."""
+        try:
+            position = await self.read(lambda: self._feed.position)
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(self._worker_io, self._call_worker, worker, position, None)
+                for worker in list(self._workers)
+            ))
+            # With every worker retired, nothing reads the feed any more
+            self._feed.trim(min((w.position for w in self._workers), default=position))
+            self._stats["worker_syncs"] += 1
+        except Exception as e:
+            logger.error(f"Worker sync failed: {e}")
+        finally:
+            self._sync_task = None
+
+
+# ─── Worker Side ─────────────────────────────────────────
+
+class _ReplayError(RuntimeError):
+    """A worker failed to apply the feed: its graph no longer matches the parent's."""
+
+
+class _Worker:
+    """Parent's end of a forked worker: its pipe and how far it has replayed the feed."""
+
+    def __init__(self, process: multiprocessing.process.BaseProcess, conn: Connection, position: int) -> None:
+        self.process = process
+        self.conn = conn
+        self.position = position
+        # One request in flight per pipe
+        self._lock = threading.Lock()
+
+    def call(self, feed: MutationFeed, position: int, chunk: Optional[list[tuple[str, dict[str, Any]]]]) -> Any:
+        """Replay the feed up to position (a later one may have got further), then evaluate chunk."""
+        with self._lock:
+            records = feed.since(self.position, position) if position > self.position else []
+            self.conn.send((records, chunk))
+            failed, result = self.conn.recv()
+            if failed == "replay":
+                raise _ReplayError(f"Analysis worker {self.process.name} failed to replay the feed: {result}")
+            self.position = max(self.position, position)
+            if failed:
+                raise RuntimeError(f"Analysis worker {self.process.name} failed: {result}")
+            return result
+
+
+def _worker_main(analyzer: MatchAnalyzer, conn: Connection, siblings: list[Connection]) -> None:
+    # The parent shuts the workers down (Ctrl-C reaches the whole process group)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Inherited parent ends of the workers forked before: they would keep those from seeing EOF
+    for sibling in siblings:
+        sibling.close()
+    kg = analyzer.kg
+    kg.detach()
+    while True:
+        try:
+            records, chunk = conn.recv()
+        except EOFError:
+            return
+        # Reply (None, result), or the failed step and the error
+        try:
+            kg.replay(pickle.loads(record) for record in records)
+        except Exception as e:
+            conn.send(("replay", f"{type(e).__name__}: {e}"))
+            continue
+        try:
+            conn.send((None, analyzer.evaluate(chunk, {}) if chunk else None))
+        except Exception as e:
+            conn.send(("evaluate", f"{type(e).__name__}: {e}"))
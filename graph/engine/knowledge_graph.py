@@ -7,13 +7,33 @@ The graph supports traversal, pattern matching, and subgraph extraction.
 
 from __future__ import annotations
 
+import bisect
+import functools
+import hashlib
+import heapq
+import os
+from contextlib import AbstractContextManager
 from enum import Enum
-from typing import Any, Optional
+from typing import Any, Callable, Iterable, Optional
 
 import networkx as nx
 from pydantic import BaseModel
 
 from graph.models import Team, Player, MatchNode, Tip
+from graph.engine.concurrency import ReadWriteLock
+from graph.engine.names import name_key
+from graph.engine.persistence import (
+    GraphSnapshot, MutationFeed, MutationLog, SnapshotJob, read_snapshot, start_snapshot,
+)
+from graph.engine.similarity import SimilarityIndex
+from graph.engine.storage import NodeData, Record, pack, unpack
+
+NODE_MODELS: dict[str, type[BaseModel]] = {
+    "team": Team,
+    "player": Player,
+    "match": MatchNode,
+    "tip": Tip,
+}
 
 
 # ─── Edge Types (Relationships) ──────────────────────────
@@ -40,6 +60,13 @@ class EdgeType(str, Enum):
     RECENT_OPPONENT = "RECENT_OPPONENT"        # Team ↔ Team (played recently)
 
 
+class UpsertStatus(str, Enum):
+    """Outcome of a KnowledgeGraph.upsert_* call."""
+    INSERTED = "inserted"
+    UPDATED = "updated"
+    UNCHANGED = "unchanged"
+
+
 class Edge(BaseModel):
     """Typed, weighted edge between two graph nodes."""
     source: str
@@ -49,8 +76,54 @@ class Edge(BaseModel):
     metadata: dict[str, Any] = {}
 
 
+# ─── Mutation Logging ────────────────────────────────────
+
+def _logged(method: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Run the call under the graph's write lock and append it to the graph's
+    mutation log (and feed, see start_feed) once it has succeeded.
+
+    Only the outermost mutation is logged (add_match's own links are not):
+    replaying it re-runs the nested ones and rebuilds the indexes with it.
+    Calls that changed nothing (unchanged upserts, links already in place)
+    are not logged either.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self: KnowledgeGraph, *args: Any, **kwargs: Any) -> Any:
+        lock = self._lock
+        lock.acquire_write()
+        try:
+            if (self._log is None and self._feed is None) or self._log_depth:
+                return method(self, *args, **kwargs)
+            mutations = self._mutations
+            self._log_depth += 1
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                self._log_depth -= 1
+            if self._mutations != mutations:
+                record = (name, args, kwargs)
+                if self._log is not None:
+                    self._log.append(record)
+                if self._feed is not None:
+                    self._feed.append(record)
+            return result
+        finally:
+            lock.release_write()
+
+    return wrapper
+
+
 # ─── Knowledge Graph ─────────────────────────────────────
 
+# Runtime state a snapshot leaves out: locks, the open log, and revision
+# stamps (load_snapshot restarts those above every stamp handed out)
+_TRANSIENT_STATE = frozenset({
+    "_lock", "_log", "_feed", "_log_depth", "_mutations", "_revision", "_epoch", "_stamps",
+})
+
 class KnowledgeGraph:
     """
     Main graph container. Wraps a NetworkX DiGraph with typed operations.
@@ -61,56 +134,204 @@ class KnowledgeGraph:
         kg.add_match(match)
         kg.link(team.node_id, match.node_id, EdgeType.PLAYS_HOME)
         similar = kg.find_similar_matches(match.node_id, top_k=5)
+
+    compact=True stores node data as slotted records (graph.engine.storage)
+    instead of model_dump() dicts; get_node_data returns a lazy dict view
+    with the same keys and values.
+
+    Thread safety: every mutation takes the write lock (graph.engine.concurrency).
+    Reads don't lock on their own, so a thread sharing the graph reads inside
+    read(), which also keeps the graph unchanged across the calls it wraps.
+    write_batch() makes a group of mutations atomic for readers.
+
+        with kg.read():
+            similar = kg.find_similar_matches(match.node_id)
+        with kg.write_batch():
+            kg.add_match(match)
+            kg.add_tip(tip)
     """
 
-    def __init__(self) -> None:
+    def __init__(self, compact: bool = False) -> None:
+        # Not part of the graph's content: survives load_snapshot
+        self._lock = ReadWriteLock()
         self._graph = nx.DiGraph()
+        self._compact = compact
+        # DiGraph.number_of_edges() walks every node: kept up to date by link / unlink
+        self._edge_count = 0
+        # node_type → insertion-ordered node IDs (ordered set)
+        self._nodes_by_type: dict[str, dict[str, None]] = {}
+        # (node_id, edge_type) → insertion-ordered neighbor IDs, both directions
+        self._out_by_type: dict[tuple[str, str], dict[str, None]] = {}
+        self._in_by_type: dict[tuple[str, str], dict[str, None]] = {}
+        self._similarity = SimilarityIndex()
+        # name_key of a team's name / short name → team node IDs, and back
+        self._teams_by_name: dict[str, dict[str, None]] = {}
+        self._team_name_keys: dict[str, tuple[str, ...]] = {}
+        # {home, away} team node IDs → match IDs sorted by (match_date, insertion)
+        self._h2h: dict[frozenset[str], list[str]] = {}
+        self._h2h_keys: dict[str, tuple[frozenset[str], tuple[Any, int]]] = {}
+        # {team_a, team_b} raw team IDs → date-ordered HISTORICAL_H2H chain
+        self._h2h_chains: dict[frozenset[str], _H2HChain] = {}
+        # node_id → digest of the raw payload last upserted into it
+        self._payload_digests: dict[str, bytes] = {}
+        self._upsert_counts: dict[str, dict[str, int]] = {}
+        # Revision stamps of what cached analysis reads (see stamp), from one
+        # counter that keeps increasing across load_snapshot
+        self._revision = 0
+        self._epoch = 0
+        self._stamps: dict[str, int] = {}
+        # Mutation log (see open_log); snapshots cover segments < _log_generation
+        self._log: Optional[MutationLog] = None
+        self._feed: Optional[MutationFeed] = None
+        self._log_depth = 0
+        self._log_generation = 0
+        # Bumped by every change to the content: calls that leave it alone aren't logged
+        self._mutations = 0
+        # Generation of the newest snapshot on disk: the segments from it on
+        # stay until the next one is written (see truncate_log)
+        self._snapshot_generation = 0
 
     @property
     def graph(self) -> nx.DiGraph:
         return self._graph
 
+    def read(self) -> AbstractContextManager[None]:
+        """Hold off writers: a consistent view for every read in the block."""
+        return self._lock.read()
+
+    def write_batch(self) -> AbstractContextManager[None]:
+        """Group mutations: readers see all of them or none."""
+        return self._lock.write()
+
+    def lock_stats(self) -> dict[str, Any]:
+        return self._lock.stats()
+
     @property
     def node_count(self) -> int:
         return self._graph.number_of_nodes()
 
     @property
     def edge_count(self) -> int:
-        return self._graph.number_of_edges()
+        return self._edge_count
 
     # ─── Node Operations ─────────────────────────────
 
-    def _add_node(self, node_id: str, node_type: str, data: BaseModel) -> None:
+    def _register_type(self, node_id: str, node_type: str) -> None:
+        """Record a node entering the graph (call before it is added)."""
+        if not self._graph.has_node(node_id):
+            self._nodes_by_type.setdefault(node_type, {})[node_id] = None
+
+    def _rebuild_type_registry(self) -> None:
+        """Re-derive the registry in graph order after a node changed type (rare)."""
+        self._nodes_by_type = {}
+        for nid, attrs in self._graph.nodes(data=True):
+            self._nodes_by_type.setdefault(attrs.get("node_type", "unknown"), {})[nid] = None
+
+    def _add_node(self, node_id: str, node_type: str, data: BaseModel) -> bool:
+        """Store a node. Returns False (graph untouched) when its content is unchanged."""
+        payload = data.model_dump()
+        stored = pack(type(data), payload) if self._compact else payload
+        previous = None
+        if self._graph.has_node(node_id):
+            attrs = self._graph.nodes[node_id]
+            previous = attrs.get("node_type", "unknown")
+            if previous == node_type and attrs.get("data") == stored:
+                return False
+        before = self.get_node_data(node_id) if previous == "match" else None
+        self._register_type(node_id, node_type)
         self._graph.add_node(
             node_id,
             node_type=node_type,
-            data=data.model_dump(),
+            data=stored,
         )
+        if previous is not None and previous != node_type:
+            self._rebuild_type_registry()
+        self._payload_digests.pop(node_id, None)
+        if node_type == "match":
+            self._similarity.update(node_id, payload)
+        if node_type == "team" or previous == "team":
+            self._index_team_names(node_id, payload if node_type == "team" else None)
+        self._stamp_node(node_id, node_type, previous, before, payload)
+        self._mutations += 1
+        return True
 
+    def _index_team_names(self, team_nid: str, data: Optional[dict[str, Any]]) -> None:
+        keys = tuple(dict.fromkeys(name_key(n) for n in (data["name"], data.get("short_name")) if n)) if data else ()
+        previous = self._team_name_keys.get(team_nid, ())
+        if keys == previous:
+            return
+        for key in previous:
+            _unindex(self._teams_by_name, key, team_nid)
+        for key in keys:
+            self._teams_by_name.setdefault(key, {})[team_nid] = None
+        if keys:
+            self._team_name_keys[team_nid] = keys
+        else:
+            self._team_name_keys.pop(team_nid, None)
+
+    @_logged
     def add_team(self, team: Team) -> str:
         self._add_node(team.node_id, "team", team)
         return team.node_id
 
+    @_logged
     def add_player(self, player: Player) -> str:
         self._add_node(player.node_id, "player", player)
-        # Auto-link player → team
-        team_node_id = f"team:{player.team_id}"
-        if self._graph.has_node(team_node_id):
-            self.link(team_node_id, player.node_id, EdgeType.HAS_PLAYER)
-            self.link(player.node_id, team_node_id, EdgeType.PLAYS_FOR)
+        self._link_player(player.node_id)
         return player.node_id
 
+    def _link_player(self, player_nid: str) -> None:
+        """Auto-link player ↔ team once the team exists."""
+        team_node_id = f"team:{self.get_node_data(player_nid)['team_id']}"
+        if self._graph.has_node(team_node_id):
+            self.link(team_node_id, player_nid, EdgeType.HAS_PLAYER)
+            self.link(player_nid, team_node_id, EdgeType.PLAYS_FOR)
+
+    @_logged
     def add_match(self, match: MatchNode) -> str:
         self._add_node(match.node_id, "match", match)
-        # Auto-link teams → match
-        home_nid = f"team:{match.home_team_id}"
-        away_nid = f"team:{match.away_team_id}"
+        self._link_match(match.node_id)
+        return match.node_id
+
+    def _link_match(self, match_nid: str) -> None:
+        """Auto-link teams → match once they exist, and file it in the H2H index."""
+        data = self.get_node_data(match_nid)
+        home_nid = f"team:{data['home_team_id']}"
+        away_nid = f"team:{data['away_team_id']}"
         if self._graph.has_node(home_nid):
-            self.link(home_nid, match.node_id, EdgeType.PLAYS_HOME)
+            self.link(home_nid, match_nid, EdgeType.PLAYS_HOME)
         if self._graph.has_node(away_nid):
-            self.link(away_nid, match.node_id, EdgeType.PLAYS_AWAY)
-        return match.node_id
+            self.link(away_nid, match_nid, EdgeType.PLAYS_AWAY)
+        self._index_h2h(match_nid, home_nid, away_nid, data["match_date"])
+
+    def _index_h2h(self, match_nid: str, home_nid: str, away_nid: str, match_date: Any) -> None:
+        """Keep the team-pair index in sync with the match's PLAYS_HOME/PLAYS_AWAY edges."""
+        linked = self._graph.has_node(home_nid) and self._graph.has_node(away_nid)
+        pair = frozenset((home_nid, away_nid))
+        previous = self._h2h_keys.get(match_nid)
+        if previous is not None and linked and previous[0] == pair and previous[1][0] == match_date:
+            return
+        if previous is None and not linked:
+            return
+        self._bump(_pair_stamp(home_nid.removeprefix("team:"), away_nid.removeprefix("team:")))
+        self._mutations += 1
+        if previous is not None:
+            del self._h2h_keys[match_nid]
+            matches = self._h2h[previous[0]]
+            matches.remove(match_nid)
+            if not matches:
+                del self._h2h[previous[0]]
 
+        if not linked:
+            return
+        seq = previous[1][1] if previous is not None else self._graph.number_of_nodes()
+        self._h2h_keys[match_nid] = (pair, (match_date, seq))
+        bisect.insort(self._h2h.setdefault(pair, []), match_nid, key=self._h2h_sort_key)
+
+    def _h2h_sort_key(self, match_nid: str) -> tuple[Any, int]:
+        return self._h2h_keys[match_nid][1]
+
+    @_logged
     def add_tip(self, tip: Tip) -> str:
         self._add_node(tip.node_id, "tip", tip)
         match_nid = f"match:{tip.match_id}"
@@ -118,17 +339,79 @@ class KnowledgeGraph:
             self.link(match_nid, tip.node_id, EdgeType.GENERATES_TIP)
         return tip.node_id
 
+    # ─── Upserts (raw payloads) ──────────────────────
+
+    @_logged
+    def upsert_team(self, payload: dict[str, Any]) -> tuple[str, UpsertStatus]:
+        """Insert/update a team from a raw dict, skipping validation when unchanged."""
+        return self._upsert("team", f"team:{payload['id']}", payload, Team, None)
+
+    @_logged
+    def upsert_player(self, payload: dict[str, Any]) -> tuple[str, UpsertStatus]:
+        return self._upsert("player", f"player:{payload['id']}", payload, Player, self._link_player)
+
+    @_logged
+    def upsert_match(self, payload: dict[str, Any]) -> tuple[str, UpsertStatus]:
+        return self._upsert("match", f"match:{payload['id']}", payload, MatchNode, self._link_match)
+
+    def _upsert(
+        self,
+        node_type: str,
+        node_id: str,
+        payload: dict[str, Any],
+        model: type[BaseModel],
+        auto_link: Optional[Callable[[str], None]],
+    ) -> tuple[str, UpsertStatus]:
+        """
+        Hash the raw payload and compare it with the last one stored for this node.
+
+        Identical payloads skip Pydantic validation and model_dump entirely;
+        auto-linking only runs its existence checks (links already in place
+        are no-ops). Payloads that differ but normalize to the same stored
+        data still count as unchanged.
+        """
+        digest = _payload_digest(payload)
+        if self._payload_digests.get(node_id) == digest:
+            status = UpsertStatus.UNCHANGED
+        else:
+            existed = self._graph.nodes[node_id].get("node_type") == node_type if self._graph.has_node(node_id) else False
+            changed = self._add_node(node_id, node_type, model(**payload))
+            self._payload_digests[node_id] = digest
+            self._mutations += 1
+            if not existed:
+                status = UpsertStatus.INSERTED
+            elif changed:
+                status = UpsertStatus.UPDATED
+            else:
+                status = UpsertStatus.UNCHANGED
+        if auto_link is not None:
+            auto_link(node_id)
+
+        counts = self._upsert_counts.setdefault(node_type, {s.value: 0 for s in UpsertStatus})
+        counts[status.value] += 1
+        return node_id, status
+
+    def upsert_stats(self) -> dict[str, dict[str, int]]:
+        """Cumulative inserted/updated/unchanged counts per node type."""
+        return {t: dict(c) for t, c in self._upsert_counts.items()}
+
     def get_node(self, node_id: str) -> Optional[dict[str, Any]]:
         if not self._graph.has_node(node_id):
             return None
-        return self._graph.nodes[node_id]
+        attrs = self._graph.nodes[node_id]
+        if isinstance(attrs.get("data"), Record):
+            return {**attrs, "data": NodeData(attrs["data"])}
+        return attrs
 
     def get_node_data(self, node_id: str) -> Optional[dict[str, Any]]:
-        node = self.get_node(node_id)
-        return node["data"] if node else None
+        if not self._graph.has_node(node_id):
+            return None
+        data = self._graph.nodes[node_id].get("data")
+        return NodeData(data) if isinstance(data, Record) else data
 
     # ─── Edge Operations ─────────────────────────────
 
+    @_logged
     def link(
         self,
         source: str,
@@ -137,6 +420,20 @@ class KnowledgeGraph:
         weight: float = 1.0,
         **metadata: Any,
     ) -> None:
+        previous = None
+        if self._graph.has_edge(source, target):
+            attrs = self._graph.edges[source, target]
+            previous = attrs["edge_type"]
+            if (
+                previous == edge_type.value
+                and attrs.get("weight") == weight
+                and all(attrs.get(k) == v for k, v in metadata.items())
+            ):
+                return
+        else:
+            # add_edge creates missing endpoints as untyped nodes
+            for node_id in (source, target):
+                self._register_type(node_id, "unknown")
         self._graph.add_edge(
             source,
             target,
@@ -144,6 +441,37 @@ class KnowledgeGraph:
             weight=weight,
             **metadata,
         )
+        if edge_type is EdgeType.HAS_PLAYER or (previous is not None and previous == EdgeType.HAS_PLAYER.value):
+            self._bump(f"squad:{source}")
+        self._mutations += 1
+        if previous is None:
+            self._edge_count += 1
+            self._out_by_type.setdefault((source, edge_type.value), {})[target] = None
+            self._in_by_type.setdefault((target, edge_type.value), {})[source] = None
+        elif previous != edge_type.value:
+            # Re-typed edge keeps its adjacency position: rebuild both buckets (rare)
+            _unindex(self._out_by_type, (source, previous), target)
+            _unindex(self._in_by_type, (target, previous), source)
+            self._out_by_type[(source, edge_type.value)] = {
+                t: None for t, d in self._graph.succ[source].items() if d["edge_type"] == edge_type.value
+            }
+            self._in_by_type[(target, edge_type.value)] = {
+                s: None for s, d in self._graph.pred[target].items() if d["edge_type"] == edge_type.value
+            }
+
+    @_logged
+    def unlink(self, source: str, target: str) -> None:
+        """Remove the edge source → target, if any."""
+        if not self._graph.has_edge(source, target):
+            return
+        edge_type = self._graph.edges[source, target]["edge_type"]
+        self._graph.remove_edge(source, target)
+        self._edge_count -= 1
+        _unindex(self._out_by_type, (source, edge_type), target)
+        _unindex(self._in_by_type, (target, edge_type), source)
+        if edge_type == EdgeType.HAS_PLAYER.value:
+            self._bump(f"squad:{source}")
+        self._mutations += 1
 
     def get_neighbors(
         self,
@@ -151,13 +479,11 @@ class KnowledgeGraph:
         edge_type: Optional[EdgeType] = None,
     ) -> list[str]:
         """Get all neighbors, optionally filtered by edge type."""
+        if edge_type is not None:
+            return list(self._out_by_type.get((node_id, edge_type.value), ()))
         if not self._graph.has_node(node_id):
             return []
-        neighbors = []
-        for _, target, data in self._graph.edges(node_id, data=True):
-            if edge_type is None or data.get("edge_type") == edge_type.value:
-                neighbors.append(target)
-        return neighbors
+        return list(self._graph.successors(node_id))
 
     def get_incoming(
         self,
@@ -165,21 +491,54 @@ class KnowledgeGraph:
         edge_type: Optional[EdgeType] = None,
     ) -> list[str]:
         """Get all nodes pointing TO this node."""
+        if edge_type is not None:
+            return list(self._in_by_type.get((node_id, edge_type.value), ()))
         if not self._graph.has_node(node_id):
             return []
-        result = []
-        for source, _, data in self._graph.in_edges(node_id, data=True):
-            if edge_type is None or data.get("edge_type") == edge_type.value:
-                result.append(source)
-        return result
+        return list(self._graph.predecessors(node_id))
 
     # ─── Query Operations ────────────────────────────
 
     def get_nodes_by_type(self, node_type: str) -> list[str]:
-        return [
-            nid for nid, attrs in self._graph.nodes(data=True)
-            if attrs.get("node_type") == node_type
-        ]
+        return list(self._nodes_by_type.get(node_type, ()))
+
+    def count_nodes_by_type(self, node_type: str) -> int:
+        return len(self._nodes_by_type.get(node_type, ()))
+
+    def find_team(self, name: str, league: Optional[str] = None) -> Optional[str]:
+        """
+        Team node ID for any spelling of its name or short name (see
+        graph.engine.names). `league` restricts the match to that league's
+        teams (and teams with no league); None when unknown or still ambiguous.
+        """
+        candidates = list(self._teams_by_name.get(name_key(name), ()))
+        if league:
+            candidates = [nid for nid in candidates if self.get_node_data(nid).get("league") in (league, "", None)]
+        return candidates[0] if len(candidates) == 1 else None
+
+    @_logged
+    def apply_standings(self, rows: list[dict[str, Any]], league: Optional[str] = None) -> dict[str, int]:
+        """
+        Set ranking and points on every team of a league table in one pass.
+
+        Rows are get_league_table dicts ("team_name", "ranking", "points"),
+        matched to team nodes through the name index (find_team). Returns
+        updated / unchanged / unmatched counts.
+        """
+        counts = {"updated": 0, "unchanged": 0, "unmatched": 0}
+        for row in rows:
+            team_nid = self.find_team(row["team_name"], league)
+            if team_nid is None:
+                counts["unmatched"] += 1
+                continue
+            data = self.get_node_data(team_nid)
+            ranking, points = row.get("ranking"), row.get("points")
+            if data.get("ranking") == ranking and data.get("points") == points:
+                counts["unchanged"] += 1
+                continue
+            self._add_node(team_nid, "team", Team(**{**data, "ranking": ranking, "points": points}))
+            counts["updated"] += 1
+        return counts
 
     def get_team_matches(self, team_node_id: str) -> list[str]:
         """All matches (home + away) for a team."""
@@ -187,11 +546,99 @@ class KnowledgeGraph:
         away = self.get_neighbors(team_node_id, EdgeType.PLAYS_AWAY)
         return home + away
 
-    def get_h2h_matches(self, team_a_id: str, team_b_id: str) -> list[str]:
-        """Find historical matches between two teams."""
-        a_matches = set(self.get_team_matches(team_a_id))
-        b_matches = set(self.get_team_matches(team_b_id))
-        return list(a_matches & b_matches)
+    def get_h2h_matches(
+        self,
+        team_a_id: str,
+        team_b_id: str,
+        last_n: Optional[int] = None,
+    ) -> list[str]:
+        """
+        Find matches between two teams, oldest first (sorted by match_date).
+
+        Args:
+            last_n: Only return the N most recent matches.
+        """
+        if team_a_id == team_b_id:
+            return self.get_team_matches(team_a_id)
+        matches = self._h2h.get(frozenset((team_a_id, team_b_id)), [])
+        if last_n is not None:
+            return matches[-last_n:] if last_n > 0 else []
+        return list(matches)
+
+    @_logged
+    def chain_h2h(self, team_a_id: str, team_b_id: str, match_node_ids: list[str]) -> int:
+        """
+        Thread a team pair's historical matches into one date-ordered chain.
+
+        Chronological neighbours are linked with HISTORICAL_H2H in both
+        directions, so the whole history stays reachable from any of its
+        matches with 2(n-1) edges instead of an n(n-1) clique. Matches already
+        chained at the same date are skipped: re-chaining is a no-op.
+        Returns the number of matches (re)inserted.
+        """
+        pair = frozenset((team_a_id, team_b_id))
+        chain = self._h2h_chains.get(pair)
+        if chain is None:
+            chain = self._h2h_chains[pair] = _H2HChain()
+            self._mutations += 1
+        inserted = 0
+        for nid in match_node_ids:
+            data = self.get_node_data(nid)
+            if data is None:
+                continue
+            current = chain.keys.get(nid)
+            if current is not None:
+                if current[0] == data["match_date"]:
+                    continue
+                self._unchain(chain, nid)
+                key = (data["match_date"], current[1])
+            else:
+                key = (data["match_date"], chain.seq)
+                chain.seq += 1
+
+            chain.keys[nid] = key
+            i = bisect.bisect_left(chain.order, key, key=chain.keys.__getitem__)
+            prev = chain.order[i - 1] if i > 0 else None
+            nxt = chain.order[i] if i < len(chain.order) else None
+            if prev and nxt:
+                self.unlink(prev, nxt)
+                self.unlink(nxt, prev)
+            chain.order.insert(i, nid)
+            for other in (prev, nxt):
+                if other:
+                    self.link(other, nid, EdgeType.HISTORICAL_H2H, weight=0.8)
+                    self.link(nid, other, EdgeType.HISTORICAL_H2H, weight=0.8)
+            inserted += 1
+        self._mutations += inserted
+        return inserted
+
+    def _unchain(self, chain: _H2HChain, nid: str) -> None:
+        i = chain.order.index(nid)
+        prev = chain.order[i - 1] if i > 0 else None
+        nxt = chain.order[i + 1] if i + 1 < len(chain.order) else None
+        for other in (prev, nxt):
+            if other:
+                self.unlink(other, nid)
+                self.unlink(nid, other)
+        if prev and nxt:
+            self.link(prev, nxt, EdgeType.HISTORICAL_H2H, weight=0.8)
+            self.link(nxt, prev, EdgeType.HISTORICAL_H2H, weight=0.8)
+        del chain.order[i]
+        del chain.keys[nid]
+
+    def get_h2h_group(self, match_node_id: str) -> list[str]:
+        """All matches reachable from this one through HISTORICAL_H2H edges."""
+        seen = {match_node_id}
+        frontier = [match_node_id]
+        group = []
+        while frontier:
+            nid = frontier.pop()
+            for other in self.get_neighbors(nid, EdgeType.HISTORICAL_H2H):
+                if other not in seen:
+                    seen.add(other)
+                    group.append(other)
+                    frontier.append(other)
+        return group
 
     def get_match_context(self, match_node_id: str) -> dict[str, Any]:
         """Extract full context around a match node: teams, players, venue, tips."""
@@ -234,27 +681,45 @@ class KnowledgeGraph:
         - Same league → weight 1.5
         - Similar team form → weight 1.0
         - Similar venue/weather → weight 0.5
+
+        Candidates come from the SimilarityIndex tiers, so only matches that
+        can score above zero are scored. Ties keep graph insertion order.
         """
         target = self.get_node_data(match_node_id)
         if not target:
             return []
 
-        all_matches = self.get_nodes_by_type("match")
-        scores: list[tuple[str, float]] = []
+        index = self._similarity
+        teams = frozenset((target["home_team_id"], target["away_team_id"]))
+        scores: dict[str, float] = {}
 
-        for mid in all_matches:
-            if mid == match_node_id:
-                continue
-            other = self.get_node_data(mid)
-            if not other or not other.get("is_historical"):
-                continue
+        def score(candidates: dict[str, None], limit: Optional[int] = None) -> None:
+            for mid in candidates:
+                if limit is not None and len(scores) >= limit:
+                    return
+                if mid == match_node_id or mid in scores:
+                    continue
+                s = self._compute_similarity(target, self.get_node_data(mid))
+                if s > 0:
+                    scores[mid] = s
 
-            score = self._compute_similarity(target, other)
-            if score > 0:
-                scores.append((mid, score))
+        # Exact H2H outranks everything else: stop there if it fills top_k
+        if len(teams) == 2 and top_k > 0:
+            score(index.pair_candidates(teams))
+        if top_k <= 0 or len(scores) < top_k:
+            score(index.overlap_candidates(teams, target.get("league")))
+        if top_k <= 0:
+            score(index.result_candidates())
+        elif len(scores) < top_k:
+            # Remaining candidates all tie at the result bonus: take them in order
+            score(index.result_candidates(), limit=top_k)
 
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:top_k]
+        def rank(item: tuple[str, float]) -> tuple[float, int]:
+            return (-item[1], index.order(item[0]))
+
+        if top_k <= 0:
+            return sorted(scores.items(), key=rank)[:top_k]
+        return heapq.nsmallest(top_k, scores.items(), key=rank)
 
     def _compute_similarity(self, target: dict, other: dict) -> float:
         """Compute a weighted similarity score between two match contexts."""
@@ -300,15 +765,302 @@ class KnowledgeGraph:
 
         return self._graph.subgraph(nodes).copy()
 
+    # ─── Revision Stamps ─────────────────────────────
+
+    def stamp(self, key: str) -> int:
+        """
+        Revision of one part of the graph cached analysis reads. It changes
+        with every mutation of that part and never goes back to an earlier
+        value (not even through load_snapshot): caches keep the stamps they
+        were computed at and compare them on every hit. Keys:
+
+        - a team or tip node ID: that node's data
+        - "squad:{team node ID}": its HAS_PLAYER links and their players' data
+        - "pair:{team ID}|{team ID}" (see _pair_stamp): the data and the H2H
+          index entries of every match between the two teams
+        - "similar:team:{team ID}", "similar:league:{league}",
+          "similar:results": the SimilarityIndex buckets (historical matches)
+
+        Matches are stamped per team pair rather than per node, which keeps
+        the stamps to a few per team however many matches the graph holds.
+        """
+        return self._stamps.get(key, self._epoch)
+
+    def analysis_stamps(
+        self,
+        match_nid: str,
+        home_id: str,
+        away_id: str,
+        with_results: bool = False,
+    ) -> Optional[tuple[Any, ...]]:
+        """
+        Version of everything MatchAnalyzer reasons on for a fixture: both
+        teams, the teams linked to the match and their squads, the H2H pair
+        and the match itself, and the similar-match buckets of its teams and
+        league (plus the result-only bucket when its similar matches reached
+        it). Equal tuples mean equal inputs. None when the match is not in
+        the graph.
+        """
+        match = self.get_node_data(match_nid)
+        if not match:
+            return None
+        match_home, match_away = match["home_team_id"], match["away_team_id"]
+        keys = [
+            f"team:{home_id}", f"team:{away_id}",
+            _pair_stamp(home_id, away_id), _pair_stamp(match_home, match_away),
+            f"similar:team:{match_home}", f"similar:team:{match_away}", f"similar:league:{match.get('league')}",
+        ]
+        if with_results:
+            keys.append("similar:results")
+        stamps, epoch = self._stamps, self._epoch
+        version: list[Any] = [stamps.get(key, epoch) for key in keys]
+        # The linked teams themselves are part of the version: links don't bump anything
+        for edge_type in (EdgeType.PLAYS_HOME, EdgeType.PLAYS_AWAY):
+            for team_nid in self._in_by_type.get((match_nid, edge_type.value), ()):
+                version += (team_nid, stamps.get(f"squad:{team_nid}", epoch))
+        return tuple(version)
+
+    def _bump(self, key: str) -> None:
+        self._revision += 1
+        self._stamps[key] = self._revision
+
+    def _stamp_node(
+        self,
+        node_id: str,
+        node_type: str,
+        previous: Optional[str],
+        before: Optional[dict[str, Any]],
+        data: dict[str, Any],
+    ) -> None:
+        """Bump the stamps a node's new data affects (see stamp)."""
+        if node_type in ("team", "tip") or previous in ("team", "tip"):
+            self._bump(node_id)
+        if node_type == "player" or previous == "player":
+            for team_nid in self._in_by_type.get((node_id, EdgeType.HAS_PLAYER.value), ()):
+                self._bump(f"squad:{team_nid}")
+        if before is not None:
+            self._stamp_match(before)
+        if node_type == "match":
+            self._stamp_match(data)
+
+    def _stamp_match(self, data: dict[str, Any]) -> None:
+        home_id, away_id = data["home_team_id"], data["away_team_id"]
+        self._bump(_pair_stamp(home_id, away_id))
+        if data.get("is_historical"):
+            self._bump(f"similar:team:{home_id}")
+            self._bump(f"similar:team:{away_id}")
+            self._bump(f"similar:league:{data.get('league')}")
+            if data.get("home_score") is not None:
+                self._bump("similar:results")
+
+    # ─── Persistence ─────────────────────────────────
+
+    def begin_snapshot(self, path: str | os.PathLike[str]) -> SnapshotJob:
+        """
+        Start writing a snapshot (see graph.engine.persistence.start_snapshot).
+
+        Holds the write lock only to rotate the mutation log and fork the
+        writer, which sees the graph as it is at that point: later mutations
+        go to the new log segment. Call job.wait() (from any thread), then
+        truncate_log(job) once the file is on disk.
+        """
+        with self._lock.write():
+            if self._log is not None:
+                self._log_generation = self._log.rotate()
+            state = {k: v for k, v in self.__dict__.items() if k not in _TRANSIENT_STATE}
+            return start_snapshot(path, GraphSnapshot(
+                state=state,
+                nodes=self.node_count,
+                edges=self._edge_count,
+                generation=self._log_generation,
+                compact=self._compact,
+            ))
+
+    def save_snapshot(self, path: str | os.PathLike[str]) -> int:
+        """Write a binary snapshot (see graph.engine.persistence). Returns bytes written."""
+        job = self.begin_snapshot(path)
+        size = job.wait()
+        self.truncate_log(job)
+        return size
+
+    def load_snapshot(self, path: str | os.PathLike[str]) -> dict[str, Any]:
+        """
+        Replace this graph's content with a snapshot. Returns the snapshot header.
+
+        The file is read into a fresh graph which only replaces this one
+        once fully loaded: a corrupt or truncated file raises ValueError and
+        leaves the current graph untouched. Node data is converted when the
+        snapshot was taken in the other storage mode. Load the snapshot
+        before open_log, which replays on top of it.
+        """
+        if self._log is not None or self._feed is not None:
+            raise RuntimeError("Load the snapshot before opening the mutation log or feed")
+        restored = KnowledgeGraph(compact=self._compact)
+        header = restored._restore(read_snapshot(path))
+        # Keep our own lock: readers and writers may be waiting on it
+        del restored.__dict__["_lock"]
+        with self._lock.write():
+            revision = self._revision + 1
+            self.__dict__.update(restored.__dict__)
+            # Nothing stamped before matches the new content: start above it all
+            self._revision = self._epoch = revision
+        return header
+
+    def _restore(self, frames: Any) -> dict[str, Any]:
+        graph = self._graph
+        header: dict[str, Any] = {}
+        for kind, payload in frames:
+            if kind == "header":
+                header = payload
+            elif kind == "state":
+                compact = self._compact
+                self.__dict__.update(payload)
+                if self._compact != compact:
+                    self._compact = compact
+                    for _, attrs in self._graph.nodes(data=True):
+                        attrs["data"] = self._stored(attrs["node_type"], attrs.get("data"))
+                self._snapshot_generation = self._log_generation
+                return header
+            elif kind == "nodes":
+                for _, attrs in payload:
+                    attrs["data"] = self._stored(attrs["node_type"], attrs.get("data"))
+                graph.add_nodes_from(payload)
+            elif kind == "edges":
+                graph.add_edges_from(payload)
+                for source, target, attrs in payload:
+                    edge_type = attrs["edge_type"]
+                    self._out_by_type.setdefault((source, edge_type), {})[target] = None
+                    self._in_by_type.setdefault((target, edge_type), {})[source] = None
+            elif kind == "aux":
+                self._h2h = payload["h2h"]
+                self._h2h_keys = payload["h2h_keys"]
+                self._h2h_chains = payload["h2h_chains"]
+                self._payload_digests = payload["payload_digests"]
+                self._upsert_counts = payload["upsert_counts"]
+                self._log_generation = self._snapshot_generation = payload.get("log_generation", 0)
+
+        self._edge_count = graph.number_of_edges()
+        self._rebuild_type_registry()
+        for nid in self._nodes_by_type.get("match", ()):
+            self._similarity.update(nid, self.get_node_data(nid))
+        for nid in self._nodes_by_type.get("team", ()):
+            self._index_team_names(nid, self.get_node_data(nid))
+        return header
+
+    def _stored(self, node_type: str, data: Any) -> Any:
+        """Node data as this graph's storage mode keeps it."""
+        if self._compact and isinstance(data, dict):
+            return pack(NODE_MODELS[node_type], data)
+        if not self._compact and isinstance(data, Record):
+            return unpack(data)
+        return data
+
+    def open_log(self, path: str | os.PathLike[str], sync_every: int = 1000) -> int:
+        """
+        Replay the mutation log on top of the current content, then keep
+        appending every mutation to it. Returns the number of replayed records.
+        """
+        log = MutationLog(path, sync_every=sync_every)
+        with self._lock.write():
+            replayed = self.replay(log.read(since=self._log_generation))
+            segments = log.segments()
+            log.open(max(self._log_generation, segments[-1][0] if segments else 0))
+            self._log = log
+        return replayed
+
+    def replay(self, records: Iterable[tuple[str, tuple, dict]]) -> int:
+        """Apply logged (name, args, kwargs) mutations. Returns how many."""
+        replayed = 0
+        with self._lock.write():
+            for name, args, kwargs in records:
+                getattr(self, name)(*args, **kwargs)
+                replayed += 1
+        return replayed
+
+    def start_feed(self) -> MutationFeed:
+        """Keep every logged mutation from now on in memory as well (see MutationFeed)."""
+        with self._lock.write():
+            if self._feed is None:
+                self._feed = MutationFeed()
+            return self._feed
+
+    def detach(self) -> None:
+        """
+        In a forked copy of the graph: stop appending to the parent's log
+        and feed. Dropping the log writes nothing: append() flushes every
+        record, so the copy of its buffer is empty.
+        """
+        self._log = None
+        self._feed = None
+
+    def sync_log(self) -> None:
+        """fsync pending log records (safe to call from a worker thread)."""
+        if self._log is not None:
+            self._log.sync()
+
+    def truncate_log(self, job: SnapshotJob) -> None:
+        """
+        Compaction once a snapshot is on disk: drop the log segments that
+        neither it nor the previous snapshot (kept as a fallback) needs.
+        """
+        if self._log is not None:
+            self._log.discard(before=self._snapshot_generation)
+        self._snapshot_generation = job.generation
+
+    def close_log(self) -> None:
+        with self._lock.write():
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
     # ─── Stats ───────────────────────────────────────
 
     def stats(self) -> dict[str, int]:
-        types: dict[str, int] = {}
-        for _, attrs in self._graph.nodes(data=True):
-            t = attrs.get("node_type", "unknown")
-            types[t] = types.get(t, 0) + 1
         return {
             "total_nodes": self.node_count,
             "total_edges": self.edge_count,
-            **{f"nodes_{k}": v for k, v in types.items()},
+            **{f"nodes_{k}": len(v) for k, v in self._nodes_by_type.items()},
         }
+
+
+class _H2HChain:
+    """Date-ordered match IDs of one team pair, plus their (match_date, seq) sort keys."""
+
+    __slots__ = ("order", "keys", "seq")
+
+    def __init__(self) -> None:
+        self.order: list[str] = []
+        self.keys: dict[str, tuple[Any, int]] = {}
+        self.seq = 0
+
+    def copy(self) -> _H2HChain:
+        chain = _H2HChain()
+        chain.order = list(self.order)
+        chain.keys = dict(self.keys)
+        chain.seq = self.seq
+        return chain
+
+    def __getstate__(self) -> tuple[list[str], dict[str, tuple[Any, int]], int]:
+        return (self.order, self.keys, self.seq)
+
+    def __setstate__(self, state: tuple[list[str], dict[str, tuple[Any, int]], int]) -> None:
+        self.order, self.keys, self.seq = state
+
+
+def _payload_digest(payload: dict[str, Any]) -> bytes:
+    # repr is key-order sensitive: a reordered payload only costs one validation
+    return hashlib.blake2b(repr(payload).encode(), digest_size=16).digest()
+
+
+def _pair_stamp(team_a: str, team_b: str) -> str:
+    """Stamp key of a team pair, whichever side is home."""
+    return f"pair:{team_a}|{team_b}" if team_a <= team_b else f"pair:{team_b}|{team_a}"
+
+
+def _unindex(index: dict[Any, dict[str, None]], key: Any, node_id: str) -> None:
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    bucket.pop(node_id, None)
+    if not bucket:
+        del index[key]
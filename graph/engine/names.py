@@ -0,0 +1,56 @@
+"""
+Names — Fuzzy-normalized team name keys.
+
+Upstreams spell clubs differently ("Paris Saint-Germain", "Paris St
+Germain FC", "PARIS SAINT-GERMAIN"); name_key maps such variants to one
+key, used by the resolution store and the graph's team name index.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Optional
+
+# Club-type tokens dropped from keys ("Olympique de Marseille" → "olympique marseille"),
+# unless only one word would be left: "FC Barcelona" and "Barcelona SC" are different clubs
+_NOISE_TOKENS = frozenset({
+    "fc", "cf", "afc", "ac", "as", "sc", "ssc", "cd", "sd", "ud", "sv", "club", "de", "the",
+})
+_SYNONYMS = {"st": "saint", "ste": "sainte", "utd": "united"}
+# Whole keys of one club's spellings no rule covers ("SG" alone names other clubs too)
+_ALIASES = {"paris sg": "paris saint germain", "psg": "paris saint germain"}
+# Shorter acronyms ("sr": Stade Rennais, Stade de Reims) name too many clubs
+MIN_ACRONYM = 3
+
+
+def _tokens(name: str) -> tuple[list[str], list[str]]:
+    """(significant words, club-type noise words) of a name, normalized."""
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().casefold()
+    words: list[str] = []
+    noise: list[str] = []
+    for token in re.sub(r"[^a-z0-9]+", " ", text).split():
+        if token in _NOISE_TOKENS:
+            noise.append(token)
+        else:
+            words.append(_SYNONYMS.get(token, token))
+    return words, noise
+
+
+def name_key(name: str) -> str:
+    """
+    Fuzzy-normalized lookup key: no accents, case, punctuation or club-type
+    noise. A single remaining word keeps its noise words (sorted), so
+    "FC Barcelona" and "Barcelona FC" share a key "Barcelona SC" doesn't.
+    """
+    words, noise = _tokens(name)
+    if len(words) == 1:
+        words += sorted(noise)
+    key = " ".join(words) or " ".join(noise) or name.strip().casefold()
+    return _ALIASES.get(key, key)
+
+
+def acronym(name: str) -> Optional[str]:
+    """'Paris Saint-Germain' → 'psg'; None when shorter than MIN_ACRONYM letters."""
+    words, _ = _tokens(name)
+    return "".join(w[0] for w in words) if len(words) >= MIN_ACRONYM else None
@@ -0,0 +1,425 @@
+"""
+Persistence — Binary snapshots of the KnowledgeGraph.
+
+File layout:
+    MAGIC | header frame | state
+    frame = uint32 little-endian length | pickle payload
+
+The header frame is a dict (version, counts, log generation); the state is
+one pickle of the graph's whole content, indexes included, so loading is a
+single unpickle instead of rebuilding the indexes node by node. The
+collector is paused while it runs: millions of freshly created containers
+would otherwise trigger repeated full collections. Version 1 files (chunked
+"nodes" / "edges" / "aux" frames, indexes rebuilt on load) are still read.
+
+Snapshots are written by a forked child (start_snapshot), which sees the
+graph as it was at the fork: the writer only pauses for the fork itself.
+Writing a snapshot keeps the one it replaces as <path>.prev, the fallback
+when the newest file turns out to be unreadable. The process writing a
+snapshot or log holds an advisory lock on <path>.lock (lock_snapshot), so
+a second one (another server, the backtest's --settle) refuses to start.
+
+Mutation log (write-ahead log):
+    <path>.<generation> segments, each WAL_MAGIC | frame | frame | ...
+    frame payload = (method name, args, kwargs) of one graph mutation
+
+Mutations made since the last snapshot are appended to the current
+segment. A snapshot records the generation it starts covering from; taking
+one rotates the log to a new segment, and once the snapshot is on disk the
+segments the previous snapshot no longer needs are deleted (compaction):
+both generations on disk stay replayable. Startup loads the snapshot, then
+replays every segment from that generation on. The same records can be
+kept in memory (MutationFeed) for forked copies of the graph to replay.
+"""
+
+from __future__ import annotations
+
+import gc
+import mmap
+import os
+import pickle
+import struct
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking
+    fcntl = None  # type: ignore[assignment]
+
+SNAPSHOT_MAGIC = b"SKGSNAP1"
+WAL_MAGIC = b"SKGWAL01"
+SNAPSHOT_VERSION = 2
+
+_LENGTH = struct.Struct("<I")
+
+
+@dataclass
+class GraphSnapshot:
+    """A KnowledgeGraph's content, ready to be written to disk."""
+    state: dict[str, Any]
+    nodes: int
+    edges: int
+    generation: int = 0
+    compact: bool = False
+
+
+# ─── Frames ──────────────────────────────────────────────
+
+def write_frame(fh: BinaryIO, obj: Any) -> int:
+    payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    fh.write(_LENGTH.pack(len(payload)))
+    fh.write(payload)
+    return _LENGTH.size + len(payload)
+
+
+def iter_frames(buf: memoryview, offset: int = 0) -> Iterator[tuple[int, Any]]:
+    """
+    Yield (end_offset, obj) for every complete frame in buf.
+
+    Stops silently at a truncated trailing frame (crash mid-write), so the
+    caller can tell how far the readable prefix goes.
+    """
+    size = len(buf)
+    while offset + _LENGTH.size <= size:
+        (length,) = _LENGTH.unpack_from(buf, offset)
+        end = offset + _LENGTH.size + length
+        if end > size:
+            return
+        try:
+            obj = pickle.loads(buf[offset + _LENGTH.size:end])
+        except Exception:
+            return
+        yield end, obj
+        offset = end
+
+
+# ─── Snapshots ───────────────────────────────────────────
+
+def previous_snapshot(path: str | os.PathLike[str]) -> Path:
+    """Where writing a snapshot keeps the one it replaces."""
+    path = Path(path)
+    return path.with_name(path.name + ".prev")
+
+
+def lock_snapshot(path: str | os.PathLike[str]) -> BinaryIO:
+    """
+    Exclusive advisory lock on <path>.lock, held until the returned file is
+    closed (or the process exits). RuntimeError when another process holds it.
+    """
+    lock_path = Path(f"{path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    fh = open(lock_path, "ab")
+    if fcntl is not None:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fh.close()
+            raise RuntimeError(f"{path} is in use by another process ({lock_path} is locked)") from None
+    return fh
+
+
+def write_snapshot(path: str | os.PathLike[str], snapshot: GraphSnapshot) -> int:
+    """
+    Write a snapshot atomically (temp file + rename). Returns bytes written.
+
+    The file it replaces becomes previous_snapshot(path).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+
+    with open(tmp, "wb") as fh:
+        fh.write(SNAPSHOT_MAGIC)
+        write_frame(fh, {
+            "version": SNAPSHOT_VERSION,
+            "compact": snapshot.compact,
+            "nodes": snapshot.nodes,
+            "edges": snapshot.edges,
+            "log_generation": snapshot.generation,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+        pickle.dump(snapshot.state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        fh.flush()
+        os.fsync(fh.fileno())
+        written = fh.tell()
+
+    if path.exists():
+        os.replace(path, previous_snapshot(path))
+    os.replace(tmp, path)
+    return written
+
+
+class SnapshotJob:
+    """A snapshot being written (see start_snapshot)."""
+
+    def __init__(self, generation: int, pid: Optional[int] = None,
+                 fd: Optional[int] = None, size: int = 0) -> None:
+        self.generation = generation
+        self.size = size
+        self._pid = pid
+        self._fd = fd
+
+    def wait(self) -> int:
+        """Block until the file is on disk. Returns bytes written; raises OSError if writing failed."""
+        if self._pid is not None:
+            _, status = os.waitpid(self._pid, 0)
+            self._pid = None
+            try:
+                message = os.read(self._fd, 4096) if os.waitstatus_to_exitcode(status) == 0 else b""
+            finally:
+                os.close(self._fd)
+            if not message.isdigit():
+                reason = message.decode(errors="replace") or f"exit status {os.waitstatus_to_exitcode(status)}"
+                raise OSError(f"Snapshot writer failed: {reason}")
+            self.size = int(message)
+        return self.size
+
+
+def start_snapshot(path: str | os.PathLike[str], snapshot: GraphSnapshot) -> SnapshotJob:
+    """
+    Write a snapshot from a forked child and return without waiting for it.
+
+    The child has its own copy of the state, frozen at the fork: the caller
+    may mutate the graph again as soon as this returns, and call wait() from
+    any thread. Where fork is unavailable the snapshot is written before
+    returning.
+    """
+    if not hasattr(os, "fork"):
+        return SnapshotJob(snapshot.generation, size=write_snapshot(path, snapshot))
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            gc.disable()
+            try:
+                message = str(write_snapshot(path, snapshot)).encode()
+            except BaseException as e:
+                message = f"{type(e).__name__}: {e}".encode()[:4096]
+            os.write(write_fd, message)
+        finally:
+            # Skip atexit handlers and buffered files inherited from the parent
+            os._exit(0)
+    os.close(write_fd)
+    return SnapshotJob(snapshot.generation, pid=pid, fd=read_fd)
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def read_snapshot(path: str | os.PathLike[str]) -> Iterator[tuple[str, Any]]:
+    """
+    Stream a snapshot file as ("header" | "state", payload), or for version 1
+    files as ("header" | "nodes" | "edges" | "aux", payload).
+
+    Raises ValueError on a foreign or truncated file; nothing is yielded
+    past the header until the file has been validated that far.
+    """
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size < len(SNAPSHOT_MAGIC):
+            raise ValueError(f"Not a graph snapshot: {path}")
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            buf = memoryview(mm)
+            try:
+                if bytes(buf[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+                    raise ValueError(f"Not a graph snapshot: {path}")
+
+                frames = iter_frames(buf, len(SNAPSHOT_MAGIC))
+                offset, header = next(frames, (0, None))
+                if not isinstance(header, dict) or header.get("version") not in (1, SNAPSHOT_VERSION):
+                    raise ValueError(f"Unsupported snapshot version in {path}")
+                yield "header", header
+
+                if header["version"] == SNAPSHOT_VERSION:
+                    try:
+                        with _gc_paused():
+                            state = pickle.loads(buf[offset:])
+                    except Exception as e:
+                        raise ValueError(f"Truncated or corrupt graph snapshot {path}: {e}") from e
+                    yield "state", state
+                    return
+
+                complete = False
+                for _, (kind, payload) in frames:
+                    yield kind, payload
+                    if kind == "aux":
+                        complete = True
+                if not complete:
+                    raise ValueError(f"Truncated graph snapshot: {path}")
+            finally:
+                buf.release()
+
+
+# ─── Mutation Log ────────────────────────────────────────
+
+class MutationLog:
+    """
+    Append-only log of graph mutations, split into numbered segments.
+
+    append() writes and flushes one frame (a crashed process loses nothing);
+    fsync is batched: every `sync_every` records, or whenever sync() is
+    called (the API calls it from a worker thread once per second).
+    """
+
+    def __init__(self, path: str | os.PathLike[str], sync_every: int = 1000) -> None:
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self._fh: Optional[BinaryIO] = None
+        self._generation = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def segment(self, generation: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{generation}")
+
+    def segments(self) -> list[tuple[int, Path]]:
+        """Existing (generation, path) segments, oldest first."""
+        prefix = self.path.name + "."
+        found = []
+        if self.path.parent.is_dir():
+            for p in self.path.parent.iterdir():
+                suffix = p.name[len(prefix):]
+                if p.name.startswith(prefix) and suffix.isdigit():
+                    found.append((int(suffix), p))
+        return sorted(found)
+
+    def read(self, since: int = 0) -> Iterator[Any]:
+        """Yield every record of the segments with generation >= since, in order."""
+        for generation, path in self.segments():
+            if generation >= since:
+                for _, record in _read_segment(path):
+                    yield record
+
+    # ─── Writing ─────────────────────────────────────
+
+    def open(self, generation: int) -> None:
+        """Start appending to a segment, dropping any torn trailing frame."""
+        with self._lock:
+            self._close()
+            path = self.segment(generation)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists() and path.stat().st_size >= len(WAL_MAGIC):
+                end = len(WAL_MAGIC)
+                for end, _ in _read_segment(path):
+                    pass
+                fh = open(path, "r+b")
+                fh.truncate(end)
+                fh.seek(end)
+            else:
+                fh = open(path, "wb")
+                fh.write(WAL_MAGIC)
+                fh.flush()
+                os.fsync(fh.fileno())
+            self._fh = fh
+            self._generation = generation
+
+    def append(self, record: Any) -> None:
+        if self._fh is None:
+            raise RuntimeError("Mutation log is not open")
+        write_frame(self._fh, record)
+        self._fh.flush()
+        self._pending += 1
+        if self._pending >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """fsync the records appended since the last sync (thread-safe)."""
+        with self._lock:
+            if self._fh is not None and self._pending:
+                self._pending = 0
+                os.fsync(self._fh.fileno())
+
+    def rotate(self) -> int:
+        """Continue in a new segment. Returns its generation."""
+        self.open(self._generation + 1)
+        return self._generation
+
+    def discard(self, before: int) -> None:
+        """Delete segments older than `before` (already covered by a snapshot)."""
+        for generation, path in self.segments():
+            if generation < before and generation != self._generation:
+                path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._fh is not None:
+            if self._pending:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+                self._pending = 0
+            self._fh.close()
+            self._fh = None
+
+
+class MutationFeed:
+    """
+    The log's records kept in memory, for copies of the graph in other
+    processes to replay (the analysis workers, graph.engine.executor).
+
+    Records are pickled as they are appended, so later changes to the
+    objects passed in don't leak into them. Positions count records since
+    the feed started; trim() drops the ones every reader has replayed.
+    """
+
+    def __init__(self) -> None:
+        self._records: list[bytes] = []
+        self._start = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def position(self) -> int:
+        with self._lock:
+            return self._start + len(self._records)
+
+    def append(self, record: Any) -> None:
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._records.append(payload)
+
+    def since(self, position: int, end: int) -> list[bytes]:
+        """Pickled records [position, end); position must not be trimmed yet."""
+        with self._lock:
+            if position < self._start:
+                raise ValueError(f"Feed records before {self._start} were trimmed (asked for {position})")
+            return self._records[position - self._start:end - self._start]
+
+    def trim(self, position: int) -> None:
+        """Drop the records before position."""
+        with self._lock:
+            drop = position - self._start
+            if drop > 0:
+                del self._records[:drop]
+                self._start = position
+
+
+def _read_segment(path: Path) -> Iterator[tuple[int, Any]]:
+    """Yield (end_offset, record) for the readable prefix of a log segment."""
+    data = path.read_bytes()
+    if len(data) < len(WAL_MAGIC) and WAL_MAGIC.startswith(data):
+        return  # crashed while creating the segment
+    if not data.startswith(WAL_MAGIC):
+        raise ValueError(f"Not a graph mutation log: {path}")
+    yield from iter_frames(memoryview(data), len(WAL_MAGIC))
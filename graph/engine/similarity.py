@@ -0,0 +1,114 @@
+"""
+Similarity Index — Candidate buckets for KnowledgeGraph.find_similar_matches.
+
+Historical matches are bucketed by team pair, by team and by league so a
+query only scores matches that can share a signal with the target. Scoring
+itself stays in KnowledgeGraph._compute_similarity; this index only decides
+which matches are worth scoring and in which order ties resolve.
+
+Score tiers (see _compute_similarity):
+- Same team pair      → >= 3.0
+- One team / league   → 1.0 .. 2.8
+- Result data only    → 0.3
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+
+class SimilarityIndex:
+    """
+    Maintained buckets of historical match node IDs.
+
+    Every bucket is an insertion-ordered dict used as an ordered set.
+    `_order` remembers when each match entered the index so ties resolve
+    exactly like the old full scan (graph insertion order).
+    """
+
+    def __init__(self) -> None:
+        self._by_pair: dict[frozenset[str], dict[str, None]] = {}
+        self._pairs: dict[frozenset[str], frozenset[str]] = {}  # one shared key per pair
+        self._by_team: dict[str, dict[str, None]] = {}
+        self._by_league: dict[Optional[str], dict[str, None]] = {}
+        self._with_result: dict[str, None] = {}
+        self._with_result_sorted = True
+        self._order: dict[str, int] = {}
+        self._keys: dict[str, tuple[frozenset[str], Optional[str], bool]] = {}
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def order(self, node_id: str) -> int:
+        return self._order[node_id]
+
+    # ─── Maintenance ─────────────────────────────────
+
+    def update(self, node_id: str, data: dict[str, Any]) -> None:
+        """(Re-)index a match node from its stored data dict."""
+        self._order.setdefault(node_id, len(self._order))
+        self.discard(node_id)
+        if not data.get("is_historical"):
+            return
+
+        teams = frozenset((data["home_team_id"], data["away_team_id"]))
+        teams = self._pairs.setdefault(teams, teams)
+        league = data.get("league")
+        has_result = data.get("home_score") is not None
+
+        self._by_pair.setdefault(teams, {})[node_id] = None
+        for team_id in teams:
+            self._by_team.setdefault(team_id, {})[node_id] = None
+        self._by_league.setdefault(league, {})[node_id] = None
+        if has_result:
+            if self._with_result and self._order[node_id] < self._order[next(reversed(self._with_result))]:
+                self._with_result_sorted = False
+            self._with_result[node_id] = None
+
+        self._keys[node_id] = (teams, league, has_result)
+
+    def discard(self, node_id: str) -> None:
+        keys = self._keys.pop(node_id, None)
+        if keys is None:
+            return
+        teams, league, has_result = keys
+        _drop(self._by_pair, teams, node_id)
+        for team_id in teams:
+            _drop(self._by_team, team_id, node_id)
+        _drop(self._by_league, league, node_id)
+        if has_result:
+            self._with_result.pop(node_id, None)
+
+    # ─── Candidate Tiers ─────────────────────────────
+
+    def pair_candidates(self, teams: frozenset[str]) -> dict[str, None]:
+        """Matches between exactly these two teams (score >= 3.0)."""
+        return self._by_pair.get(teams, {})
+
+    def overlap_candidates(self, teams: frozenset[str], league: Optional[str]) -> dict[str, None]:
+        """Matches sharing at least one team or the league (score >= 1.0)."""
+        candidates: dict[str, None] = {}
+        for team_id in teams:
+            candidates.update(self._by_team.get(team_id, {}))
+        candidates.update(self._by_league.get(league, {}))
+        return candidates
+
+    def result_candidates(self) -> dict[str, None]:
+        """Every historical match carrying a result (score >= 0.3), in insertion order."""
+        if not self._with_result_sorted:
+            ordered = sorted(self._with_result, key=self._order.__getitem__)
+            self._with_result = dict.fromkeys(ordered)
+            self._with_result_sorted = True
+        return self._with_result
+
+
+def _drop(buckets: dict[Any, dict[str, None]], key: Any, node_id: str) -> None:
+    bucket = buckets.get(key)
+    if bucket is None:
+        return
+    bucket.pop(node_id, None)
+    if not bucket:
+        del buckets[key]
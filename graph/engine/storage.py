@@ -0,0 +1,184 @@
+"""
+Compact Node Storage — `__slots__` records instead of model_dump() dicts.
+
+In compact mode the KnowledgeGraph stores each node as a slotted record
+holding only the model's declared fields: nested models become nested
+records, lists become tuples and categorical strings (league, country,
+status, team IDs...) are interned. Computed fields (`form_score`,
+`reasoning_summary`, `result`...) are not stored; `NodeData` computes
+them on access by running the model's own property against the record.
+
+`NodeData` is a read-only Mapping with exactly the keys and values of
+`model.model_dump()`, so callers keep using `data["league"]`,
+`data.get("venue")` and dict comparisons unchanged.
+"""
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional, get_args
+
+from pydantic import BaseModel
+
+# Low-cardinality string fields shared by many nodes
+INTERNED_FIELDS = frozenset({
+    "league", "country", "status", "kick_off", "city", "stadium",
+    "home_team_id", "away_team_id", "team_id", "match_id",
+    "position", "nationality", "importance", "market", "selection", "source_node",
+})
+
+_RECORD_TYPES: dict[str, type[Record]] = {}
+
+
+class Record:
+    """Base class of the generated per-model record types."""
+
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+    _computed: tuple[str, ...] = ()
+    _nested: dict[str, type[Record]] = {}
+
+    def __eq__(self, other: object) -> bool:
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self._fields)
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, f) for f in self._fields))
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (_rebuild, (type(self).__name__, tuple(getattr(self, f) for f in self._fields)))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{f}={getattr(self, f)!r}' for f in self._fields)})"
+
+
+def _rebuild(name: str, values: tuple[Any, ...]) -> Record:
+    cls = _RECORD_TYPES.get(name)
+    if cls is None:
+        # Unpickling in a fresh process: register the record type on first use
+        import graph.models
+        cls = record_type(getattr(graph.models, name.removesuffix("Record")))
+    record = object.__new__(cls)
+    for field, value in zip(record._fields, values):
+        object.__setattr__(record, field, value)
+    return record
+
+
+def _nested_model(annotation: Any) -> Optional[type[BaseModel]]:
+    """Find the BaseModel inside Optional[...] / list[...] annotations."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = _nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+def record_type(model: type[BaseModel]) -> type[Record]:
+    """Slotted record class mirroring a Pydantic model (created once per model)."""
+    name = f"{model.__name__}Record"
+    cls = _RECORD_TYPES.get(name)
+    if cls is not None:
+        return cls
+
+    fields = tuple(model.model_fields)
+    computed = tuple(model.model_computed_fields)
+    namespace: dict[str, Any] = {
+        "__slots__": fields,
+        "_fields": fields,
+        "_computed": computed,
+        "_nested": {},
+    }
+    # Computed fields are the model's own properties, evaluated against the record
+    for key, info in model.model_computed_fields.items():
+        namespace[key] = info.wrapped_property
+    cls = type(name, (Record,), namespace)
+    _RECORD_TYPES[name] = cls
+
+    for field, info in model.model_fields.items():
+        nested = _nested_model(info.annotation)
+        if nested is not None:
+            cls._nested[field] = record_type(nested)
+    return cls
+
+
+def pack(model: type[BaseModel], data: dict[str, Any]) -> Record:
+    """Build a compact record from a model_dump() dict."""
+    cls = record_type(model)
+    return _pack(cls, data)
+
+
+def _pack(cls: type[Record], data: dict[str, Any]) -> Record:
+    record = object.__new__(cls)
+    nested = cls._nested
+    for field in cls._fields:
+        value = data.get(field)
+        if value is None:
+            pass
+        elif field in nested:
+            sub = nested[field]
+            value = tuple(_pack(sub, v) for v in value) if isinstance(value, list) else _pack(sub, value)
+        elif isinstance(value, list):
+            value = tuple(value)
+        elif isinstance(value, str) and field in INTERNED_FIELDS:
+            value = sys.intern(value)
+        object.__setattr__(record, field, value)
+    return record
+
+
+def unpack(record: Record) -> dict[str, Any]:
+    """Materialize the full model_dump() dict (computed fields included)."""
+    return {key: _value(record, key) for key in (*record._fields, *record._computed)}
+
+
+def _value(record: Record, key: str) -> Any:
+    value = getattr(record, key)
+    if isinstance(value, Record):
+        return unpack(value)
+    if isinstance(value, tuple):
+        return [unpack(v) if isinstance(v, Record) else v for v in value]
+    return value
+
+
+class NodeData(Mapping):
+    """Lazy, read-only dict view over a compact record."""
+
+    __slots__ = ("_record",)
+
+    def __init__(self, record: Record) -> None:
+        self._record = record
+
+    @property
+    def record(self) -> Record:
+        return self._record
+
+    def __getitem__(self, key: str) -> Any:
+        record = self._record
+        if key in record._fields or key in record._computed:
+            return _value(record, key)
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._record._fields or key in self._record._computed
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._record._fields
+        yield from self._record._computed
+
+    def __len__(self) -> int:
+        return len(self._record._fields) + len(self._record._computed)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, NodeData):
+            return self._record == other._record
+        if isinstance(other, Mapping):
+            return unpack(self._record) == dict(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"NodeData({unpack(self._record)!r})"
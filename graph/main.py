@@ -4,43 +4,201 @@ Shannon Knowledge Graph — FastAPI Entry Point
 Endpoints:
   GET  /health              Health check + graph stats
   POST /analyze             Full match analysis with reasoning path
+  POST /analyze/batch       Analyze many fixtures at once (streamed NDJSON)
   POST /analyze/quick       Quick analysis from team names only
   GET  /graph/stats         Graph node/edge statistics
   POST /ingest/team         Ingest a team into the graph
   POST /ingest/match        Ingest a match into the graph
   GET  /site/matches        Fetch today's matches from PronoScope
+  POST /site/analyze/all    Analyze every PronoScope match of a date (NDJSON)
 """
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import os
+import time
 from contextlib import asynccontextmanager
-from typing import Any
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
 
+import httpx
 from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from graph.engine.knowledge_graph import KnowledgeGraph
 from graph.engine.analyzer import MatchAnalyzer
-from graph.services.ingestion import DataIngestionService
+from graph.engine.executor import AnalysisExecutor
+from graph.engine.persistence import lock_snapshot, previous_snapshot
+from graph.services.ingestion import DataIngestionService, extract_form
+from graph.services.prefetch import MatchdayPrefetcher
+from graph.services.store import ResolutionStore
 
 logger = logging.getLogger("shannon")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
 
 # ─── Shared State ─────────────────────────────────────────
 
-kg = KnowledgeGraph()
+# SHANNON_COMPACT_GRAPH=1 stores nodes as slotted records (lower memory per node)
+kg = KnowledgeGraph(compact=os.environ.get("SHANNON_COMPACT_GRAPH", "0") == "1")
 analyzer = MatchAnalyzer(kg)
+# Every graph call from a handler goes through the executor: mutations on its writer
+# thread, reads on its reader threads (see graph.engine.concurrency). Batches of
+# SHANNON_PROCESS_MIN_FIXTURES+ fixtures are reasoned by SHANNON_ANALYSIS_PROCESSES
+# forked workers (default: one per core; 0 or 1 disables the process pool).
+ANALYSIS_PROCESSES = int(os.environ.get("SHANNON_ANALYSIS_PROCESSES", os.cpu_count() or 1))
+PROCESS_MIN_FIXTURES = int(os.environ.get("SHANNON_PROCESS_MIN_FIXTURES", "64"))
+executor = AnalysisExecutor(analyzer, processes=ANALYSIS_PROCESSES, process_min_fixtures=PROCESS_MIN_FIXTURES)
 ingestion: DataIngestionService | None = None
+prefetcher: MatchdayPrefetcher | None = None
+
+# Graph snapshot: restored at startup, rewritten periodically and at shutdown
+# (the previous generation is kept as <path>.prev). An empty
+# SHANNON_SNAPSHOT_PATH disables persistence.
+SNAPSHOT_PATH = os.environ.get("SHANNON_SNAPSHOT_PATH", "data/graph.skg")
+SNAPSHOT_INTERVAL = float(os.environ.get("SHANNON_SNAPSHOT_INTERVAL", "600"))
+
+# Mutation log: every graph mutation since the last snapshot, replayed at startup.
+# fsync is batched every SHANNON_WAL_SYNC_INTERVAL seconds. Empty path disables it.
+WAL_PATH = os.environ.get("SHANNON_WAL_PATH", "data/graph.wal")
+WAL_SYNC_INTERVAL = float(os.environ.get("SHANNON_WAL_SYNC_INTERVAL", "1"))
+
+# Concurrent enrich_match calls in /site/analyze/all
+SITE_ENRICH_CONCURRENCY = 8
+
+# Persistent team / geocode resolutions (empty path disables). SHANNON_TEAM_SEED
+# optionally names a file of team names (one per line) resolved at startup.
+STORE_PATH = os.environ.get("SHANNON_STORE_PATH", "data/resolution.sqlite3")
+TEAM_SEED_PATH = os.environ.get("SHANNON_TEAM_SEED", "")
+
+# Matchday prefetch: every SHANNON_PREFETCH_INTERVAL seconds, resolve and ingest
+# fixtures from today to SHANNON_PREFETCH_DAYS days ahead,
+# SHANNON_PREFETCH_CONCURRENCY fixtures at a time. Opt-in (0 = off): it spends
+# the same TheSportsDB rate budget as interactive requests (e.g. 900 with a paid key).
+PREFETCH_INTERVAL = float(os.environ.get("SHANNON_PREFETCH_INTERVAL", "0"))
+PREFETCH_DAYS = int(os.environ.get("SHANNON_PREFETCH_DAYS", "1"))
+PREFETCH_CONCURRENCY = int(os.environ.get("SHANNON_PREFETCH_CONCURRENCY", "2"))
+
+
+def _restore_snapshot() -> None:
+    """
+    Load the newest readable snapshot generation. Refuses to start when
+    snapshots exist but none can be read: serving the log tail replayed on
+    an empty graph would lose the history, and the next snapshot would
+    overwrite it for good.
+    """
+    if not SNAPSHOT_PATH:
+        return
+    previous = previous_snapshot(SNAPSHOT_PATH)
+    candidates = [p for p in (Path(SNAPSHOT_PATH), previous) if p.exists()]
+    for path in candidates:
+        started = time.perf_counter()
+        try:
+            header = kg.load_snapshot(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not restore graph snapshot {path}: {e}")
+            continue
+        if path == previous and Path(SNAPSHOT_PATH).exists():
+            # Set the unreadable file aside: the next snapshot must not rotate it into .prev
+            os.replace(SNAPSHOT_PATH, f"{SNAPSHOT_PATH}.corrupt")
+        logger.info(
+            f"Restored graph snapshot {path} from {header.get('created_at')}: "
+            f"{kg.node_count} nodes, {kg.edge_count} edges in {time.perf_counter() - started:.2f}s"
+        )
+        return
+    if candidates:
+        raise RuntimeError(f"No readable graph snapshot among {', '.join(map(str, candidates))}")
+
+
+def _open_log() -> None:
+    if not WAL_PATH:
+        return
+    started = time.perf_counter()
+    replayed = kg.open_log(WAL_PATH)
+    if replayed:
+        logger.info(f"Replayed {replayed} graph mutations from {WAL_PATH} in {time.perf_counter() - started:.2f}s")
+
+
+async def _save_snapshot() -> None:
+    # Fork the writer on the writer thread (between two write batches), wait off it
+    started = time.perf_counter()
+    job = await executor.run(kg.begin_snapshot, SNAPSHOT_PATH)
+    paused = time.perf_counter() - started
+    size = await asyncio.to_thread(job.wait)
+    await executor.run(kg.truncate_log, job)
+    logger.info(
+        f"Graph snapshot written: {size / 1e6:.1f} MB in {time.perf_counter() - started:.2f}s "
+        f"(writes paused {paused * 1000:.0f}ms)"
+    )
+
+
+async def _snapshot_loop() -> None:
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        try:
+            await _save_snapshot()
+        except Exception as e:
+            logger.error(f"Periodic graph snapshot failed: {e}")
+
+
+async def _preload_teams(path: str) -> None:
+    with open(path, encoding="utf-8") as fh:
+        names = [line.strip() for line in fh if line.strip()]
+    started = time.perf_counter()
+    resolved = await ingestion.preload_teams(names)
+    logger.info(f"Team seed: {resolved}/{len(names)} names resolved in {time.perf_counter() - started:.1f}s")
+
+
+async def _log_sync_loop() -> None:
+    while True:
+        await asyncio.sleep(WAL_SYNC_INTERVAL)
+        try:
+            await asyncio.to_thread(kg.sync_log)
+        except OSError as e:
+            logger.error(f"Graph mutation log sync failed: {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global ingestion
-    ingestion = DataIngestionService()
+    global ingestion, prefetcher
+    # One process at a time writes the snapshot and the log
+    locks = [lock_snapshot(path) for path in (SNAPSHOT_PATH, WAL_PATH) if path]
+    _restore_snapshot()
+    _open_log()
+    # Before anything starts a thread (see graph.engine.executor)
+    executor.start_workers()
+    snapshot_task = asyncio.create_task(_snapshot_loop()) if SNAPSHOT_PATH and SNAPSHOT_INTERVAL > 0 else None
+    sync_task = asyncio.create_task(_log_sync_loop()) if WAL_PATH and WAL_SYNC_INTERVAL > 0 else None
+    ingestion = DataIngestionService(store=ResolutionStore(STORE_PATH) if STORE_PATH else None)
+    seed_task = asyncio.create_task(_preload_teams(TEAM_SEED_PATH)) if TEAM_SEED_PATH else None
+    prefetch_task = None
+    if PREFETCH_INTERVAL > 0:
+        prefetcher = MatchdayPrefetcher(
+            ingestion, executor,
+            interval=PREFETCH_INTERVAL,
+            horizon_days=PREFETCH_DAYS,
+            concurrency=PREFETCH_CONCURRENCY,
+        )
+        prefetch_task = asyncio.create_task(prefetcher.run())
     logger.info("Shannon Knowledge Graph started")
     yield
+    for task in (snapshot_task, sync_task, seed_task, prefetch_task):
+        if task:
+            task.cancel()
+    if SNAPSHOT_PATH:
+        try:
+            await _save_snapshot()
+        except Exception as e:
+            logger.error(f"Final graph snapshot failed: {e}")
+    executor.close()
+    kg.close_log()
+    for lock in locks:
+        lock.close()
     await ingestion.close()
     logger.info("Shannon Knowledge Graph stopped")
 
@@ -119,6 +277,11 @@ class AnalyzeRequest(BaseModel):
     h2h_history: list[dict[str, Any]] = Field(default_factory=list)
     home_players: list[dict[str, Any]] = Field(default_factory=list)
     away_players: list[dict[str, Any]] = Field(default_factory=list)
+    h2h_limit: int | None = Field(default=None, ge=0, description="Only weigh the N most recent H2H matches")
+
+
+class BatchAnalyzeRequest(BaseModel):
+    fixtures: list[AnalyzeRequest] = Field(min_length=1)
 
 
 class QuickAnalyzeRequest(BaseModel):
@@ -144,45 +307,71 @@ async def health():
     return {
         "status": "ok",
         "engine": "Shannon Knowledge Graph v0.1.0",
-        "graph": kg.stats(),
+        "graph": await executor.read(kg.stats),
+        "upserts": await executor.read(kg.upsert_stats),
+        "executor": executor.stats(),
+        "cache": ingestion.cache_stats() if ingestion else None,
+        "upstreams": ingestion.upstream_stats() if ingestion else None,
+        "prefetch": prefetcher.stats() if prefetcher else None,
     }
 
 
 @app.get("/graph/stats")
 async def graph_stats():
-    return kg.stats()
+    return await executor.read(kg.stats)
 
 
 @app.post("/ingest/team")
 async def ingest_team(team: TeamInput):
-    node_id = analyzer.ingest_team(team.model_dump())
-    return {"node_id": node_id, "graph_stats": kg.stats()}
+    node_id = await executor.run(analyzer.ingest_team, team.model_dump())
+    return {"node_id": node_id, "graph_stats": await executor.read(kg.stats)}
 
 
 @app.post("/ingest/match")
 async def ingest_match(match: MatchInput):
-    node_id = analyzer.ingest_match(match.model_dump())
-    return {"node_id": node_id, "graph_stats": kg.stats()}
+    node_id = await executor.run(analyzer.ingest_match, match.model_dump())
+    return {"node_id": node_id, "graph_stats": await executor.read(kg.stats)}
 
 
 @app.post("/analyze")
 async def analyze_match(req: AnalyzeRequest):
     """Full analysis with all provided data."""
     # Ingest match into graph first
-    match_nid = analyzer.ingest_match(req.match.model_dump())
+    match_nid = await executor.run(analyzer.ingest_match, req.match.model_dump())
 
-    result = analyzer.analyze(
+    result = await executor.analyze(
         match_id=match_nid,
         home_team=req.home_team.model_dump(),
         away_team=req.away_team.model_dump(),
         h2h_history=req.h2h_history or None,
         home_players=req.home_players or None,
         away_players=req.away_players or None,
+        h2h_limit=req.h2h_limit,
     )
 
     return result
 
 
+@app.post("/analyze/batch")
+async def analyze_batch(req: BatchAnalyzeRequest):
+    """
+    Analyze a list of fixtures in one request.
+
+    Shared teams, players and H2H histories are ingested once. Results
+    stream back as NDJSON, one {"index", ...analysis} line per fixture in
+    request order.
+    """
+    fixtures = [f.model_dump() for f in req.fixtures]
+
+    async def results() -> AsyncIterator[dict[str, Any]]:
+        i = 0
+        async for r in executor.analyze_batch(fixtures):
+            yield {"index": i, **r}
+            i += 1
+
+    return _ndjson(results())
+
+
 @app.post("/analyze/quick")
 async def quick_analyze(req: QuickAnalyzeRequest):
     """
@@ -192,25 +381,52 @@ async def quick_analyze(req: QuickAnalyzeRequest):
     if not ingestion:
         raise HTTPException(503, "Ingestion service not ready")
 
-    # Step 1: Resolve teams via TheSportsDB
-    home_team = await ingestion.search_team(req.home_team_name)
+    timings: dict[str, float] = {}
+    started = stage_start = time.perf_counter()
+
+    def stage(name: str) -> None:
+        nonlocal stage_start
+        now = time.perf_counter()
+        timings[name] = round((now - stage_start) * 1000, 1)
+        stage_start = now
+
+    # Step 1: Resolve both teams via TheSportsDB (in parallel)
+    home_team, away_team = await asyncio.gather(
+        ingestion.search_team(req.home_team_name),
+        ingestion.search_team(req.away_team_name),
+    )
+    stage("resolve_teams")
     if not home_team:
         raise HTTPException(404, f"Team not found: {req.home_team_name}")
-
-    away_team = await ingestion.search_team(req.away_team_name)
     if not away_team:
         raise HTTPException(404, f"Team not found: {req.away_team_name}")
 
-    # Step 2: Fetch H2H (last events for both teams)
-    home_history = await ingestion.get_last_events(home_team["id"])
-    away_history = await ingestion.get_last_events(away_team["id"])
+    # Step 2: Fetch both histories (form + H2H), the home stadium weather and
+    # the standings of each team's league (in parallel)
+    async def no_weather() -> None:
+        return None
+
+    leagues = {t["league_id"]: t.get("league", "") for t in (home_team, away_team) if t.get("league_id")}
+    home_history, away_history, weather, *tables = await asyncio.gather(
+        ingestion.get_last_events(home_team["id"]),
+        ingestion.get_last_events(away_team["id"]),
+        ingestion.get_weather(home_team["stadium"]) if home_team.get("stadium") else no_weather(),
+        *(ingestion.get_league_table(league_id) for league_id in leagues),
+    )
+    stage("history_weather")
 
     # Extract form from recent results
-    home_form = _extract_form(home_history, home_team["id"])
-    away_form = _extract_form(away_history, away_team["id"])
+    home_form = extract_form(home_history, home_team["id"])
+    away_form = extract_form(away_history, away_team["id"])
     home_team["form"] = home_form
     away_team["form"] = away_form
 
+    # Standings: ranking / points for both teams (and every other team of the league in the graph)
+    def ingest_teams() -> list[dict]:
+        return analyzer.ingest_teams([home_team, away_team], dict(zip(leagues.values(), tables)))
+
+    home_team, away_team = await executor.run(ingest_teams)
+
     # Step 3: Build match node
     from datetime import date as date_type
     match_data = {
@@ -223,14 +439,12 @@ async def quick_analyze(req: QuickAnalyzeRequest):
     }
 
     # Step 4: Weather for home stadium
-    if home_team.get("stadium"):
-        weather = await ingestion.get_weather(home_team["stadium"])
-        if weather:
-            match_data["venue"] = {
-                "stadium": home_team["stadium"],
-                "city": home_team.get("country"),
-                **weather,
-            }
+    if weather:
+        match_data["venue"] = {
+            "stadium": home_team["stadium"],
+            "city": home_team.get("country"),
+            **weather,
+        }
 
     # Step 5: Find H2H matches between the two teams
     h2h_matches = [
@@ -239,14 +453,18 @@ async def quick_analyze(req: QuickAnalyzeRequest):
     ]
 
     # Step 6: Run analysis
-    match_nid = analyzer.ingest_match(match_data)
-    result = analyzer.analyze(
+    match_nid = await executor.run(analyzer.ingest_match, match_data)
+    result = await executor.analyze(
         match_id=match_nid,
         home_team=home_team,
         away_team=away_team,
         h2h_history=h2h_matches or None,
     )
+    stage("analysis")
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Quick analysis {match_nid} timings (ms): {timings}")
 
+    result["timings_ms"] = timings
     return result
 
 
@@ -256,7 +474,7 @@ async def get_site_matches(date: str = "today"):
     if not ingestion:
         raise HTTPException(503, "Ingestion service not ready")
 
-    matches = await ingestion.get_site_matches(date)
+    matches = await _site_matches(date)
     return {
         "count": len(matches),
         "matches": matches,
@@ -271,7 +489,7 @@ async def analyze_site_match(match_index: int = 0, date: str = "today"):
     if not ingestion:
         raise HTTPException(503, "Ingestion service not ready")
 
-    matches = await ingestion.get_site_matches(date)
+    matches = await _site_matches(date)
     if not matches:
         raise HTTPException(404, "No matches found for this date")
     if match_index >= len(matches):
@@ -283,8 +501,8 @@ async def analyze_site_match(match_index: int = 0, date: str = "today"):
     if not enriched["home_team"] or not enriched["away_team"]:
         raise HTTPException(422, "Could not resolve both teams via TheSportsDB")
 
-    match_nid = analyzer.ingest_match(enriched["match"])
-    result = analyzer.analyze(
+    match_nid = await executor.run(analyzer.ingest_match, enriched["match"])
+    result = await executor.analyze(
         match_id=match_nid,
         home_team=enriched["home_team"],
         away_team=enriched["away_team"],
@@ -293,29 +511,130 @@ async def analyze_site_match(match_index: int = 0, date: str = "today"):
     return result
 
 
-# ─── Helpers ──────────────────────────────────────────────
+@app.post("/site/analyze/all")
+async def analyze_site_matches(date: str = "today"):
+    """
+    Fetch every match of a date from the PronoScope site and analyze them all.
+
+    The match list is streamed once; each match starts enriching as soon
+    as it has been parsed, SITE_ENRICH_CONCURRENCY matches at a time. One
+    NDJSON line per match, in site order, written as soon as the match and
+    every match before it are enriched; matches whose teams cannot be
+    resolved get an {"index", "error"} line. Failing to fetch the list is a
+    502 / 503; once lines have been sent, a failure mid-list ends the
+    stream with an {"error"} line.
+    """
+    if not ingestion:
+        raise HTTPException(503, "Ingestion service not ready")
 
-def _extract_form(history: list[dict[str, Any]], team_id: str) -> list[str]:
-    """Extract W/D/L form from historical matches."""
-    form = []
-    for m in history[:5]:
-        hs = m.get("home_score")
-        aws = m.get("away_score")
-        if hs is None or aws is None:
-            continue
-        is_home = m.get("home_team_id") == team_id
-        if is_home:
-            if hs > aws:
-                form.append("W")
-            elif hs < aws:
-                form.append("L")
-            else:
-                form.append("D")
+    limit = asyncio.Semaphore(SITE_ENRICH_CONCURRENCY)
+
+    async def enrich(raw_match: dict[str, Any]) -> dict[str, Any]:
+        async with limit:
+            return await ingestion.enrich_match(raw_match)
+
+    # The first match decides the status code: an upstream failure before it is not a 404
+    matches = ingestion.iter_site_matches(date)
+    try:
+        first = await anext(matches)
+    except StopAsyncIteration:
+        raise HTTPException(404, "No matches found for this date")
+    except Exception as e:
+        logger.error(f"Error fetching site matches: {e}")
+        raise _upstream_error(e)
+
+    tasks = [asyncio.ensure_future(enrich(first))]
+    arrived = asyncio.Event()
+
+    async def feed() -> None:
+        try:
+            async for raw_match in matches:
+                tasks.append(asyncio.ensure_future(enrich(raw_match)))
+                arrived.set()
+        finally:
+            arrived.set()
+
+    feeder = asyncio.ensure_future(feed())
+
+    async def results() -> AsyncIterator[dict[str, Any]]:
+        i = 0
+        try:
+            while True:
+                while i == len(tasks) and not feeder.done():
+                    arrived.clear()
+                    await arrived.wait()
+                if i == len(tasks):
+                    break
+                # Wait for the next match in site order, then take every enriched one after it
+                await asyncio.wait([tasks[i]])
+                run = [tasks[i]]
+                while i + len(run) < len(tasks) and tasks[i + len(run)].done():
+                    run.append(tasks[i + len(run)])
+                async for line in _analyze_site_run(i, run):
+                    yield line
+                i += len(run)
+            if not feeder.cancelled() and feeder.exception() is not None:
+                logger.error(f"Site match list interrupted after {i} matches: {feeder.exception()}")
+                yield {"error": f"Site match list interrupted after {i} matches"}
+        finally:
+            feeder.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(feeder, return_exceptions=True)
+            await matches.aclose()
+
+    return _ndjson(results())
+
+
+async def _analyze_site_run(
+    start: int, run: list[asyncio.Task[dict[str, Any]]],
+) -> AsyncIterator[dict[str, Any]]:
+    """Analyze consecutive enriched site matches as one batch, one line per match."""
+    enriched: list[Optional[dict[str, Any]]] = []
+    for task in run:
+        e = None if task.exception() is not None else task.result()
+        if e is not None and (e["home_team"] is None or e["away_team"] is None):
+            e = None
+        enriched.append(e)
+    analyses = executor.analyze_batch(
+        [{"match": e["match"], "home_team": e["home_team"], "away_team": e["away_team"]} for e in enriched if e]
+    )
+    for i, e in enumerate(enriched, start=start):
+        if e is not None:
+            yield {"index": i, **await anext(analyses)}
+        elif run[i - start].exception() is not None:
+            logger.error(f"Enriching site match {i} failed: {run[i - start].exception()}")
+            yield {"index": i, "error": "Could not enrich the match"}
         else:
-            if aws > hs:
-                form.append("W")
-            elif aws < hs:
-                form.append("L")
-            else:
-                form.append("D")
-    return form
+            yield {"index": i, "error": "Could not resolve both teams via TheSportsDB"}
+
+
+# ─── Helpers ──────────────────────────────────────────────
+
+async def _site_matches(date: str) -> list[dict[str, Any]]:
+    try:
+        return [m async for m in ingestion.iter_site_matches(date)]
+    except Exception as e:
+        logger.error(f"Error fetching site matches: {e}")
+        raise _upstream_error(e)
+
+
+def _upstream_error(e: Exception) -> HTTPException:
+    """503 when PronoScope is unreachable or throttling us, 502 when it fails or answers garbage."""
+    if isinstance(e, httpx.TransportError):
+        return HTTPException(503, f"PronoScope unavailable: {type(e).__name__}")
+    if isinstance(e, httpx.HTTPStatusError) and e.response.status_code in (429, 503):
+        return HTTPException(503, f"PronoScope unavailable: HTTP {e.response.status_code}")
+    if isinstance(e, httpx.HTTPStatusError):
+        return HTTPException(502, f"PronoScope error: HTTP {e.response.status_code}")
+    return HTTPException(502, "Invalid response from PronoScope")
+
+
+def _ndjson(results: AsyncIterator[dict[str, Any]]) -> StreamingResponse:
+    """Stream results as NDJSON, yielding to the event loop between lines."""
+    async def lines() -> AsyncIterator[str]:
+        async for result in results:
+            yield json.dumps(jsonable_encoder(result)) + "\n"
+            await asyncio.sleep(0)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,146 @@
+"""
+Response Cache — TTL + LRU caching of upstream lookups.
+
+DataIngestionService routes every cacheable lookup through
+ResponseCache.fetch(endpoint, key, loader):
+
+- Each endpoint has its own TTL (None = never expires, 0 = not cached).
+  A None result ("not found") is kept for negative_ttl at most, so a
+  team or place that appears upstream is picked up within minutes.
+- Concurrent identical lookups are single-flighted: one upstream call,
+  every caller gets its result (or its exception).
+- Only successful loads are stored; errors always reach the caller.
+- Callers get their own deep copy, so mutating a result never alters
+  the cached value.
+
+Storage is pluggable: MemoryCache is the in-process LRU default; any
+CacheBackend (e.g. Redis-backed) can replace it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+MISSING: Any = object()
+
+
+class CacheBackend(ABC):
+    """Async key/value store with per-entry expiry."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        """Stored value, or MISSING when absent or expired."""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        """Store a value for `ttl` seconds (None = no expiry)."""
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU: at most `maxsize` entries, least recently used evicted first."""
+
+    def __init__(self, maxsize: int = 10_000) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[Optional[float], Any]] = OrderedDict()
+        self._evictions = 0
+        self._expirations = 0
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires, value = entry
+        if expires is not None and expires <= time.monotonic():
+            del self._entries[key]
+            self._expirations += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self._entries[key] = (None if ttl is None else time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+        }
+
+
+class ResponseCache:
+    """Per-endpoint TTLs, single-flight and hit/miss metrics over a CacheBackend."""
+
+    def __init__(
+        self,
+        ttls: dict[str, Optional[float]],
+        backend: Optional[CacheBackend] = None,
+        negative_ttl: Optional[float] = None,
+    ) -> None:
+        self.ttls = ttls
+        self.negative_ttl = negative_ttl
+        self.backend = backend or MemoryCache()
+        self._inflight: dict[str, asyncio.Task[Any]] = {}
+        self._metrics: dict[str, dict[str, int]] = {}
+
+    async def fetch(self, endpoint: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached result of loader() for (endpoint, key)."""
+        ttl = self.ttls.get(endpoint, 0)
+        if ttl == 0:
+            return await loader()
+
+        metrics = self._metrics.setdefault(endpoint, {"hits": 0, "misses": 0, "coalesced": 0})
+        full_key = f"{endpoint}:{key}"
+        value = await self.backend.get(full_key)
+        if value is not MISSING:
+            metrics["hits"] += 1
+            return copy.deepcopy(value)
+
+        task = self._inflight.get(full_key)
+        if task is not None:
+            metrics["coalesced"] += 1
+        else:
+            metrics["misses"] += 1
+            task = asyncio.ensure_future(self._load(full_key, ttl, loader))
+            task.add_done_callback(_consume_exception)
+            self._inflight[full_key] = task
+        # Shielded: a cancelled caller doesn't cancel the load the others wait on
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _load(self, full_key: str, ttl: Optional[float], loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            if value is None and self.negative_ttl is not None and (ttl is None or ttl > self.negative_ttl):
+                ttl = self.negative_ttl
+                if ttl == 0:
+                    return value
+            await self.backend.set(full_key, value, ttl)
+            return value
+        finally:
+            del self._inflight[full_key]
+
+    def stats(self) -> dict[str, Any]:
+        endpoints = {}
+        for endpoint, m in self._metrics.items():
+            lookups = m["hits"] + m["misses"] + m["coalesced"]
+            endpoints[endpoint] = {**m, "hit_rate": round((m["hits"] + m["coalesced"]) / lookups, 3) if lookups else 0.0}
+        return {"endpoints": endpoints, "backend": self.backend.stats(), "inflight": len(self._inflight)}
+
+
+def _consume_exception(task: asyncio.Task[Any]) -> None:
+    # Every waiter may have been cancelled: don't log "exception never retrieved"
+    if not task.cancelled():
+        task.exception()
@@ -7,12 +7,22 @@ This bridges the external APIs with the KnowledgeGraph.
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import importlib.util
 import logging
+from dataclasses import dataclass
 from datetime import date
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Iterable, Optional
 
 import httpx
 
+from graph.engine.names import name_key
+from graph.services.cache import CacheBackend, ResponseCache
+from graph.services.jsonstream import JsonStream
+from graph.services.ratelimit import RETRY_STATUSES, RetryPolicy, TokenBucket
+from graph.services.store import ResolutionStore, geocode_key
+
 logger = logging.getLogger("shannon.ingestion")
 
 # ─── API Configuration ────────────────────────────────────
@@ -30,46 +40,172 @@ NOMINATIM_BASE = "https://nominatim.openstreetmap.org"
 NOMINATIM_HEADERS = {"User-Agent": "ShannonGraph/1.0 (contact@pronoscope.app)"}
 
 
+@dataclass(frozen=True)
+class UpstreamConfig:
+    """Connection pool, protocol and timeouts for one upstream host."""
+    max_connections: int = 4  # also caps in-flight requests to the host
+    max_keepalive_connections: int = 4
+    keepalive_expiry: float = 30.0
+    http2: bool = False  # only honoured when the optional `h2` package is installed
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+DEFAULT_UPSTREAM = UpstreamConfig()
+UPSTREAMS = {
+    "www.thesportsdb.com": UpstreamConfig(http2=True, read_timeout=15.0),
+    "pronoscope.vercel.app": UpstreamConfig(http2=True),
+    "api.weatherapi.com": UpstreamConfig(read_timeout=10.0),  # plain http: no HTTP/2
+    # Nominatim's usage policy: a single connection
+    "nominatim.openstreetmap.org": UpstreamConfig(
+        max_connections=1, max_keepalive_connections=1, http2=True, read_timeout=10.0,
+    ),
+}
+
+# Sustained request rate per upstream host: (requests per second, burst)
+DEFAULT_HOST_RATE = (5.0, 10)
+HOST_RATES = {
+    # free key: 30 requests / minute (6 + 0.4 × 60); the burst covers one cold /analyze/quick
+    "www.thesportsdb.com": (0.4, 6),
+    "nominatim.openstreetmap.org": (1.0, 1),    # usage policy: 1 request / second
+}
+
+# Wall-time budget for one enrich_match call; lookups still running are dropped.
+# Time a lookup spends queued behind its host's rate limit doesn't count.
+ENRICH_DEADLINE = 10.0
+
+# Response cache TTL per lookup, in seconds (None = never expires)
+CACHE_TTLS: dict[str, Optional[float]] = {
+    "search_team": 3 * 86400,
+    "get_next_events": 6 * 3600,
+    "get_last_events": 3600,
+    "get_league_table": 3600,
+    "get_weather": 15 * 60,
+    "geocode": None,  # stadiums don't move
+}
+# "Not found" (None) results, whatever the endpoint's TTL above
+NEGATIVE_CACHE_TTL = 5 * 60
+
+
 class DataIngestionService:
     """
     Async service that fetches and normalizes data from external APIs
     into graph-compatible node dictionaries.
     """
 
-    def __init__(self, client: httpx.AsyncClient | None = None) -> None:
-        self._client = client or httpx.AsyncClient(timeout=30.0)
-        self._owns_client = client is None
+    def __init__(
+        self,
+        client: httpx.AsyncClient | None = None,
+        cache_backend: CacheBackend | None = None,
+        store: ResolutionStore | None = None,
+        pacing: bool = True,
+        host_rates: dict[str, tuple[float, int]] | None = None,
+        upstreams: dict[str, UpstreamConfig] | None = None,
+    ) -> None:
+        # A given client serves every host; otherwise each host gets its own pool
+        self._shared_client = client
+        self._upstream_configs = {**UPSTREAMS, **(upstreams or {})}
+        self._upstreams: dict[str, _Upstream] = {}
+        # pacing=False skips the token buckets (local mocks and benchmarks)
+        self._pacing = pacing
+        self._host_rates = {**HOST_RATES, **(host_rates or {})}
+        self.retry_policy = RetryPolicy()
+        self._cache = ResponseCache(CACHE_TTLS, cache_backend, negative_ttl=NEGATIVE_CACHE_TTL)
+        # Persistent team / geocode resolutions, consulted before the network
+        self._store = store
+
+    def cache_stats(self) -> dict[str, Any]:
+        """Hit/miss/coalesced counts per lookup plus backend size and evictions."""
+        stats = self._cache.stats()
+        if self._store is not None:
+            stats["store"] = self._store.stats()
+        return stats
 
     async def close(self) -> None:
-        if self._owns_client:
-            await self._client.aclose()
+        for upstream in self._upstreams.values():
+            if upstream.client is not self._shared_client:
+                await upstream.client.aclose()
+        if self._store is not None:
+            self._store.close()
+
+    def _upstream(self, host: str) -> _Upstream:
+        upstream = self._upstreams.get(host)
+        if upstream is None:
+            config = self._upstream_configs.get(host, DEFAULT_UPSTREAM)
+            if config.http2 and not HTTP2_AVAILABLE and self._shared_client is None:
+                logger.info(f"HTTP/2 requested for {host} but the h2 package is missing: using HTTP/1.1")
+            bucket = TokenBucket(*self._host_rates.get(host, DEFAULT_HOST_RATE)) if self._pacing else None
+            upstream = _Upstream(config, self._shared_client or _make_client(config), bucket)
+            self._upstreams[host] = upstream
+        return upstream
+
+    async def _get(self, url: str, stream: bool = False, **kwargs: Any) -> httpx.Response:
+        """
+        GET through the host's own client, concurrency limit and token bucket,
+        retrying 429 / 5xx with jittered backoff (Retry-After wins when present).
+
+        With stream=True the body is left unread: the caller iterates it and
+        must aclose() the response. The host slot is freed once the headers
+        are in; the open connection still counts against the pool.
+        """
+        host = httpx.URL(url).host
+        upstream = self._upstream(host)
+        bucket = upstream.bucket
+        stats = upstream.stats
+
+        attempt = 0
+        deadline = _deadline.get()
+        while True:
+            # Queueing for a host slot and token is pacing: it doesn't run an enrichment deadline down
+            if deadline is not None:
+                deadline.pause()
+            try:
+                async with upstream.limit:
+                    if bucket is not None:
+                        stats["throttled_s"] += await bucket.acquire()
+                    if deadline is not None:
+                        deadline.resume()
+                    stats["requests"] += 1
+                    upstream.in_flight += 1
+                    upstream.peak_in_flight = max(upstream.peak_in_flight, upstream.in_flight)
+                    try:
+                        request = upstream.client.build_request("GET", url, **kwargs)
+                        resp = await upstream.client.send(request, stream=stream)
+                    finally:
+                        upstream.in_flight -= 1
+            finally:
+                if deadline is not None:
+                    deadline.resume()
+            delay = self.retry_policy.delay(resp, attempt)
+            if delay is None:
+                if resp.status_code in RETRY_STATUSES:
+                    stats["gave_up"] += 1
+                return resp
+            await resp.aclose()
+            if resp.status_code == 429 and bucket is not None:
+                bucket.pause(delay)
+            logger.warning(f"{host} answered {resp.status_code}, retry {attempt + 1} in {delay:.1f}s")
+            stats["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def upstream_stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Per host: requests, retries, time spent waiting for tokens, give-ups
+        and pool usage (in-flight / peak requests, open and idle connections).
+        """
+        return {host: upstream.report() for host, upstream in self._upstreams.items()}
 
     # ─── TheSportsDB ─────────────────────────────────
 
     async def search_team(self, team_name: str) -> Optional[dict[str, Any]]:
         """Search TheSportsDB for a team, return normalized Team dict."""
         try:
-            resp = await self._client.get(
-                f"{THESPORTSDB_URL}/searchteams.php",
-                params={"t": team_name},
+            return await self._cache.fetch(
+                "search_team", name_key(team_name), lambda: self._fetch_search_team(team_name),
             )
-            resp.raise_for_status()
-            data = resp.json()
-            teams = data.get("teams")
-            if not teams:
-                return None
-
-            t = teams[0]
-            return {
-                "id": t["idTeam"],
-                "name": t["strTeam"],
-                "short_name": t.get("strTeamShort"),
-                "league": t.get("strLeague", ""),
-                "country": t.get("strCountry", ""),
-                "stadium": t.get("strStadium"),
-                "stadium_capacity": _safe_int(t.get("intStadiumCapacity")),
-                "badge_url": t.get("strTeamBadge"),
-            }
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 429:
                 logger.warning("TheSportsDB rate limit hit")
@@ -78,236 +214,374 @@ class DataIngestionService:
             logger.error(f"Error searching team '{team_name}': {e}")
             return None
 
+    async def _fetch_search_team(self, team_name: str) -> Optional[dict[str, Any]]:
+        if self._store is not None:
+            team = self._store.get_team(team_name)
+            if team is not None:
+                return team
+
+        resp = await self._get(
+            f"{THESPORTSDB_URL}/searchteams.php",
+            params={"t": team_name},
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        teams = data.get("teams")
+        if not teams:
+            return None
+
+        t = teams[0]
+        team = {
+            "id": t["idTeam"],
+            "name": t["strTeam"],
+            "short_name": t.get("strTeamShort"),
+            "league": t.get("strLeague", ""),
+            "league_id": t.get("idLeague"),  # for get_league_table
+            "country": t.get("strCountry", ""),
+            "stadium": t.get("strStadium"),
+            "stadium_capacity": _safe_int(t.get("intStadiumCapacity")),
+            "badge_url": t.get("strTeamBadge"),
+        }
+        if self._store is not None:
+            alternates = (t.get("strTeamAlternate") or "").split(",")
+            self._store.put_team(team, [team_name, *alternates])
+        return team
+
+    async def preload_teams(self, names: Iterable[str]) -> int:
+        """
+        Resolve every team name not in the persistent store yet (startup
+        warm-up; concurrency is bounded by the per-host limit). Returns the
+        number of names resolved.
+        """
+        if self._store is None:
+            pending = list(dict.fromkeys(names))
+        else:
+            pending = [n for n in dict.fromkeys(names) if self._store.get_team(n) is None]
+        results = await asyncio.gather(*(self.search_team(n) for n in pending), return_exceptions=True)
+        return sum(isinstance(r, dict) for r in results)
+
     async def get_next_events(self, team_id: str) -> list[dict[str, Any]]:
         """Get upcoming matches for a team from TheSportsDB."""
         try:
-            resp = await self._client.get(
-                f"{THESPORTSDB_URL}/eventsnext.php",
-                params={"id": team_id},
+            return await self._cache.fetch(
+                "get_next_events", team_id, lambda: self._fetch_next_events(team_id),
             )
-            resp.raise_for_status()
-            data = resp.json()
-            events = data.get("events") or []
-
-            return [
-                {
-                    "id": e["idEvent"],
-                    "home_team_id": e.get("idHomeTeam", ""),
-                    "away_team_id": e.get("idAwayTeam", ""),
-                    "league": e.get("strLeague", ""),
-                    "match_date": e.get("dateEvent", str(date.today())),
-                    "kick_off": (e.get("strTime") or "")[:5] or None,
-                    "status": "NS",
-                }
-                for e in events
-            ]
         except Exception as e:
             logger.error(f"Error fetching next events for team {team_id}: {e}")
             return []
 
+    async def _fetch_next_events(self, team_id: str) -> list[dict[str, Any]]:
+        resp = await self._get(
+            f"{THESPORTSDB_URL}/eventsnext.php",
+            params={"id": team_id},
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        events = data.get("events") or []
+
+        return [
+            {
+                "id": e["idEvent"],
+                "home_team_id": e.get("idHomeTeam", ""),
+                "away_team_id": e.get("idAwayTeam", ""),
+                "league": e.get("strLeague", ""),
+                "match_date": e.get("dateEvent", str(date.today())),
+                "kick_off": (e.get("strTime") or "")[:5] or None,
+                "status": "NS",
+            }
+            for e in events
+        ]
+
     async def get_last_events(self, team_id: str) -> list[dict[str, Any]]:
         """Get past matches for a team from TheSportsDB (for H2H / form)."""
         try:
-            resp = await self._client.get(
-                f"{THESPORTSDB_URL}/eventslast.php",
-                params={"id": team_id},
+            return await self._cache.fetch(
+                "get_last_events", team_id, lambda: self._fetch_last_events(team_id),
             )
-            resp.raise_for_status()
-            data = resp.json()
-            events = data.get("results") or []
-
-            return [
-                {
-                    "id": e["idEvent"],
-                    "home_team_id": e.get("idHomeTeam", ""),
-                    "away_team_id": e.get("idAwayTeam", ""),
-                    "league": e.get("strLeague", ""),
-                    "match_date": e.get("dateEvent", str(date.today())),
-                    "kick_off": (e.get("strTime") or "")[:5] or None,
-                    "status": "FT",
-                    "home_score": _safe_int(e.get("intHomeScore")),
-                    "away_score": _safe_int(e.get("intAwayScore")),
-                    "is_historical": True,
-                }
-                for e in events
-            ]
         except Exception as e:
             logger.error(f"Error fetching last events for team {team_id}: {e}")
             return []
 
+    async def _fetch_last_events(self, team_id: str) -> list[dict[str, Any]]:
+        resp = await self._get(
+            f"{THESPORTSDB_URL}/eventslast.php",
+            params={"id": team_id},
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        events = data.get("results") or []
+
+        return [
+            {
+                "id": e["idEvent"],
+                "home_team_id": e.get("idHomeTeam", ""),
+                "away_team_id": e.get("idAwayTeam", ""),
+                "league": e.get("strLeague", ""),
+                "match_date": e.get("dateEvent", str(date.today())),
+                "kick_off": (e.get("strTime") or "")[:5] or None,
+                "status": "FT",
+                "home_score": _safe_int(e.get("intHomeScore")),
+                "away_score": _safe_int(e.get("intAwayScore")),
+                "is_historical": True,
+            }
+            for e in events
+        ]
+
     async def get_league_table(self, league_id: str) -> list[dict[str, Any]]:
         """Get standings from TheSportsDB, returns list sorted by rank."""
         try:
-            resp = await self._client.get(
-                f"{THESPORTSDB_URL}/lookuptable.php",
-                params={"l": league_id},
+            return await self._cache.fetch(
+                "get_league_table", league_id, lambda: self._fetch_league_table(league_id),
             )
-            resp.raise_for_status()
-            data = resp.json()
-            table = data.get("table") or []
-
-            return [
-                {
-                    "team_name": row.get("strTeam", ""),
-                    "badge_url": row.get("strTeamBadge"),
-                    "ranking": _safe_int(row.get("intRank")),
-                    "points": _safe_int(row.get("intPoints")),
-                    "played": _safe_int(row.get("intPlayed")),
-                    "wins": _safe_int(row.get("intWin")),
-                    "draws": _safe_int(row.get("intDraw")),
-                    "losses": _safe_int(row.get("intLoss")),
-                    "goals_for": _safe_int(row.get("intGoalsFor")),
-                    "goals_against": _safe_int(row.get("intGoalsAgainst")),
-                }
-                for row in table
-            ]
         except Exception as e:
             logger.error(f"Error fetching league table {league_id}: {e}")
             return []
 
+    async def _fetch_league_table(self, league_id: str) -> list[dict[str, Any]]:
+        return [row async for row in self.iter_league_table(league_id)]
+
+    async def iter_league_table(self, league_id: str) -> AsyncIterator[dict[str, Any]]:
+        """
+        Standings rows, normalized one by one while the body downloads
+        (uncached; errors propagate to the caller).
+        """
+        resp = await self._get(
+            f"{THESPORTSDB_URL}/lookuptable.php",
+            params={"l": league_id},
+            stream=True,
+        )
+        try:
+            resp.raise_for_status()
+            stream = JsonStream(resp.aiter_bytes())
+            async for key in stream.members():
+                if key != "table" or await stream.peek() != "[":  # "table": null when unknown
+                    await stream.skip()
+                    continue
+                async for _ in stream.elements():
+                    row = await stream.value()
+                    yield {
+                        "team_name": row.get("strTeam", ""),
+                        "badge_url": row.get("strTeamBadge"),
+                        "ranking": _safe_int(row.get("intRank")),
+                        "points": _safe_int(row.get("intPoints")),
+                        "played": _safe_int(row.get("intPlayed")),
+                        "wins": _safe_int(row.get("intWin")),
+                        "draws": _safe_int(row.get("intDraw")),
+                        "losses": _safe_int(row.get("intLoss")),
+                        "goals_for": _safe_int(row.get("intGoalsFor")),
+                        "goals_against": _safe_int(row.get("intGoalsAgainst")),
+                    }
+        finally:
+            await resp.aclose()
+
     # ─── PronoScope Site API ──────────────────────────
 
     async def get_site_matches(self, date_filter: str = "today") -> list[dict[str, Any]]:
         """Fetch matches from the PronoScope API."""
         try:
-            resp = await self._client.get(
-                f"{PRONOSPORT_BASE}/matches",
-                params={"date": date_filter, "priority": "true"},
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-            if not data.get("success"):
-                return []
-
-            matches = []
-            for league_group in data.get("leagues", []):
-                for m in league_group.get("matches", []):
-                    matches.append({
-                        "id": str(m.get("id", "")),
-                        "home_team_id": "",  # Resolved via TheSportsDB search
-                        "away_team_id": "",
-                        "league": m.get("league", league_group.get("league", "")),
-                        "match_date": m.get("date", str(date.today())),
-                        "kick_off": m.get("time"),
-                        "status": m.get("status", "NS"),
-                        "_home_team_name": m.get("homeTeam", ""),
-                        "_away_team_name": m.get("awayTeam", ""),
-                        "_home_team_logo": m.get("homeTeamLogo"),
-                        "_away_team_logo": m.get("awayTeamLogo"),
-                    })
-            return matches
+            return [m async for m in self.iter_site_matches(date_filter)]
         except Exception as e:
             logger.error(f"Error fetching site matches: {e}")
             return []
 
+    async def iter_site_matches(self, date_filter: str = "today") -> AsyncIterator[dict[str, Any]]:
+        """
+        Matches from the PronoScope API, each yielded as soon as its bytes
+        have arrived (errors propagate to the caller).
+
+        Matches are held back only while the payload has not yet shown
+        "success": true (or their league group's name, when the match has
+        none of its own), so the output equals a full-body parse.
+        """
+        resp = await self._get(
+            f"{PRONOSPORT_BASE}/matches",
+            params={"date": date_filter, "priority": "true"},
+            stream=True,
+        )
+        try:
+            resp.raise_for_status()
+            stream = JsonStream(resp.aiter_bytes())
+            success: Optional[bool] = None
+            held: list[dict[str, Any]] = []  # waiting for "success"
+
+            async for key in stream.members():
+                if key == "success":
+                    success = bool(await stream.value())
+                    if not success:
+                        return
+                    for m in held:
+                        yield m
+                    held.clear()
+                elif key == "leagues":
+                    async for _ in stream.elements():
+                        async for m in _iter_league_group(stream):
+                            if success:
+                                yield m
+                            else:
+                                held.append(m)
+                else:
+                    await stream.skip()
+        finally:
+            await resp.aclose()
+
     # ─── WeatherAPI ──────────────────────────────────
 
     async def get_weather(self, city: str) -> Optional[dict[str, Any]]:
         """Get current weather for a city, returns venue-compatible dict."""
         try:
-            resp = await self._client.get(
-                f"{WEATHERAPI_BASE}/current.json",
-                params={"key": WEATHERAPI_KEY, "q": city},
+            return await self._cache.fetch(
+                "get_weather", city.strip().casefold(), lambda: self._fetch_weather(city),
             )
-            resp.raise_for_status()
-            data = resp.json()
-            current = data.get("current", {})
-            condition_text = current.get("condition", {}).get("text", "").lower()
-
-            # Map WeatherAPI condition to our enum
-            weather = "clear"
-            if "rain" in condition_text or "drizzle" in condition_text:
-                weather = "rainy"
-            elif "snow" in condition_text:
-                weather = "snowy"
-            elif "cloud" in condition_text or "overcast" in condition_text:
-                weather = "cloudy"
-            elif "thunder" in condition_text or "storm" in condition_text:
-                weather = "stormy"
-
-            return {
-                "temperature_c": current.get("temp_c"),
-                "weather": weather,
-                "wind_kph": current.get("wind_kph"),
-                "humidity_pct": current.get("humidity"),
-            }
         except Exception as e:
             logger.error(f"Error fetching weather for '{city}': {e}")
             return None
 
+    async def _fetch_weather(self, city: str) -> Optional[dict[str, Any]]:
+        resp = await self._get(
+            f"{WEATHERAPI_BASE}/current.json",
+            params={"key": WEATHERAPI_KEY, "q": city},
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        current = data.get("current", {})
+        condition_text = current.get("condition", {}).get("text", "").lower()
+
+        # Map WeatherAPI condition to our enum
+        weather = "clear"
+        if "rain" in condition_text or "drizzle" in condition_text:
+            weather = "rainy"
+        elif "snow" in condition_text:
+            weather = "snowy"
+        elif "cloud" in condition_text or "overcast" in condition_text:
+            weather = "cloudy"
+        elif "thunder" in condition_text or "storm" in condition_text:
+            weather = "stormy"
+
+        return {
+            "temperature_c": current.get("temp_c"),
+            "weather": weather,
+            "wind_kph": current.get("wind_kph"),
+            "humidity_pct": current.get("humidity"),
+        }
+
     # ─── Nominatim Geocoding ─────────────────────────
 
     async def geocode(self, query: str) -> Optional[dict[str, float]]:
         """Geocode a location string to lat/lon."""
         try:
-            resp = await self._client.get(
-                f"{NOMINATIM_BASE}/search",
-                params={"q": query, "format": "json", "limit": "1"},
-                headers=NOMINATIM_HEADERS,
+            return await self._cache.fetch(
+                "geocode", geocode_key(query), lambda: self._fetch_geocode(query),
             )
-            resp.raise_for_status()
-            results = resp.json()
-            if not results:
-                return None
-            return {
-                "latitude": float(results[0]["lat"]),
-                "longitude": float(results[0]["lon"]),
-            }
         except Exception as e:
             logger.error(f"Error geocoding '{query}': {e}")
             return None
 
+    async def _fetch_geocode(self, query: str) -> Optional[dict[str, float]]:
+        if self._store is not None:
+            coords = self._store.get_geocode(query)
+            if coords is not None:
+                return coords
+
+        resp = await self._get(
+            f"{NOMINATIM_BASE}/search",
+            params={"q": query, "format": "json", "limit": "1"},
+            headers=NOMINATIM_HEADERS,
+        )
+        resp.raise_for_status()
+        results = resp.json()
+        if not results:
+            return None
+        coords = {
+            "latitude": float(results[0]["lat"]),
+            "longitude": float(results[0]["lon"]),
+        }
+        if self._store is not None:
+            self._store.put_geocode(query, coords)
+        return coords
+
     # ─── Full Match Enrichment ───────────────────────
 
-    async def enrich_match(self, match_data: dict[str, Any]) -> dict[str, Any]:
+    async def enrich_match(
+        self,
+        match_data: dict[str, Any],
+        deadline: float = ENRICH_DEADLINE,
+    ) -> dict[str, Any]:
         """
         Full enrichment pipeline for a match:
-        1. Resolve team IDs via TheSportsDB
+        1. Resolve team IDs via TheSportsDB (both teams concurrently)
         2. Fetch weather for the venue city
         3. Geocode the stadium
         4. Build complete venue context
+
+        Weather and geocoding need the home team's stadium, so they start as
+        soon as the home team resolves, while the away search may still be in
+        flight. Everything shares one `deadline` (seconds), stopped for each
+        lookup while its requests wait for a host slot or rate-limit token:
+        lookups still pending past it are cancelled and left out of the
+        result.
         """
         home_name = match_data.pop("_home_team_name", "")
         away_name = match_data.pop("_away_team_name", "")
         match_data.pop("_home_team_logo", None)
         match_data.pop("_away_team_logo", None)
 
-        home_team = None
-        away_team = None
+        expires = asyncio.get_running_loop().time() + deadline
+        tasks: list[asyncio.Task[Any]] = []
+
+        def start(coro: Any, expires: float = expires) -> tuple[asyncio.Task[Any], _Deadline]:
+            lookup_deadline = _Deadline(expires)
+            context = contextvars.copy_context()
+            context.run(_deadline.set, lookup_deadline)
+            # The task copies the context it is created in (create_task's context= needs 3.11)
+            task = context.run(asyncio.create_task, coro)
+            tasks.append(task)
+            return task, lookup_deadline
 
-        # Resolve teams
-        if home_name:
-            home_team = await self.search_team(home_name)
+        try:
+            # Resolve teams
+            home_search = start(self.search_team(home_name)) if home_name else None
+            away_search = start(self.search_team(away_name)) if away_name else None
+
+            home_team = await _until(home_search, f"team search '{home_name}'")
             if home_team:
                 match_data["home_team_id"] = home_team["id"]
-        if away_name:
-            away_team = await self.search_team(away_name)
+
+            # Weather + Geo for venue
+            stadium = None
+            city = None
+            if home_team:
+                stadium = home_team.get("stadium")
+                city = home_team.get("country")  # Fallback
+
+            geo_lookup = weather_lookup = None
+            if stadium:
+                # Dependent lookups: the home search's queueing doesn't count against them either
+                geo_lookup = start(self.geocode(f"{stadium}, {city or ''}"), home_search[1].expires)
+                weather_lookup = start(self.get_weather(stadium), home_search[1].expires)
+
+            away_team = await _until(away_search, f"team search '{away_name}'")
             if away_team:
                 match_data["away_team_id"] = away_team["id"]
 
-        # Weather + Geo for venue
-        stadium = None
-        city = None
-        if home_team:
-            stadium = home_team.get("stadium")
-            city = home_team.get("country")  # Fallback
-
-        if stadium:
-            geo = await self.geocode(f"{stadium}, {city or ''}")
-            weather = await self.get_weather(stadium) if stadium else None
-
-            venue = {
-                "stadium": stadium,
-                "city": city,
-                "country": home_team.get("country") if home_team else None,
-            }
-            if geo:
-                venue.update(geo)
-            if weather:
-                venue.update(weather)
+            if stadium:
+                geo = await _until(geo_lookup, f"geocoding '{stadium}'")
+                weather = await _until(weather_lookup, f"weather '{stadium}'")
+
+                venue = {
+                    "stadium": stadium,
+                    "city": city,
+                    "country": home_team.get("country") if home_team else None,
+                }
+                if geo:
+                    venue.update(geo)
+                if weather:
+                    venue.update(weather)
 
-            match_data["venue"] = venue
+                match_data["venue"] = venue
+        finally:
+            # Structured: nothing started here outlives the call (error or cancellation)
+            for task in tasks:
+                task.cancel()
 
         return {
             "match": match_data,
@@ -318,6 +592,175 @@ class DataIngestionService:
 
 # ─── Helpers ──────────────────────────────────────────────
 
+def extract_form(history: list[dict[str, Any]], team_id: str) -> list[str]:
+    """Extract W/D/L form from historical matches."""
+    form = []
+    for m in history[:5]:
+        hs = m.get("home_score")
+        aws = m.get("away_score")
+        if hs is None or aws is None:
+            continue
+        is_home = m.get("home_team_id") == team_id
+        if is_home:
+            if hs > aws:
+                form.append("W")
+            elif hs < aws:
+                form.append("L")
+            else:
+                form.append("D")
+        else:
+            if aws > hs:
+                form.append("W")
+            elif aws < hs:
+                form.append("L")
+            else:
+                form.append("D")
+    return form
+
+
+async def _iter_league_group(stream: JsonStream) -> AsyncIterator[dict[str, Any]]:
+    """
+    Normalized matches of one PronoScope league group, in payload order.
+
+    A match without a league of its own waits for the group's name; once
+    one waits, every later match of the group queues behind it.
+    """
+    league: Optional[str] = None
+    league_seen = False
+    pending: list[tuple[dict[str, Any], bool]] = []  # (match, has its own league), in order
+
+    async for key in stream.members():
+        if key == "league":
+            league = await stream.value()
+            league_seen = True
+            for m, own_league in pending:
+                if not own_league:
+                    m["league"] = league
+                yield m
+            pending.clear()
+        elif key == "matches":
+            async for _ in stream.elements():
+                m = await stream.value()
+                match = {
+                    "id": str(m.get("id", "")),
+                    "home_team_id": "",  # Resolved via TheSportsDB search
+                    "away_team_id": "",
+                    "league": m.get("league", league if league_seen else ""),
+                    "match_date": m.get("date", str(date.today())),
+                    "kick_off": m.get("time"),
+                    "status": m.get("status", "NS"),
+                    "_home_team_name": m.get("homeTeam", ""),
+                    "_away_team_name": m.get("awayTeam", ""),
+                    "_home_team_logo": m.get("homeTeamLogo"),
+                    "_away_team_logo": m.get("awayTeamLogo"),
+                }
+                if ("league" in m or league_seen) and not pending:
+                    yield match
+                else:
+                    pending.append((match, "league" in m))
+        else:
+            await stream.skip()
+
+    for m, own_league in pending:
+        if not own_league:
+            m["league"] = ""
+        yield m
+
+
+class _Upstream:
+    """Client, concurrency limit, token bucket and counters of one upstream host."""
+
+    def __init__(self, config: UpstreamConfig, client: httpx.AsyncClient, bucket: Optional[TokenBucket]) -> None:
+        self.config = config
+        self.client = client
+        self.limit = asyncio.Semaphore(config.max_connections)
+        self.bucket = bucket
+        self.stats: dict[str, float] = {"requests": 0, "retries": 0, "throttled_s": 0.0, "gave_up": 0}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def report(self) -> dict[str, Any]:
+        pool = {
+            "max_connections": self.config.max_connections,
+            "http2": self.config.http2 and HTTP2_AVAILABLE,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+        connections = _pool_connections(self.client)
+        if connections is not None:
+            pool["connections"], pool["idle_connections"] = connections
+        return {**self.stats, "throttled_s": round(self.stats["throttled_s"], 2), "pool": pool}
+
+
+def _pool_connections(client: httpx.AsyncClient) -> Optional[tuple[int, int]]:
+    """
+    (open, idle) connections of the client's httpcore pool, read from
+    private attributes: None for mock / custom transports or when another
+    httpx / httpcore version lays them out differently.
+    """
+    try:
+        connections = list(client._transport._pool.connections)  # type: ignore[attr-defined]
+        return len(connections), sum(bool(c.is_idle()) for c in connections)
+    except Exception:  # /health must not depend on library internals
+        return None
+
+
+def _make_client(config: UpstreamConfig) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=config.http2 and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            config.read_timeout,
+            connect=config.connect_timeout,
+            pool=config.connect_timeout,
+        ),
+    )
+
+
+class _Deadline:
+    """Loop-time expiry of one enrichment lookup; stopped while it is paused (queued for a token)."""
+
+    __slots__ = ("expires", "_paused_at")
+
+    def __init__(self, expires: float) -> None:
+        self.expires = expires
+        self._paused_at: Optional[float] = None
+
+    def pause(self) -> None:
+        self._paused_at = asyncio.get_running_loop().time()
+
+    def resume(self) -> None:
+        if self._paused_at is not None:
+            self.expires += asyncio.get_running_loop().time() - self._paused_at
+            self._paused_at = None
+
+    def remaining(self) -> float:
+        now = self._paused_at if self._paused_at is not None else asyncio.get_running_loop().time()
+        return self.expires - now
+
+
+# Deadline of the enrichment lookup running in this task (see _get)
+_deadline: contextvars.ContextVar[Optional[_Deadline]] = contextvars.ContextVar("enrich_deadline", default=None)
+
+
+async def _until(lookup: Optional[tuple[asyncio.Task[Any], _Deadline]], label: str) -> Any:
+    """Await a lookup until its deadline; None (task cancelled) past it."""
+    if lookup is None:
+        return None
+    task, deadline = lookup
+    while (remaining := deadline.remaining()) > 0:
+        done, _ = await asyncio.wait({task}, timeout=remaining)
+        if done:
+            return task.result()
+    task.cancel()
+    logger.warning(f"Enrichment deadline exceeded: {label} dropped")
+    return None
+
+
 def _safe_int(val: Any) -> Optional[int]:
     if val is None:
         return None
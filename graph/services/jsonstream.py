@@ -0,0 +1,131 @@
+"""
+JSON Stream — Incremental parsing of large upstream JSON bodies.
+
+JsonStream walks a document while it downloads: the caller steps through
+objects (members) and arrays (elements) and decodes only the values it
+wants (value), so each item of a large array is available as soon as its
+bytes have arrived, and neither the raw body nor the whole decoded tree
+is ever held in memory.
+
+    async for key in stream.members():
+        if key == "leagues":
+            async for _ in stream.elements():
+                league = await stream.value()
+        else:
+            await stream.skip()
+
+Every member and element must be consumed (value, skip or a nested walk)
+before the iteration moves on; peek() tells which kind of value comes next.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator, Optional
+
+_WHITESPACE = " \t\n\r"
+_OPENERS = frozenset('"{[')
+_DELIMITER = re.compile(r"[\s,:\]}]")
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """Pull parser over an async iterator of body chunks (bytes)."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._chunks = chunks.__aiter__()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    async def value(self) -> Any:
+        """Decode the next complete value."""
+        if await self.peek() not in _OPENERS:
+            # A number (or literal) may continue in the next chunk: wait for its delimiter
+            while not _DELIMITER.search(self._buf, self._pos) and await self._fill():
+                pass
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not await self._fill():
+                    raise
+                continue
+            self._pos = end
+            return value
+
+    async def skip(self) -> None:
+        """Step over the next value."""
+        char = await self.peek()
+        if char == "{":
+            async for _ in self.members():
+                await self.skip()
+        elif char == "[":
+            async for _ in self.elements():
+                await self.skip()
+        else:
+            await self.value()
+
+    async def members(self) -> AsyncIterator[str]:
+        """Keys of the next object; the stream is left on each member's value."""
+        await self._expect("{")
+        if await self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = await self.value()
+            await self._expect(":")
+            yield key
+            if await self._expect(",}") == "}":
+                return
+
+    async def elements(self) -> AsyncIterator[int]:
+        """Indexes of the next array; the stream is left on each element."""
+        await self._expect("[")
+        if await self.peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if await self._expect(",]") == "]":
+                return
+
+    async def peek(self) -> Optional[str]:
+        """Next non-whitespace character, without consuming it (None at the end)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not await self._fill():
+                return None
+
+    # ─── Buffer ──────────────────────────────────────
+
+    async def _expect(self, chars: str) -> str:
+        char = await self.peek()
+        if char is None or char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self._buf, self._pos)
+        self._pos += 1
+        return char
+
+    async def _fill(self) -> bool:
+        """Append the next chunk, dropping what was consumed. False at the end of the body."""
+        if self._eof:
+            return False
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self._eof = True
+            tail = self._utf8.decode(b"", final=True)
+            self._buf = self._buf[self._pos:] + tail
+            self._pos = 0
+            return bool(tail)
+        self._buf = self._buf[self._pos:] + self._utf8.decode(chunk)
+        self._pos = 0
+        return True
@@ -0,0 +1,150 @@
+"""
+Matchday Prefetcher — Warms the graph and the lookup caches ahead of kickoff.
+
+Every `interval` seconds the prefetcher streams the PronoScope fixtures for
+today and the next `horizon_days` days. For each fixture not started yet it
+runs the same lookups a request would:
+
+- enrich_match (team search, venue geocode and weather)
+- both teams' last results (form and H2H)
+- both teams' league tables (ranking and points)
+
+It then ingests the teams, the fixture and its H2H history into the graph
+(one write batch on the executor's writer thread per fixture).
+A later request for a prefetched fixture finds every lookup in the response
+cache and every node already in the graph. Re-ingesting unchanged payloads
+is a no-op, so repeated runs are cheap.
+
+Upstream calls go through the same per-host limits and token buckets as
+requests, and buckets serve waiters in FIFO order. `concurrency` caps how
+many fixtures are in flight, and so how far prefetching can queue ahead of
+user traffic. The API only starts it when SHANNON_PREFETCH_INTERVAL is set.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import date, timedelta
+from typing import Any
+
+from graph.engine.executor import AnalysisExecutor
+from graph.services.ingestion import DataIngestionService, extract_form
+
+logger = logging.getLogger("shannon.prefetch")
+
+
+class MatchdayPrefetcher:
+    """Periodically resolve and ingest upcoming fixtures (run() is the background task)."""
+
+    def __init__(
+        self,
+        ingestion: DataIngestionService,
+        executor: AnalysisExecutor,
+        interval: float = 900.0,
+        horizon_days: int = 1,
+        concurrency: int = 2,
+        enrich_deadline: float = 120.0,
+    ) -> None:
+        self.ingestion = ingestion
+        self.executor = executor
+        self.interval = interval
+        self.horizon_days = horizon_days
+        self.concurrency = concurrency
+        # Longer than a request's: nobody waits on a prefetch, only the token buckets do
+        self.enrich_deadline = enrich_deadline
+        self._stats: dict[str, Any] = {"runs": 0, "last_run_at": None, "last_duration_s": None}
+        self._last: dict[str, int] = {}
+
+    def stats(self) -> dict[str, Any]:
+        return {**self._stats, **self._last}
+
+    async def run(self) -> None:
+        """Prefetch now, then every `interval` seconds (after each run ends)."""
+        while True:
+            try:
+                await self.prefetch()
+            except Exception as e:
+                logger.error(f"Matchday prefetch failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def prefetch(self) -> dict[str, int]:
+        """One pass over the horizon. Returns fixture counts for the run."""
+        started = time.perf_counter()
+        counts = {"fixtures": 0, "skipped": 0, "ingested": 0, "unresolved": 0, "failed": 0}
+        limit = asyncio.Semaphore(self.concurrency)
+        tasks: list[asyncio.Task[bool]] = []
+
+        async def prefetch_match(raw_match: dict[str, Any]) -> bool:
+            async with limit:
+                return await self._prefetch_match(raw_match)
+
+        try:
+            for day in self._dates():
+                try:
+                    async for raw_match in self.ingestion.iter_site_matches(day):
+                        counts["fixtures"] += 1
+                        if raw_match.get("status", "NS") != "NS":
+                            counts["skipped"] += 1
+                            continue
+                        tasks.append(asyncio.ensure_future(prefetch_match(raw_match)))
+                except Exception as e:
+                    logger.error(f"Prefetch: could not fetch site matches for {day}: {e}")
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            # Cancelled (shutdown): don't leave fixtures half-fetched in the background
+            for task in tasks:
+                task.cancel()
+
+        for result in results:
+            if isinstance(result, BaseException):
+                counts["failed"] += 1
+                logger.error(f"Prefetch: fixture failed: {result}")
+            elif result:
+                counts["ingested"] += 1
+            else:
+                counts["unresolved"] += 1
+
+        elapsed = time.perf_counter() - started
+        self._stats.update(runs=self._stats["runs"] + 1, last_run_at=time.time(), last_duration_s=round(elapsed, 1))
+        self._last = counts
+        logger.info(f"Matchday prefetch: {counts} in {elapsed:.1f}s")
+        return counts
+
+    async def _prefetch_match(self, raw_match: dict[str, Any]) -> bool:
+        """Resolve and ingest one fixture. False when its teams cannot be resolved."""
+        enriched = await self.ingestion.enrich_match(raw_match, deadline=self.enrich_deadline)
+        home_team, away_team = enriched["home_team"], enriched["away_team"]
+        if not home_team or not away_team:
+            return False
+
+        # One table per league (cached and single-flighted across fixtures)
+        leagues = {t["league_id"]: t.get("league", "") for t in (home_team, away_team) if t.get("league_id")}
+        home_history, away_history, *tables = await asyncio.gather(
+            self.ingestion.get_last_events(home_team["id"]),
+            self.ingestion.get_last_events(away_team["id"]),
+            *(self.ingestion.get_league_table(league_id) for league_id in leagues),
+        )
+        home_team["form"] = extract_form(home_history, home_team["id"])
+        away_team["form"] = extract_form(away_history, away_team["id"])
+
+        h2h_matches = [
+            m for m in home_history
+            if m.get("away_team_id") == away_team["id"] or m.get("home_team_id") == away_team["id"]
+        ]
+
+        def ingest() -> None:
+            analyzer = self.executor.analyzer
+            # Teams first so the fixture links to them
+            analyzer.ingest_teams([home_team, away_team], dict(zip(leagues.values(), tables)))
+            analyzer.ingest_match(enriched["match"])
+            if h2h_matches:
+                analyzer.ingest_historical_matches(h2h_matches, home_team["id"], away_team["id"])
+
+        await self.executor.run(ingest)
+        return True
+
+    def _dates(self) -> list[str]:
+        today = date.today()
+        return ["today"] + [str(today + timedelta(days=d)) for d in range(1, self.horizon_days + 1)]
@@ -0,0 +1,105 @@
+"""
+Rate Limiting — Per-host request pacing and retry/backoff for upstream APIs.
+
+Every outbound request takes a token from its host's TokenBucket first
+(waiters queue in FIFO order), so sustained traffic stays at the host's
+allowed rate instead of bursting into 429s. Responses that still come
+back 429 or 5xx are retried with jittered exponential backoff, honouring
+Retry-After; a 429 also pauses the whole host bucket so the requests
+queued behind it back off too.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` saved; acquire() waits in FIFO order."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated: Optional[float] = None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Take one token, waiting as needed. Returns the seconds waited."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return loop.time() - started
+                    delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no token for `seconds` (server asked us to back off)."""
+        now = asyncio.get_running_loop().time()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff for 429 / 5xx responses."""
+    max_retries: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    # Give up (return the response) when the server asks for a longer pause
+    max_retry_after: float = 60.0
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2^attempt)]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def delay(self, response: httpx.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None when the response is final."""
+        if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is None:
+            return self.backoff(attempt)
+        if retry_after > self.max_retry_after:
+            return None
+        return retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP-date form)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
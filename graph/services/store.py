@@ -0,0 +1,155 @@
+"""
+Resolution Store — Persistent team and geocoding lookups (SQLite).
+
+Team searches and stadium geocodes barely change, yet every restart used
+to resolve them again through TheSportsDB and Nominatim. This store keeps
+them on disk: the whole file is preloaded into memory when opened, so
+lookups never touch the network or the disk, and every newly resolved
+result is written through.
+
+Team names are matched on fuzzy-normalized keys (see graph.engine.names):
+"Paris Saint-Germain", "Paris St Germain FC" and "paris saint-germain"
+share one key. Each resolved team is also filed under its alternate names
+from TheSportsDB and its acronym, so "PSG" or "Paris SG" resolve offline
+once the club has been looked up under any name. An alias stays with the
+first team filed under it: another club sharing the name must be looked up
+again rather than resolve to the wrong one.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from graph.engine.names import acronym, name_key
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS teams (
+    team_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS team_aliases (
+    alias TEXT PRIMARY KEY,
+    team_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS geocodes (
+    query TEXT PRIMARY KEY,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class ResolutionStore:
+    """
+    SQLite-backed team / geocode store with an in-memory mirror.
+
+    All methods are synchronous and cheap (dict lookups; writes are single
+    upserts in WAL mode), so they run directly on the event loop.
+    """
+
+    def __init__(self, path: str | Path, team_max_age: float = 30 * 86400) -> None:
+        self.path = Path(path)
+        self.team_max_age = team_max_age
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._teams: dict[str, tuple[dict[str, Any], float]] = {}
+        self._aliases: dict[str, str] = {}
+        self._geocodes: dict[str, dict[str, float]] = {}
+        self._refused_aliases = 0
+        self.preload()
+
+    def preload(self) -> None:
+        """Bulk-load every stored row into memory (one query per table)."""
+        self._teams = {
+            team_id: (json.loads(payload), updated_at)
+            for team_id, payload, updated_at in self._db.execute("SELECT team_id, payload, updated_at FROM teams")
+        }
+        self._aliases = dict(self._db.execute("SELECT alias, team_id FROM team_aliases"))
+        self._geocodes = {
+            query: {"latitude": lat, "longitude": lon}
+            for query, lat, lon in self._db.execute("SELECT query, latitude, longitude FROM geocodes")
+        }
+
+    def close(self) -> None:
+        self._db.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "teams": len(self._teams),
+            "aliases": len(self._aliases),
+            "refused_aliases": self._refused_aliases,
+            "geocodes": len(self._geocodes),
+        }
+
+    # ─── Teams ───────────────────────────────────────
+
+    def get_team(self, name: str) -> Optional[dict[str, Any]]:
+        """Stored team for any known variant of its name (None when unknown or stale)."""
+        team_id = self._aliases.get(name_key(name))
+        entry = self._teams.get(team_id) if team_id else None
+        if entry is None or time.time() - entry[1] > self.team_max_age:
+            return None
+        return dict(entry[0])
+
+    def put_team(self, team: dict[str, Any], names: Iterable[str] = ()) -> None:
+        """
+        Store a resolved team under its own name, the searched `names` and
+        its acronym. Aliases already bound to a different team are refused.
+        """
+        team_id = str(team["id"])
+        now = time.time()
+        aliases = {name_key(n) for n in (team["name"], team.get("short_name"), *names) if n}
+        derived = acronym(team["name"])
+        if derived:
+            aliases.add(derived)
+        aliases.discard("")
+        new = []
+        for alias in aliases:
+            bound = self._aliases.get(alias)
+            if bound is None:
+                new.append(alias)
+            elif bound != team_id:
+                self._refused_aliases += 1
+
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO teams (team_id, payload, updated_at) VALUES (?, ?, ?)",
+                (team_id, json.dumps(team), now),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO team_aliases (alias, team_id) VALUES (?, ?)",
+                [(alias, team_id) for alias in new],
+            )
+
+        self._teams[team_id] = (dict(team), now)
+        for alias in new:
+            self._aliases[alias] = team_id
+
+    # ─── Geocodes ────────────────────────────────────
+
+    def get_geocode(self, query: str) -> Optional[dict[str, float]]:
+        coords = self._geocodes.get(geocode_key(query))
+        return dict(coords) if coords else None
+
+    def put_geocode(self, query: str, coords: dict[str, float]) -> None:
+        key = geocode_key(query)
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocodes (query, latitude, longitude, updated_at) VALUES (?, ?, ?, ?)",
+                (key, coords["latitude"], coords["longitude"], time.time()),
+            )
+        self._geocodes[key] = dict(coords)
+
+
+def geocode_key(query: str) -> str:
+    """Geocode cache key: an address only differs in case and spacing (no name_key fuzzing)."""
+    return " ".join(query.split()).casefold()